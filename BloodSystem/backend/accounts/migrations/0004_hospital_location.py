@@ -0,0 +1,28 @@
+# Generated by Django 4.2.7 on 2026-10-18 04:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0003_donor_next_eligible_date'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='hospitalprofile',
+            name='geo_cell',
+            field=models.BigIntegerField(blank=True, db_index=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='hospitalprofile',
+            name='latitude',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='hospitalprofile',
+            name='longitude',
+            field=models.FloatField(blank=True, null=True),
+        ),
+    ]
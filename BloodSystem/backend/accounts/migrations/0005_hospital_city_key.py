@@ -0,0 +1,27 @@
+# Generated by Django 4.2.7 on 2026-10-18 06:22
+
+from django.db import migrations, models
+
+
+def fill_city_keys(apps, schema_editor):
+    HospitalProfile = apps.get_model('accounts', 'HospitalProfile')
+    hospitals = list(HospitalProfile.objects.only('id', 'city'))
+    for hospital in hospitals:
+        hospital.city_key = (hospital.city or '').strip().lower()
+    HospitalProfile.objects.bulk_update(hospitals, ['city_key'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0004_hospital_location'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='hospitalprofile',
+            name='city_key',
+            field=models.CharField(db_index=True, default='', editable=False, max_length=100),
+        ),
+        migrations.RunPython(fill_city_keys, migrations.RunPython.noop),
+    ]
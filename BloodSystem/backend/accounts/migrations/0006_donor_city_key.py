@@ -0,0 +1,27 @@
+# Generated by Django 4.2.7 on 2026-10-18 07:03
+
+from django.db import migrations, models
+
+
+def fill_city_keys(apps, schema_editor):
+    DonorProfile = apps.get_model('accounts', 'DonorProfile')
+    donors = list(DonorProfile.objects.only('id', 'city'))
+    for donor in donors:
+        donor.city_key = (donor.city or '').strip().lower()
+    DonorProfile.objects.bulk_update(donors, ['city_key'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0005_hospital_city_key'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='donorprofile',
+            name='city_key',
+            field=models.CharField(db_index=True, default='', editable=False, max_length=100),
+        ),
+        migrations.RunPython(fill_city_keys, migrations.RunPython.noop),
+    ]
@@ -2,6 +2,12 @@ from django.contrib.auth.models import AbstractUser
 from django.db import models
 from django.core.validators import RegexValidator
 from django.conf import settings
+from bloodsystem.geo import grid_cell
+
+
+def normalize_city(city):
+    """City name as stored in the indexed city_key columns: trimmed and lower-cased"""
+    return (city or '').strip().lower()
 
 class User(AbstractUser):
     """Custom User model with role-based authentication"""
@@ -45,21 +51,38 @@ class DonorProfile(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='donor_profile')
     blood_group = models.CharField(max_length=3, choices=settings.BLOOD_GROUPS)
     city = models.CharField(max_length=100)
+    city_key = models.CharField(max_length=100, db_index=True, editable=False, default='')  # normalize_city(city), set on save
     state = models.CharField(max_length=100)
     date_of_birth = models.DateField(null=True, blank=True)
     weight = models.FloatField(null=True, blank=True, help_text="Weight in kg")
     gender = models.CharField(max_length=10, choices=[('M', 'Male'), ('F', 'Female'), ('O', 'Other')])
     last_donation_date = models.DateField(null=True, blank=True)
+    next_eligible_date = models.DateField(null=True, blank=True)
     total_donations = models.PositiveIntegerField(default=0)
     is_eligible = models.BooleanField(default=True)
     medical_conditions = models.TextField(blank=True, help_text="Any medical conditions")
     medications = models.TextField(blank=True, help_text="Current medications")
     emergency_contact = models.CharField(max_length=15, blank=True)
+    
+    # Location (geo_cell is derived from the coordinates on save)
+    latitude = models.FloatField(null=True, blank=True)
+    longitude = models.FloatField(null=True, blank=True)
+    geo_cell = models.BigIntegerField(null=True, blank=True, db_index=True, editable=False)
+    
     created_at = models.DateTimeField(auto_now_add=True)
     
     def __str__(self):
         return f"{self.user.get_full_name()} - {self.blood_group}"
     
+    def save(self, *args, **kwargs):
+        self.geo_cell = grid_cell(self.latitude, self.longitude)
+        self.city_key = normalize_city(self.city)
+        if kwargs.get('update_fields') is not None and {'latitude', 'longitude'} & set(kwargs['update_fields']):
+            kwargs['update_fields'] = set(kwargs['update_fields']) | {'geo_cell'}
+        if kwargs.get('update_fields') is not None and 'city' in kwargs['update_fields']:
+            kwargs['update_fields'] = set(kwargs['update_fields']) | {'city_key'}
+        super().save(*args, **kwargs)
+    
     class Meta:
         db_table = 'donor_profiles'
 
@@ -84,9 +107,13 @@ class HospitalProfile(models.Model):
     address_line = models.TextField()
     area = models.CharField(max_length=100)
     city = models.CharField(max_length=100)
+    city_key = models.CharField(max_length=100, db_index=True, editable=False, default='')  # normalize_city(city), set on save
     district = models.CharField(max_length=100)
     state = models.CharField(max_length=100)
     pincode = models.CharField(max_length=10)
+    latitude = models.FloatField(null=True, blank=True)
+    longitude = models.FloatField(null=True, blank=True)
+    geo_cell = models.BigIntegerField(null=True, blank=True, db_index=True, editable=False)
     
     # Authorized Person
     authorized_person_name = models.CharField(max_length=200)
@@ -116,6 +143,15 @@ class HospitalProfile(models.Model):
     def __str__(self):
         return f"{self.hospital_name} - {self.verification_status}"
     
+    def save(self, *args, **kwargs):
+        self.geo_cell = grid_cell(self.latitude, self.longitude)
+        self.city_key = normalize_city(self.city)
+        if kwargs.get('update_fields') is not None and {'latitude', 'longitude'} & set(kwargs['update_fields']):
+            kwargs['update_fields'] = set(kwargs['update_fields']) | {'geo_cell'}
+        if kwargs.get('update_fields') is not None and 'city' in kwargs['update_fields']:
+            kwargs['update_fields'] = set(kwargs['update_fields']) | {'city_key'}
+        super().save(*args, **kwargs)
+    
     class Meta:
         db_table = 'hospital_profiles'
 
@@ -38,7 +38,7 @@ class DonorRegistrationSerializer(serializers.ModelSerializer):
     
     class Meta:
         model = DonorProfile
-        fields = ['user', 'blood_group', 'city', 'state', 'date_of_birth', 'weight', 'gender']
+        fields = ['user', 'blood_group', 'city', 'state', 'date_of_birth', 'weight', 'gender', 'latitude', 'longitude']
     
     def create(self, validated_data):
         user_data = validated_data.pop('user')
@@ -57,7 +57,7 @@ class HospitalRegistrationSerializer(serializers.ModelSerializer):
         fields = [
             'user', 'hospital_name', 'registration_number', 'issuing_authority', 
             'year_of_registration', 'address_line', 'area', 'city', 'district', 
-            'state', 'pincode', 'authorized_person_name', 'authorized_person_designation',
+            'state', 'pincode', 'latitude', 'longitude', 'authorized_person_name', 'authorized_person_designation',
             'authorized_person_mobile', 'authorized_person_email', 'has_blood_bank',
             'blood_bank_license', 'storage_capacity', 'registration_certificate',
             'blood_bank_license_doc', 'authorization_letter', 'hospital_seal'
@@ -7,6 +7,7 @@ from django.db.models import Q, Count, Sum
 from accounts.models import HospitalProfile, CampProfile, User, DonorProfile
 from patient.models import BloodRequest
 from hospital.models import BloodStock
+from hospital.stock import provision_stock_rows
 from donor.models import DonationHistory
 from notifications.models import Notification
 
@@ -124,6 +125,10 @@ def verify_hospital(request):
         hospital.rejection_reason = notes if decision == 'REJECTED' else ''
         hospital.save()
         
+        if decision == 'APPROVED':
+            # Create the per-group stock rows up front so stock reads never write
+            provision_stock_rows([hospital.id])
+        
         # TODO: Send notification to hospital
         
         return Response({
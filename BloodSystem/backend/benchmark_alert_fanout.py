@@ -0,0 +1,109 @@
+#!/usr/bin/env python
+"""
+Measure emergency alert fan-out throughput.
+
+Runs against a throwaway test database (never the development database),
+seeds --donors compatible donors around one hospital and times
+hospital.fanout.fan_out_alert for each urgency level with batch pacing
+disabled, so the numbers are raw write throughput.
+
+    python benchmark_alert_fanout.py --donors 50000
+"""
+import os
+import time
+import random
+import argparse
+import django
+
+# Setup Django
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'bloodsystem.settings')
+django.setup()
+
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+from datetime import timedelta
+
+
+def seed(donor_count):
+    from accounts.models import User, DonorProfile, HospitalProfile
+    from bloodsystem.geo import grid_cell
+
+    hospital_user = User.objects.create(
+        username='bench-hospital@test.com', email='bench-hospital@test.com',
+        phone='+910000000001', role='HOSPITAL'
+    )
+    hospital = HospitalProfile.objects.create(
+        user=hospital_user, hospital_name='Benchmark Hospital', registration_number='BENCH-1',
+        issuing_authority='Test', year_of_registration=2000, address_line='Test', area='Test',
+        city='Pune', district='Pune', state='Maharashtra', pincode='411001',
+        authorized_person_name='Test', authorized_person_designation='Test',
+        authorized_person_mobile='9000000000', authorized_person_email='bench@test.com',
+        verification_status='APPROVED', latitude=18.52, longitude=73.85
+    )
+
+    blood_groups = [code for code, _ in settings.BLOOD_GROUPS]
+    batch = 5000
+    for start in range(0, donor_count, batch):
+        count = min(batch, donor_count - start)
+        users = User.objects.bulk_create([
+            User(
+                username=f'bench-donor{start + i}@test.com', email=f'bench-donor{start + i}@test.com',
+                phone=f'+92{start + i:010d}', role='DONOR', password='!'
+            ) for i in range(count)
+        ])
+        profiles = []
+        for user in users:
+            latitude = 18.52 + random.uniform(-0.5, 0.5)
+            longitude = 73.85 + random.uniform(-0.5, 0.5)
+            profiles.append(DonorProfile(
+                user=user, blood_group=random.choice(blood_groups), city='Pune', city_key='pune', state='Maharashtra',
+                gender='M', latitude=latitude, longitude=longitude, geo_cell=grid_cell(latitude, longitude)
+            ))
+        DonorProfile.objects.bulk_create(profiles)
+    return hospital
+
+
+def benchmark(donor_count):
+    from donor.models import DonorHospitalAlert
+    from notifications.models import Notification
+    from hospital.fanout import claim_next_alert, fan_out_alert
+
+    print(f"Seeding {donor_count} donors...")
+    started = time.monotonic()
+    hospital = seed(donor_count)
+    print(f"✅ Seeded in {time.monotonic() - started:.1f}s")
+
+    print(f"\n{'urgency':<10} {'radius':>8} {'notified':>10} {'seconds':>9} {'per sec':>10}")
+    for urgency in ['LOW', 'EMERGENCY', 'DISASTER']:
+        DonorHospitalAlert.objects.create(
+            hospital=hospital, blood_group='AB+', units_needed=10, urgency=urgency,
+            reason='Benchmark', location='Benchmark Hospital',
+            required_by=timezone.now() + timedelta(hours=6)
+        )
+        alert = claim_next_alert()  # fan_out_alert writes only under a claim
+        started = time.monotonic()
+        notified = fan_out_alert(alert, sleep=lambda seconds: None)
+        elapsed = time.monotonic() - started
+        radius = settings.ALERT_FANOUT[urgency]['radius_km']
+        print(f"{urgency:<10} {radius:>6}km {notified:>10} {elapsed:>9.2f} {notified / elapsed:>10.0f}")
+        Notification.objects.all().delete()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--donors', type=int, default=50000)
+    args = parser.parse_args()
+
+    print("=== ALERT FAN-OUT BENCHMARK ===")
+    print(f"Database engine: {connection.vendor}")
+    old_name = connection.creation.create_test_db(verbosity=0)
+    try:
+        benchmark(args.donors)
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+    print("\n=== END ===")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,118 @@
+#!/usr/bin/env python
+"""
+Measure the nightly demand forecast batch.
+
+Runs against a throwaway test database (never the development database).
+It seeds --hospitals approved hospitals across --states states with about
+--requests-per-day patient requests each over the forecast history, then
+times hospital.forecasting.forecast_demand for every hospital and blood
+group.
+
+    python benchmark_demand_forecast.py --hospitals 5000
+"""
+import os
+import time
+import random
+import argparse
+import django
+
+# Setup Django
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'bloodsystem.settings')
+django.setup()
+
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+from datetime import timedelta
+
+TARGET_SECONDS = 10
+
+
+def seed(hospital_count, state_count, requests_per_day):
+    from accounts.models import User, HospitalProfile, PatientProfile
+    from hospital.models import HospitalPatientRequest
+    from patient.models import BloodRequest
+
+    users = User.objects.bulk_create([
+        User(
+            username=f'forecast-hospital{i}@test.com', email=f'forecast-hospital{i}@test.com',
+            phone=f'+94{i:010d}', role='HOSPITAL', password='!'
+        ) for i in range(hospital_count)
+    ])
+    hospitals = HospitalProfile.objects.bulk_create([
+        HospitalProfile(
+            user=user, hospital_name=f'Forecast Hospital {i}', registration_number=f'FORECAST-{i}',
+            issuing_authority='Test', year_of_registration=2000, address_line='Test', area='Test',
+            city=f'City {i % 200}', district='Test', state=f'State {i % state_count}', pincode='400001',
+            authorized_person_name='Test', authorized_person_designation='Test',
+            authorized_person_mobile='9000000000', authorized_person_email=f'forecast{i}@test.com',
+            verification_status='APPROVED', has_blood_bank=True
+        ) for i, user in enumerate(users)
+    ])
+    patient = PatientProfile.objects.create(
+        user=User.objects.create(username='forecast-patient@test.com', email='forecast-patient@test.com',
+                                 phone='+9500000000', role='PATIENT'),
+        gender='O', city='Test', state='Test', emergency_contact='9000000000', emergency_contact_name='Test'
+    )
+
+    blood_groups = [code for code, _ in settings.BLOOD_GROUPS]
+    now = timezone.now()
+    history_days = settings.DEMAND_FORECAST['history_days']
+    count = int(hospital_count * history_days * requests_per_day)
+    # Backdate the requests; created_at is normally set on insert
+    created_at = HospitalPatientRequest._meta.get_field('created_at'), BloodRequest._meta.get_field('created_at')
+    for field in created_at:
+        field.auto_now_add = False
+    try:
+        for model in (HospitalPatientRequest, BloodRequest):
+            model.objects.bulk_create([
+                model(
+                    patient=patient, hospital=random.choice(hospitals), blood_group=random.choice(blood_groups),
+                    units_needed=random.randint(1, 4), required_by=now, status='PENDING',
+                    created_at=now - timedelta(days=random.randint(1, history_days), hours=random.randint(0, 23))
+                ) for _ in range(count // 2)
+            ], batch_size=5000)
+    finally:
+        for field in created_at:
+            field.auto_now_add = True
+    return count
+
+
+def benchmark(hospital_count, state_count, requests_per_day):
+    from hospital.forecasting import forecast_demand
+
+    print(f"Seeding {hospital_count} hospitals in {state_count} states...")
+    started = time.monotonic()
+    request_count = seed(hospital_count, state_count, requests_per_day)
+    print(f"✅ Seeded {request_count} requests in {time.monotonic() - started:.1f}s")
+
+    started = time.monotonic()
+    stored = forecast_demand()
+    elapsed = time.monotonic() - started
+    print(f"\nForecast {sum(stored.values())} hospital/blood group series in {elapsed:.2f}s "
+          f"({len(stored)} regions)")
+    if elapsed <= TARGET_SECONDS:
+        print(f"✅ Within {TARGET_SECONDS}s")
+    else:
+        print(f"❌ Slower than {TARGET_SECONDS}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--hospitals', type=int, default=5000)
+    parser.add_argument('--states', type=int, default=30)
+    parser.add_argument('--requests-per-day', type=float, default=0.5)
+    args = parser.parse_args()
+
+    print("=== DEMAND FORECAST BENCHMARK ===")
+    print(f"Database engine: {connection.vendor}")
+    old_name = connection.creation.create_test_db(verbosity=0)
+    try:
+        benchmark(args.hospitals, args.states, args.requests_per_day)
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+    print("\n=== END ===")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,127 @@
+#!/usr/bin/env python
+"""
+Measure inter-hospital routing latency.
+
+Runs against a throwaway test database (never the development database).
+It seeds --hospitals approved blood banks with random unit batches across
+one state and times hospital.routing.plan_route for --requests random
+requests.
+
+    python benchmark_network_routing.py --hospitals 2000
+"""
+import os
+import time
+import random
+import argparse
+import statistics
+import django
+
+# Setup Django
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'bloodsystem.settings')
+django.setup()
+
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+from datetime import timedelta
+
+TARGET_MS = 50
+
+
+def seed(hospital_count):
+    from accounts.models import User, HospitalProfile
+    from bloodsystem.geo import grid_cell
+    from hospital.models import BloodStock, BloodUnitBatch
+
+    users = User.objects.bulk_create([
+        User(
+            username=f'bench-hospital{i}@test.com', email=f'bench-hospital{i}@test.com',
+            phone=f'+93{i:010d}', role='HOSPITAL', password='!'
+        ) for i in range(hospital_count)
+    ])
+    hospitals = []
+    for i, user in enumerate(users):
+        latitude = 19.0 + random.uniform(-2, 2)
+        longitude = 75.0 + random.uniform(-3, 3)
+        hospitals.append(HospitalProfile(
+            user=user, hospital_name=f'Benchmark Hospital {i}', registration_number=f'BENCH-{i}',
+            issuing_authority='Test', year_of_registration=2000, address_line='Test', area='Test',
+            city=f'City {i % 200}', district='Test', state='Maharashtra', pincode='400001',
+            authorized_person_name='Test', authorized_person_designation='Test',
+            authorized_person_mobile='9000000000', authorized_person_email=f'bench{i}@test.com',
+            verification_status='APPROVED', has_blood_bank=True,
+            latitude=latitude, longitude=longitude, geo_cell=grid_cell(latitude, longitude)
+        ))
+    hospitals = HospitalProfile.objects.bulk_create(hospitals)
+
+    today = timezone.localdate()
+    stocks = []
+    batches = []
+    for hospital in hospitals:
+        for blood_group, _ in settings.BLOOD_GROUPS:
+            units = 0
+            for _ in range(random.randint(0, 4)):
+                collected_on = today - timedelta(days=random.randint(0, 30))
+                lot = random.randint(1, 6)
+                units += lot
+                batches.append(BloodUnitBatch(
+                    hospital=hospital, blood_group=blood_group, units_received=lot, units_remaining=lot,
+                    collected_on=collected_on,
+                    expires_on=collected_on + timedelta(days=settings.BLOOD_UNIT_SHELF_LIFE_DAYS)
+                ))
+            stock = BloodStock(hospital=hospital, blood_group=blood_group, units_available=units)
+            stock.update_alert_level()  # bulk_create skips save()
+            stocks.append(stock)
+    BloodStock.objects.bulk_create(stocks, batch_size=5000)
+    BloodUnitBatch.objects.bulk_create(batches, batch_size=5000)
+    return hospitals
+
+
+def benchmark(hospital_count, request_count):
+    from hospital.routing import plan_route
+
+    print(f"Seeding {hospital_count} hospitals...")
+    started = time.monotonic()
+    hospitals = seed(hospital_count)
+    print(f"✅ Seeded in {time.monotonic() - started:.1f}s")
+
+    blood_groups = [code for code, _ in settings.BLOOD_GROUPS]
+    required_by = timezone.now() + timedelta(days=2)
+
+    timings = []
+    shortfalls = 0
+    for _ in range(request_count):
+        hospital = random.choice(hospitals)
+        started = time.monotonic()
+        allocations, units_short = plan_route(hospital, random.choice(blood_groups), random.randint(1, 40), required_by)
+        timings.append((time.monotonic() - started) * 1000)
+        shortfalls += units_short > 0
+
+    timings.sort()
+    p95 = timings[int(len(timings) * 0.95) - 1]
+    print(f"\n{request_count} requests: median {statistics.median(timings):.1f}ms, "
+          f"p95 {p95:.1f}ms, max {timings[-1]:.1f}ms ({shortfalls} short of stock)")
+    if p95 <= TARGET_MS:
+        print(f"✅ p95 within {TARGET_MS}ms")
+    else:
+        print(f"❌ p95 above {TARGET_MS}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--hospitals', type=int, default=2000)
+    parser.add_argument('--requests', type=int, default=200)
+    args = parser.parse_args()
+
+    print("=== NETWORK ROUTING BENCHMARK ===")
+    print(f"Database engine: {connection.vendor}")
+    old_name = connection.creation.create_test_db(verbosity=0)
+    try:
+        benchmark(args.hospitals, args.requests)
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+    print("\n=== END ===")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+"""
+ABO/Rh red cell compatibility lookup tables.
+
+Every blood group gets one bit in an 8-bit mask (ordered as in
+settings.BLOOD_GROUPS), and the donor -> recipient table is precomputed
+once at import time so matching never has to evaluate ABO/Rh rules at
+request time.
+"""
+
+from django.conf import settings
+
+BLOOD_GROUP_CODES = [code for code, _ in settings.BLOOD_GROUPS]
+
+# Bit assigned to each blood group
+GROUP_BITS = {code: 1 << index for index, code in enumerate(BLOOD_GROUP_CODES)}
+
+ALL_GROUPS_MASK = (1 << len(BLOOD_GROUP_CODES)) - 1
+
+
+def _can_donate(donor_group, recipient_group):
+    """ABO/Rh rule: donor antigens must be a subset of recipient antigens"""
+    donor_abo, donor_rh = donor_group[:-1], donor_group[-1]
+    recipient_abo, recipient_rh = recipient_group[:-1], recipient_group[-1]
+
+    donor_antigens = set(donor_abo) - {'O'}
+    recipient_antigens = set(recipient_abo) - {'O'}
+    if not donor_antigens <= recipient_antigens:
+        return False
+    return donor_rh == '-' or recipient_rh == '+'
+
+
+# Donor group -> mask of groups it can give to
+RECIPIENT_MASKS = {
+    donor: sum(GROUP_BITS[recipient] for recipient in BLOOD_GROUP_CODES if _can_donate(donor, recipient))
+    for donor in BLOOD_GROUP_CODES
+}
+
+# Recipient group -> mask of groups it can receive from
+DONOR_MASKS = {
+    recipient: sum(GROUP_BITS[donor] for donor in BLOOD_GROUP_CODES if _can_donate(donor, recipient))
+    for recipient in BLOOD_GROUP_CODES
+}
+
+
+def groups_in_mask(mask):
+    """Blood group codes whose bit is set in mask"""
+    return [code for code in BLOOD_GROUP_CODES if mask & GROUP_BITS[code]]
+
+
+def mask_for_groups(groups):
+    """Mask with the bits of the given blood group codes set (unknown codes ignored)"""
+    mask = 0
+    for group in groups or []:
+        mask |= GROUP_BITS.get(group, 0)
+    return mask
+
+
+def masks_overlapping(mask):
+    """Every mask sharing a bit with mask; an IN list over these can use an index on a mask column"""
+    return [candidate for candidate in range(ALL_GROUPS_MASK + 1) if candidate & mask]
+
+
+def recipient_groups(donor_group):
+    """Blood groups a donor of donor_group can give to"""
+    return groups_in_mask(RECIPIENT_MASKS.get(donor_group, 0))
+
+
+def donor_groups(recipient_group):
+    """Blood groups a recipient of recipient_group can receive from"""
+    return groups_in_mask(DONOR_MASKS.get(recipient_group, 0))
+
+
+def is_compatible(donor_group, recipient_group):
+    """True if donor_group blood can be given to recipient_group"""
+    return bool(RECIPIENT_MASKS.get(donor_group, 0) & GROUP_BITS.get(recipient_group, 0))
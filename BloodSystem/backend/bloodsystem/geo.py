@@ -0,0 +1,108 @@
+"""
+Grid-cell spatial indexing helpers.
+
+The globe is cut into fixed CELL_DEGREES x CELL_DEGREES cells numbered
+row-major (row * GRID_COLUMNS + col). Models store the cell number in an
+indexed integer column, so a radius search becomes a handful of B-tree
+range scans (one per grid row) followed by an exact haversine check on
+the few candidates that come back.
+"""
+
+import math
+
+from django.db.models import Q
+
+# ~5.5 km per cell along a meridian. Changing this requires recomputing
+# every stored geo_cell.
+CELL_DEGREES = 0.05
+GRID_ROWS = int(math.ceil(180 / CELL_DEGREES))
+GRID_COLUMNS = int(math.ceil(360 / CELL_DEGREES))
+
+EARTH_RADIUS_KM = 6371.0
+KM_PER_DEGREE_LAT = 111.32
+
+
+def _row(latitude):
+    return min(GRID_ROWS - 1, max(0, int(math.floor((latitude + 90) / CELL_DEGREES))))
+
+
+def _column(longitude):
+    return int(math.floor(((longitude + 180) % 360) / CELL_DEGREES)) % GRID_COLUMNS
+
+
+def grid_cell(latitude, longitude):
+    """Cell number for a coordinate, or None if either part is missing"""
+    if latitude is None or longitude is None:
+        return None
+    return _row(latitude) * GRID_COLUMNS + _column(longitude)
+
+
+def parse_coordinates(latitude, longitude):
+    """
+    A (latitude, longitude) pair of floats from request values, or
+    (None, None) when both are blank. Raises ValueError unless both are
+    numbers within range.
+    """
+    if latitude in (None, '') and longitude in (None, ''):
+        return None, None
+    try:
+        latitude, longitude = float(latitude), float(longitude)
+    except (TypeError, ValueError):
+        raise ValueError('Latitude and longitude must both be numbers')
+    if not -90 <= latitude <= 90:
+        raise ValueError('Latitude must be between -90 and 90')
+    if not -180 <= longitude <= 180:
+        raise ValueError('Longitude must be between -180 and 180')
+    return latitude, longitude
+
+
+def haversine_km(lat1, lng1, lat2, lng2):
+    """Great-circle distance between two coordinates in km"""
+    lat1, lng1, lat2, lng2 = map(math.radians, (lat1, lng1, lat2, lng2))
+    a = (math.sin((lat2 - lat1) / 2) ** 2
+         + math.cos(lat1) * math.cos(lat2) * math.sin((lng2 - lng1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def cell_ranges(latitude, longitude, radius_km):
+    """
+    Inclusive (low, high) cell number ranges covering the bounding box of
+    a circle. There is one range per grid row, two where the box crosses
+    the antimeridian.
+    """
+    lat_delta = radius_km / KM_PER_DEGREE_LAT
+    lat_min = max(-90.0, latitude - lat_delta)
+    lat_max = min(90.0, latitude + lat_delta)
+
+    # Widest longitude span is at the latitude closest to a pole
+    widest_lat = max(abs(lat_min), abs(lat_max))
+    cos_lat = math.cos(math.radians(widest_lat))
+    if cos_lat < 1e-6:
+        lng_delta = 180.0
+    else:
+        lng_delta = min(180.0, radius_km / (KM_PER_DEGREE_LAT * cos_lat))
+
+    if lng_delta >= 180.0:
+        column_spans = [(0, GRID_COLUMNS - 1)]
+    else:
+        first = _column(longitude - lng_delta)
+        last = _column(longitude + lng_delta)
+        if first <= last:
+            column_spans = [(first, last)]
+        else:
+            column_spans = [(first, GRID_COLUMNS - 1), (0, last)]
+
+    ranges = []
+    for row in range(_row(lat_min), _row(lat_max) + 1):
+        base = row * GRID_COLUMNS
+        for first, last in column_spans:
+            ranges.append((base + first, base + last))
+    return ranges
+
+
+def within_radius_q(latitude, longitude, radius_km, field='geo_cell'):
+    """Q object selecting rows whose cell may lie within radius_km"""
+    query = Q()
+    for low, high in cell_ranges(latitude, longitude, radius_km):
+        query |= Q(**{f'{field}__range': (low, high)})
+    return query
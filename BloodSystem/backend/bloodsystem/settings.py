@@ -84,6 +84,20 @@ DATABASES = {
     }
 }
 
+# Cache
+# Local memory is per process; point this at a shared backend such as
+# django.core.cache.backends.redis.RedisCache when running several workers.
+# The network stock matrix is only cached in a shared backend.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'bloodsystem',
+        'OPTIONS': {
+            'MAX_ENTRIES': 20000,  # The network stock matrix keeps one entry per blood bank
+        },
+    }
+}
+
 # Custom User Model
 AUTH_USER_MODEL = 'accounts.User'
 
@@ -197,4 +211,66 @@ ALERT_LEVELS = [
     ('LOW', 'Low Priority'),
     ('EMERGENCY', 'Emergency'),
     ('DISASTER', 'Disaster'),
-]
\ No newline at end of file
+]
+
+# Donor notification fan-out per alert urgency: search radius around the
+# hospital, notifications written per batch and pause between batches
+ALERT_FANOUT = {
+    'LOW': {'radius_km': 10, 'batch_size': 500, 'batch_delay_seconds': 1.0},
+    'EMERGENCY': {'radius_km': 30, 'batch_size': 2000, 'batch_delay_seconds': 0.1},
+    'DISASTER': {'radius_km': 100, 'batch_size': 5000, 'batch_delay_seconds': 0},
+}
+ALERT_FANOUT_POLL_SECONDS = 2
+# A RUNNING alert whose worker has not finished a batch for this long is
+# taken to have crashed and is claimed again; FAILED alerts are retried up
+# to ALERT_FANOUT_MAX_ATTEMPTS runs in all
+ALERT_FANOUT_LEASE_SECONDS = 300
+ALERT_FANOUT_MAX_ATTEMPTS = 3
+
+# Camp Discovery
+CAMP_SEARCH_RADIUS_KM = 25  # Default radius for distance-based camp suggestions
+MAX_CAMP_SEARCH_RADIUS_KM = 200
+CAMP_SLOT_MINUTES = 30  # Default length of a camp arrival slot (camp.slots)
+
+# Donor Targeting
+DONOR_INDEX_REBUILD_SECONDS = 300  # Full rebuild interval for the in-process donor bitmap index
+
+# Network stock matrix cache (per-hospital rows; TTL bounds staleness from racing patches)
+NETWORK_STOCK_CACHE_SECONDS = 300
+
+# Inter-hospital routing costs, in km-equivalents per unit
+NETWORK_ROUTING = {
+    'substitute_penalty_km': 50,  # Sending a compatible substitute instead of the requested group
+    'expiry_weight_km': 20,  # Scaled by the share of shelf life left; favours units that would expire unused
+    'unknown_distance_km': 100,  # Providers in another city without coordinates (same city counts as 0)
+}
+
+# Blood unit inventory
+BLOOD_UNIT_SHELF_LIFE_DAYS = 35  # Whole blood in CPDA-1; used when a stock entry gives no expiry date
+EXPIRY_ALERT_DAYS = 7  # Units expiring within this many days count towards BloodStock.expiry_alerts
+
+# Low-stock alert levels per blood group (hospital.stock_alerts). Thresholds
+# are shares of a hospital's storage_capacity split evenly across the
+# blood groups; hospitals without a capacity use the defaults.
+STOCK_ALERT_THRESHOLDS = {
+    'low_share': 0.25,
+    'critical_share': 0.125,
+    'default_low': 10,
+    'default_critical': 5,
+    'hysteresis_share': 0.2,  # A level clears only this share of the low threshold (at least 1 unit) above it
+    'alert_hours': 48,  # required_by of the donor alert raised when a group goes CRITICAL
+}
+
+# Patient request queue: a request is due this many hours before required_by
+PATIENT_REQUEST_PRIORITY = {
+    'type_lead_hours': {'DISASTER': 48, 'EMERGENCY': 24, 'NORMAL': 0},
+    'shortfall_lead_hours': 12,  # More units needed than the hospital has in stock
+}
+
+# Nightly blood demand forecast (hospital.forecasting)
+DEMAND_FORECAST = {
+    'history_days': 84,  # Twelve weeks of request history
+    'horizon_days': 7,
+    'level_smoothing': 0.3,  # Weight of the newest day in the deseasonalised level
+    'season_smoothing': 0.2,  # Weight of the newest week in each weekday's seasonal offset
+}
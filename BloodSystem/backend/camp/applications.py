@@ -0,0 +1,102 @@
+"""
+Reviewing donor applications to camps.
+
+review_applications() applies a batch of decisions for one organizer: it
+loads the applications (with their donor user and camp) in one query,
+writes them back with one bulk_update and creates the donor notifications
+with one bulk_create, inside a single transaction. The reviewed rows are
+stamped with their camp's new roster version (see camp.checkin), and the
+camps' arrival slots are topped up from the approved donors still waiting
+(see camp.slots).
+bulk_update does not send post_save, which nothing listens to for
+CampApplication.
+"""
+
+from django.db import transaction
+from django.utils import timezone
+
+from donor.models import CampApplication
+from notifications.models import Notification
+from .models import Camp
+from .slots import allocate_slots
+
+DECISIONS = ['APPROVED', 'REJECTED']
+
+BULK_REVIEW_LIMIT = 1000
+
+
+def decision_notification(application, decision, notes=''):
+    """Keyword arguments for the notification telling the donor about the decision"""
+    if decision == 'APPROVED':
+        return {
+            'recipient': application.donor.user,
+            'title': 'Camp Application Approved',
+            'message': f'Your application for "{application.camp.name}" has been approved! Please check your email for further details.',
+            'notification_type': 'CAMP_APPROVAL',
+        }
+    return {
+        'recipient': application.donor.user,
+        'title': 'Camp Application Rejected',
+        'message': f'Your application for "{application.camp.name}" has been rejected. {notes if notes else "Please try applying to other camps."}',
+        'notification_type': 'CAMP_REJECTION',
+    }
+
+
+def apply_decision(application, decision, notes, user, now):
+    application.status = decision
+    application.reviewed_at = now
+    application.reviewed_by = user
+    application.rejection_reason = notes if decision == 'REJECTED' else ''
+    if decision != 'APPROVED':
+        application.slot = None
+
+
+def review_applications(camp_profile, decisions, user):
+    """
+    Apply decisions (dicts with application_id, decision and optional notes)
+    to the organizer's applications. Returns one outcome dict per entry, in
+    order; entries that are invalid, repeated or not the organizer's are
+    reported and skipped, the rest are applied together.
+    """
+    outcomes = []
+    valid = {}
+    for entry in decisions:
+        application_id = entry.get('application_id') if isinstance(entry, dict) else None
+        decision = entry.get('decision') if isinstance(entry, dict) else None
+        outcome = {'application_id': application_id}
+        outcomes.append(outcome)
+        if not isinstance(application_id, int) or decision not in DECISIONS:
+            outcome['error'] = 'Invalid application ID or decision'
+        elif application_id in valid:
+            outcome['error'] = 'Duplicate application ID'
+        else:
+            valid[application_id] = (decision, entry.get('notes') or '', outcome)
+
+    now = timezone.now()
+    with transaction.atomic():
+        versions = Camp.objects.filter(organizer=camp_profile, applications__id__in=list(valid)).bump_roster_versions()
+        applications = CampApplication.objects.filter(
+            id__in=list(valid), camp__organizer=camp_profile
+        ).select_related('donor__user', 'camp').in_bulk()
+
+        reviewed = []
+        notifications = []
+        for application_id, (decision, notes, outcome) in valid.items():
+            application = applications.get(application_id)
+            if application is None:
+                outcome['error'] = 'Application not found'
+                continue
+            apply_decision(application, decision, notes, user, now)
+            application.roster_version = versions[application.camp_id]
+            reviewed.append(application)
+            notifications.append(Notification(**decision_notification(application, decision, notes)))
+            outcome['status'] = decision
+
+        CampApplication.objects.bulk_update(
+            reviewed, ['status', 'reviewed_at', 'reviewed_by', 'rejection_reason', 'slot', 'roster_version'],
+            batch_size=500
+        )
+        Notification.objects.bulk_create(notifications, batch_size=500)
+        for camp_id, roster_version in versions.items():
+            allocate_slots(camp_id, roster_version)
+    return outcomes
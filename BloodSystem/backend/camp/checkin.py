@@ -0,0 +1,237 @@
+"""
+Offline check-in desks.
+
+A desk tablet downloads the camp roster (approved applicants and their
+attendance) once, works offline, and syncs its queued attendance events in
+batches.
+
+Roster versions: Camp.roster_version is bumped by every write that changes
+the roster (application reviews, slot assignments, attendance) and the
+changed CampApplication and CampAttendance rows are stamped with the new
+value. roster(camp, since) then returns only the rows stamped after the
+version a tablet last saw, using the (camp, roster_version) indexes. The bump is the
+first statement of the writing transaction, so it also takes the write
+lock and concurrent writers stamp distinct, increasing versions.
+
+Sync: each event carries an idempotency key and the client time it was
+recorded at. Keys already stored in CampAttendanceEvent are reported as
+duplicates and skipped, so replaying a batch is safe. The remaining events
+are applied in client time order onto the donors' attendance rows (loaded
+in one query), skipping events older than the last one applied to a row,
+and the rows are written with one bulk_create(update_conflicts=True).
+Donations among them are recorded in the same transaction (camp.donations).
+Client times in the future are clamped to the server time, so a tablet
+with a fast clock cannot pin a row.
+"""
+
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from donor.models import CampApplication
+from .donations import record_camp_donations
+from .models import Camp, CampAttendance, CampAttendanceEvent
+
+ROSTER_STATUSES = ['APPROVED', 'ATTENDED']
+
+ATTENDANCE_STATUSES = [code for code, _ in CampAttendance.STATUS_CHOICES]
+
+SCREENING_FIELDS = {
+    'hemoglobin_level': float,
+    'temperature': float,
+    'weight': float,
+    'blood_pressure': str,
+    'notes': str,
+}
+
+SYNC_LIMIT = 1000
+
+ATTENDANCE_FIELDS = [
+    'status', 'check_in_time', 'checked_in_by', 'donation_time', 'donation_recorded_by', 'units_donated',
+    'last_event_at', 'roster_version', 'updated_at', *SCREENING_FIELDS,
+]
+
+
+def next_roster_version(camp_id):
+    """Bump one camp's roster version and return it; call inside the writing transaction"""
+    return Camp.objects.filter(pk=camp_id).bump_roster_versions()[camp_id]
+
+
+def roster(camp, since=0):
+    """
+    The camp's roster as of its current version: every approved applicant
+    and attendance row when since is 0, otherwise only those changed after
+    version since, plus the donors who left the roster.
+    """
+    # Read the version first: a write committing meanwhile is then sent
+    # again next time rather than missed
+    version = Camp.objects.filter(pk=camp.pk).values_list('roster_version', flat=True).get()
+
+    applications = CampApplication.objects.filter(camp=camp)
+    attendance = CampAttendance.objects.filter(camp=camp)
+    if since:
+        applications = applications.filter(roster_version__gt=since)
+        attendance = attendance.filter(roster_version__gt=since)
+    else:
+        applications = applications.filter(status__in=ROSTER_STATUSES)
+
+    applicants = []
+    removed = []
+    for row in applications.values(
+        'id', 'donor_id', 'status', 'donor__user__first_name', 'donor__user__last_name', 'donor__user__phone',
+        'donor__blood_group', 'slot__start_time', 'slot__end_time'
+    ).order_by('id'):
+        if row['status'] not in ROSTER_STATUSES:
+            removed.append(row['donor_id'])
+            continue
+        applicants.append({
+            'application_id': row['id'],
+            'donor_id': row['donor_id'],
+            'name': f"{row['donor__user__first_name']} {row['donor__user__last_name']}".strip(),
+            'phone': row['donor__user__phone'],
+            'blood_group': row['donor__blood_group'],
+            'slot_start': row['slot__start_time'],
+            'slot_end': row['slot__end_time'],
+        })
+
+    return {
+        'camp_id': camp.id,
+        'version': version,
+        'since': since,
+        'applicants': applicants,
+        'removed': removed,
+        'attendance': list(attendance.values(
+            'donor_id', 'status', 'check_in_time', 'donation_time', 'units_donated', 'last_event_at'
+        ).order_by('donor_id')),
+    }
+
+
+def clean_units_donated(value):
+    """units_donated as an int from 0 to 2 (digit strings from form data allowed); raises ValueError"""
+    if isinstance(value, str) and value.strip().isdigit():
+        value = int(value)
+    if not isinstance(value, int) or isinstance(value, bool) or not 0 <= value <= 2:
+        raise ValueError('units_donated must be between 0 and 2')
+    return value
+
+
+def _parse_event(event):
+    """Return the cleaned event dict or raise ValueError with the reason"""
+    if not isinstance(event, dict):
+        raise ValueError('Event must be an object')
+    key = event.get('key')
+    if not isinstance(key, str) or not 0 < len(key) <= 64:
+        raise ValueError('key must be a string of 1 to 64 characters')
+    donor_id = event.get('donor_id')
+    if not isinstance(donor_id, int) or isinstance(donor_id, bool):
+        raise ValueError('Invalid donor_id')
+    if event.get('status') not in ATTENDANCE_STATUSES:
+        raise ValueError('Invalid status')
+    client_time = parse_datetime(event['client_time']) if isinstance(event.get('client_time'), str) else None
+    if client_time is None:
+        raise ValueError('client_time must be an ISO 8601 date and time')
+    if timezone.is_naive(client_time):
+        client_time = timezone.make_aware(client_time)
+
+    cleaned = {'key': key, 'donor_id': donor_id, 'status': event['status'], 'client_time': client_time}
+    units_donated = event.get('units_donated', 1 if event['status'] == 'DONATED' else None)
+    if units_donated is not None:
+        cleaned['units_donated'] = clean_units_donated(units_donated)
+    for field, cast in SCREENING_FIELDS.items():
+        if event.get(field) is not None:
+            try:
+                cleaned[field] = cast(event[field])
+            except (TypeError, ValueError):
+                raise ValueError(f'Invalid {field}')
+    return cleaned
+
+
+def _apply_event(attendance, event, user):
+    client_time = event['client_time']
+    attendance.status = event['status']
+    attendance.last_event_at = client_time
+    if event['status'] in ('CHECKED_IN', 'DONATED') and attendance.check_in_time is None:
+        attendance.check_in_time = client_time
+        attendance.checked_in_by = user
+    if event['status'] == 'DONATED':
+        attendance.donation_time = client_time
+        attendance.donation_recorded_by = user
+    for field in ('units_donated', *SCREENING_FIELDS):
+        if field in event:
+            setattr(attendance, field, event[field])
+
+
+def sync_attendance(camp, events, user):
+    """
+    Apply a batch of check-in desk events to the camp's attendance.
+    Returns (one outcome dict per event in order, roster version).
+    Outcomes: applied, duplicate (key seen before), stale (older than the
+    donor's last applied event; still recorded) or error.
+    """
+    outcomes = []
+    parsed = {}
+    now = timezone.now()
+    for event in events:
+        outcome = {'key': event.get('key') if isinstance(event, dict) else None}
+        outcomes.append(outcome)
+        try:
+            cleaned = _parse_event(event)
+        except ValueError as e:
+            outcome['error'] = str(e)
+            continue
+        if cleaned['key'] in parsed:
+            outcome['result'] = 'duplicate'
+            continue
+        cleaned['client_time'] = min(cleaned['client_time'], now)
+        parsed[cleaned['key']] = (cleaned, outcome)
+
+    if not parsed:
+        return outcomes, Camp.objects.filter(pk=camp.pk).values_list('roster_version', flat=True).get()
+
+    with transaction.atomic():
+        version = next_roster_version(camp.id)
+
+        seen = set(CampAttendanceEvent.objects.filter(
+            camp=camp, idempotency_key__in=list(parsed)
+        ).values_list('idempotency_key', flat=True))
+        donor_ids = {cleaned['donor_id'] for cleaned, _ in parsed.values()}
+        on_roster = set(CampApplication.objects.filter(
+            camp=camp, status__in=ROSTER_STATUSES, donor_id__in=donor_ids
+        ).values_list('donor_id', flat=True))
+        rows = {
+            attendance.donor_id: attendance
+            for attendance in CampAttendance.objects.filter(camp=camp, donor_id__in=on_roster)
+        }
+
+        changed = {}
+        records = []
+        for cleaned, outcome in sorted(parsed.values(), key=lambda item: item[0]['client_time']):
+            if cleaned['key'] in seen:
+                outcome['result'] = 'duplicate'
+                continue
+            if cleaned['donor_id'] not in on_roster:
+                outcome['error'] = 'Donor is not on the camp roster'
+                continue
+            attendance = rows.get(cleaned['donor_id'])
+            if attendance is None:
+                attendance = rows[cleaned['donor_id']] = CampAttendance(camp=camp, donor_id=cleaned['donor_id'])
+            applied = attendance.last_event_at is None or cleaned['client_time'] >= attendance.last_event_at
+            if applied:
+                _apply_event(attendance, cleaned, user)
+                attendance.roster_version = version
+                changed[cleaned['donor_id']] = attendance
+            outcome['result'] = 'applied' if applied else 'stale'
+            records.append(CampAttendanceEvent(
+                camp=camp, donor_id=cleaned['donor_id'], idempotency_key=cleaned['key'], status=cleaned['status'],
+                client_time=cleaned['client_time'], applied=applied, recorded_by=user
+            ))
+
+        CampAttendance.objects.bulk_create(
+            changed.values(), batch_size=500,
+            update_conflicts=True, unique_fields=['camp', 'donor'], update_fields=ATTENDANCE_FIELDS
+        )
+        CampAttendanceEvent.objects.bulk_create(records, batch_size=500, ignore_conflicts=True)
+        record_camp_donations(
+            camp, [donor_id for donor_id, attendance in changed.items() if attendance.status == 'DONATED'], version
+        )
+    return outcomes, version
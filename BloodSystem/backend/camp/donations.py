@@ -0,0 +1,129 @@
+"""
+Recording camp donations.
+
+An attendance row with status DONATED becomes a DonationHistory row linked
+back to it through DonationHistory.camp_attendance, which is unique, so a
+donation is recorded once however often the attendance is synced. The
+same transaction folds the donations into the derived counters with F()
+increments: DonorProfile eligibility fields via donor.eligibility's
+apply_donations (one UPDATE per donation day), CampRequirement
+units_collected (one UPDATE per blood group) and the applications'
+ATTENDED status.
+
+record_camp_donations() runs after every attendance write (mark_attendance
+and the check-in desk sync) for the donors it touched; close_camp() runs it
+for the whole camp and then finalizes the rest of the attendance and the
+applications with a handful of set-based UPDATEs. Both bump the roster
+version first, which locks the camp row, so two recordings of a camp
+cannot both see the same donation as pending.
+
+Bulk writes do not send post_save, so the donor index is refreshed
+explicitly once the transaction commits.
+"""
+
+from django.db import transaction
+from django.db.models import Exists, F, OuterRef
+from django.utils import timezone
+
+from donor.eligibility import apply_donations
+from donor.eligibility_index import donor_index
+from donor.models import CampApplication, DonationHistory
+from .models import Camp, CampAttendance, CampRequirement
+
+FINAL_ATTENDANCE = {
+    'REGISTERED': 'NO_SHOW',  # Never checked in
+    'CHECKED_IN': 'DEFERRED',  # Checked in but no donation was recorded
+}
+
+
+def record_camp_donations(camp, donor_ids=None, roster_version=None):
+    """
+    Record the camp's DONATED attendance that has no DonationHistory yet
+    (only for donor_ids when given). Returns the number of donations recorded.
+    """
+    with transaction.atomic():
+        if roster_version is None:
+            roster_version = Camp.objects.filter(pk=camp.pk).bump_roster_versions()[camp.pk]
+        pending = CampAttendance.objects.filter(
+            camp=camp, status='DONATED', units_donated__gt=0, donation__isnull=True
+        )
+        if donor_ids is not None:
+            pending = pending.filter(donor_id__in=donor_ids)
+        rows = list(pending.values(
+            'id', 'donor_id', 'donor__blood_group', 'units_donated', 'hemoglobin_level', 'notes', 'donation_time',
+            'last_event_at'
+        ))
+        if not rows:
+            return 0
+
+        now = timezone.now()
+        location = f'{camp.name}, {camp.city}'
+        donations = []
+        donors_by_day = {}
+        units_by_group = {}
+        for row in rows:
+            donation_time = row['donation_time'] or row['last_event_at'] or now
+            donations.append(DonationHistory(
+                donor_id=row['donor_id'], camp_attendance_id=row['id'], donation_date=donation_time,
+                location=location, units_donated=row['units_donated'], blood_group=row['donor__blood_group'],
+                hemoglobin_level=row['hemoglobin_level'], notes=row['notes']
+            ))
+            donors_by_day.setdefault(timezone.localdate(donation_time), []).append(row['donor_id'])
+            units_by_group[row['donor__blood_group']] = units_by_group.get(row['donor__blood_group'], 0) + row['units_donated']
+        DonationHistory.objects.bulk_create(donations, batch_size=500)
+
+        for donation_day, day_donor_ids in donors_by_day.items():
+            apply_donations(day_donor_ids, donation_day)
+
+        tracked = set()
+        for blood_group, units in units_by_group.items():
+            if CampRequirement.objects.filter(camp=camp, blood_group=blood_group).update(
+                units_collected=F('units_collected') + units
+            ):
+                tracked.add(blood_group)
+        # Groups the camp set no target for are still counted, with none needed
+        CampRequirement.objects.bulk_create([
+            CampRequirement(camp=camp, blood_group=blood_group, units_needed=0, units_collected=units)
+            for blood_group, units in units_by_group.items() if blood_group not in tracked
+        ])
+
+        donated = [row['donor_id'] for row in rows]
+        CampApplication.objects.filter(camp=camp, donor_id__in=donated, status='APPROVED').update(
+            status='ATTENDED', roster_version=roster_version
+        )
+        transaction.on_commit(lambda: donor_index.refresh_donors(donated))
+    return len(rows)
+
+
+def close_camp(camp):
+    """
+    Finalize a camp: record outstanding donations, settle attendance that
+    never reached a final status, mark approved applicants ATTENDED or
+    NO_SHOW and complete the camp. Returns a summary of the changes.
+    """
+    with transaction.atomic():
+        roster_version = Camp.objects.filter(pk=camp.pk).bump_roster_versions()[camp.pk]
+        recorded = record_camp_donations(camp, roster_version=roster_version)
+
+        finalized = {}
+        for from_status, to_status in FINAL_ATTENDANCE.items():
+            finalized[to_status] = CampAttendance.objects.filter(camp=camp, status=from_status).update(
+                status=to_status, roster_version=roster_version, updated_at=timezone.now()
+            )
+
+        attended = CampAttendance.objects.filter(
+            camp=camp, donor=OuterRef('donor'), status__in=['DONATED', 'DEFERRED']
+        )
+        approved = CampApplication.objects.filter(camp=camp, status='APPROVED')
+        marked_attended = approved.filter(Exists(attended)).update(status='ATTENDED', roster_version=roster_version)
+        marked_no_show = approved.update(status='NO_SHOW', roster_version=roster_version)
+
+        camp.status = 'COMPLETED'
+        camp.save(update_fields=['status', 'updated_at'])
+    return {
+        'donations_recorded': recorded,
+        'attendance_no_show': finalized['NO_SHOW'],
+        'attendance_deferred': finalized['DEFERRED'],
+        'applications_attended': marked_attended,
+        'applications_no_show': marked_no_show,
+    }
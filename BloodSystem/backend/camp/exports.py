@@ -0,0 +1,109 @@
+"""
+Streaming CSV exports of camp applications and attendance.
+
+export_rows() yields the CSV text a line at a time: the rows come from a
+values_list() over the joined tables read with .iterator(), so only one
+chunk of rows is in memory however large the export, and no model
+instances are built. Cells that a spreadsheet would read as a formula are
+prefixed with a quote.
+"""
+
+import csv
+
+from donor.models import CampApplication
+from .models import CampAttendance
+
+CHUNK_SIZE = 2000
+
+# Column header -> field path, per export
+EXPORTS = {
+    'applications': (CampApplication, {
+        'application_id': 'id',
+        'camp_id': 'camp_id',
+        'camp_name': 'camp__name',
+        'camp_date': 'camp__date',
+        'donor_id': 'donor_id',
+        'first_name': 'donor__user__first_name',
+        'last_name': 'donor__user__last_name',
+        'phone': 'donor__user__phone',
+        'blood_group': 'donor__blood_group',
+        'age': 'age',
+        'weight': 'weight',
+        'last_donation_date': 'last_donation_date',
+        'health_status': 'health_status',
+        'health_issues': 'health_issues',
+        'medications': 'medications',
+        'status': 'status',
+        'preferred_time': 'preferred_time',
+        'slot_start': 'slot__start_time',
+        'slot_end': 'slot__end_time',
+        'applied_at': 'applied_at',
+        'reviewed_at': 'reviewed_at',
+        'rejection_reason': 'rejection_reason',
+    }),
+    'attendance': (CampAttendance, {
+        'attendance_id': 'id',
+        'camp_id': 'camp_id',
+        'camp_name': 'camp__name',
+        'camp_date': 'camp__date',
+        'donor_id': 'donor_id',
+        'first_name': 'donor__user__first_name',
+        'last_name': 'donor__user__last_name',
+        'phone': 'donor__user__phone',
+        'blood_group': 'donor__blood_group',
+        'status': 'status',
+        'check_in_time': 'check_in_time',
+        'donation_time': 'donation_time',
+        'units_donated': 'units_donated',
+        'hemoglobin_level': 'hemoglobin_level',
+        'blood_pressure': 'blood_pressure',
+        'temperature': 'temperature',
+        'weight': 'weight',
+        'notes': 'notes',
+    }),
+}
+
+
+def status_choices(export):
+    model, _ = EXPORTS[export]
+    return [code for code, _ in model.STATUS_CHOICES]
+
+
+def export_queryset(export, camp_profile, camp_id=None, export_status=None, date_from=None, date_to=None):
+    """The organizer's rows for an export, filtered by camp, status and camp date range"""
+    model, columns = EXPORTS[export]
+    rows = model.objects.filter(camp__organizer=camp_profile)
+    if camp_id:
+        rows = rows.filter(camp_id=camp_id)
+    if export_status:
+        rows = rows.filter(status=export_status)
+    if date_from:
+        rows = rows.filter(camp__date__gte=date_from)
+    if date_to:
+        rows = rows.filter(camp__date__lte=date_to)
+    return rows.order_by('camp__date', 'camp_id', 'id').values_list(*columns.values())
+
+
+class _Line:
+    """File-like object whose write() hands back the line csv.writer formatted"""
+
+    def write(self, value):
+        return value
+
+
+def _cell(value):
+    if value is None:
+        return ''
+    if isinstance(value, str) and value[:1] in ('=', '@', '\t', '\r'):
+        return "'" + value
+    if isinstance(value, str) and value[:1] in ('+', '-') and not value[1:].replace(' ', '').isdigit():
+        return "'" + value
+    return value
+
+
+def export_rows(export, queryset):
+    """Yield the export as CSV lines, header first"""
+    writer = csv.writer(_Line())
+    yield writer.writerow(list(EXPORTS[export][1]))
+    for row in queryset.iterator(chunk_size=CHUNK_SIZE):
+        yield writer.writerow([_cell(value) for value in row])
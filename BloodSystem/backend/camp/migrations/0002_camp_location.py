@@ -0,0 +1,32 @@
+# Generated by Django 4.2.7 on 2026-10-18 04:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('camp', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='camp',
+            name='geo_cell',
+            field=models.BigIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='camp',
+            name='latitude',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='camp',
+            name='longitude',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='camp',
+            index=models.Index(fields=['geo_cell', 'date'], name='camp_geo_cell_date_idx'),
+        ),
+    ]
@@ -0,0 +1,70 @@
+# Generated by Django 4.2.7 on 2026-10-18 05:50
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0004_hospital_location'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('camp', '0002_camp_location'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CampAttendanceEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('idempotency_key', models.CharField(max_length=64)),
+                ('status', models.CharField(choices=[('REGISTERED', 'Registered'), ('CHECKED_IN', 'Checked In'), ('DONATED', 'Donated'), ('DEFERRED', 'Deferred'), ('NO_SHOW', 'No Show')], max_length=20)),
+                ('client_time', models.DateTimeField()),
+                ('applied', models.BooleanField(default=True)),
+                ('received_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'db_table': 'camp_attendance_events',
+                'ordering': ['-received_at'],
+            },
+        ),
+        migrations.AddField(
+            model_name='camp',
+            name='roster_version',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='campattendance',
+            name='last_event_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='campattendance',
+            name='roster_version',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='campattendance',
+            index=models.Index(fields=['camp', 'roster_version'], name='camp_attendance_version_idx'),
+        ),
+        migrations.AddField(
+            model_name='campattendanceevent',
+            name='camp',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='attendance_events', to='camp.camp'),
+        ),
+        migrations.AddField(
+            model_name='campattendanceevent',
+            name='donor',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='camp_attendance_events', to='accounts.donorprofile'),
+        ),
+        migrations.AddField(
+            model_name='campattendanceevent',
+            name='recorded_by',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterUniqueTogether(
+            name='campattendanceevent',
+            unique_together={('camp', 'idempotency_key')},
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.7 on 2026-10-18 05:55
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('camp', '0003_attendance_sync'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CampSlot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('start_time', models.TimeField()),
+                ('end_time', models.TimeField()),
+                ('capacity', models.PositiveIntegerField()),
+                ('camp', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='slots', to='camp.camp')),
+            ],
+            options={
+                'db_table': 'camp_slots',
+                'ordering': ['start_time'],
+                'unique_together': {('camp', 'start_time')},
+            },
+        ),
+    ]
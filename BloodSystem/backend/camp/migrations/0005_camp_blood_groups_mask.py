@@ -0,0 +1,35 @@
+# Generated by Django 4.2.7 on 2026-10-18 06:00
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def set_blood_groups_mask(apps, schema_editor):
+    # Same bits as bloodsystem.compatibility.mask_for_groups (unknown codes ignored)
+    Camp = apps.get_model('camp', 'Camp')
+    bits = {code: 1 << index for index, (code, _) in enumerate(settings.BLOOD_GROUPS)}
+    camps = list(Camp.objects.only('id', 'blood_groups_needed'))
+    for camp in camps:
+        groups = camp.blood_groups_needed if isinstance(camp.blood_groups_needed, list) else []
+        camp.blood_groups_mask = sum(bits[code] for code in set(groups) if code in bits)
+    Camp.objects.bulk_update(camps, ['blood_groups_mask'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('camp', '0004_camp_slots'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='camp',
+            name='blood_groups_mask',
+            field=models.PositiveSmallIntegerField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='camp',
+            index=models.Index(fields=['blood_groups_mask', 'date'], name='camp_blood_groups_date_idx'),
+        ),
+        migrations.RunPython(set_blood_groups_mask, migrations.RunPython.noop),
+    ]
@@ -1,6 +1,31 @@
 from django.db import models
 from django.conf import settings
 from accounts.models import CampProfile, DonorProfile
+from bloodsystem.compatibility import RECIPIENT_MASKS, mask_for_groups, masks_overlapping
+from bloodsystem.geo import grid_cell
+
+class CampQuerySet(models.QuerySet):
+    def with_stats(self):
+        """Annotate application counts by status and join the organizer in one query"""
+        return self.select_related('organizer').annotate(
+            num_applications=models.Count('applications'),
+            num_pending_applications=models.Count('applications', filter=models.Q(applications__status='PENDING')),
+            num_approved_applications=models.Count('applications', filter=models.Q(applications__status='APPROVED')),
+        )
+    
+    def needing_donor_group(self, blood_group):
+        """
+        Camps that need a group a donor of blood_group can give to, or did
+        not name any. Matches blood_groups_mask against the list of masks
+        that qualify, so the lookup uses its index.
+        """
+        return self.filter(blood_groups_mask__in=[0] + masks_overlapping(RECIPIENT_MASKS.get(blood_group, 0)))
+    
+    def bump_roster_versions(self):
+        """Bump the roster version of these camps; returns {camp id: new version}. See camp.checkin"""
+        self.update(roster_version=models.F('roster_version') + 1)
+        return dict(self.values_list('id', 'roster_version'))
+
 
 class Camp(models.Model):
     """Blood donation camps"""
@@ -22,6 +47,9 @@ class Camp(models.Model):
     city = models.CharField(max_length=100)
     state = models.CharField(max_length=100)
     pincode = models.CharField(max_length=10)
+    latitude = models.FloatField(null=True, blank=True)
+    longitude = models.FloatField(null=True, blank=True)
+    geo_cell = models.BigIntegerField(null=True, blank=True, editable=False)
     
     # Timing
     date = models.DateField()
@@ -30,11 +58,13 @@ class Camp(models.Model):
     
     # Requirements
     blood_groups_needed = models.JSONField(default=list, help_text="List of blood groups needed")
+    blood_groups_mask = models.PositiveSmallIntegerField(default=0, editable=False)  # blood_groups_needed as bits; see bloodsystem.compatibility
     expected_donors = models.PositiveIntegerField(default=50)
     
     # Status
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='DRAFT')
     is_active = models.BooleanField(default=True)
+    roster_version = models.PositiveIntegerField(default=0)  # Bumped by every roster change; see camp.checkin
     
     # Contact
     contact_person = models.CharField(max_length=200)
@@ -45,13 +75,28 @@ class Camp(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    objects = CampQuerySet.as_manager()
+    
     class Meta:
         db_table = 'camps'
         ordering = ['-date', '-start_time']
+        indexes = [
+            models.Index(fields=['geo_cell', 'date'], name='camp_geo_cell_date_idx'),
+            models.Index(fields=['blood_groups_mask', 'date'], name='camp_blood_groups_date_idx'),
+        ]
     
     def __str__(self):
         return f"{self.name} - {self.date}"
     
+    def save(self, *args, **kwargs):
+        self.geo_cell = grid_cell(self.latitude, self.longitude)
+        self.blood_groups_mask = mask_for_groups(self.blood_groups_needed)
+        if kwargs.get('update_fields') is not None and {'latitude', 'longitude'} & set(kwargs['update_fields']):
+            kwargs['update_fields'] = set(kwargs['update_fields']) | {'geo_cell'}
+        if kwargs.get('update_fields') is not None and 'blood_groups_needed' in kwargs['update_fields']:
+            kwargs['update_fields'] = set(kwargs['update_fields']) | {'blood_groups_mask'}
+        super().save(*args, **kwargs)
+    
     @property
     def is_upcoming(self):
         from django.utils import timezone
@@ -59,10 +104,14 @@ class Camp(models.Model):
     
     @property
     def applications_count(self):
+        if hasattr(self, 'num_applications'):
+            return self.num_applications
         return self.applications.count()
     
     @property
     def approved_applications_count(self):
+        if hasattr(self, 'num_approved_applications'):
+            return self.num_approved_applications
         return self.applications.filter(status='APPROVED').count()
 
 
@@ -81,6 +130,23 @@ class CampRequirement(models.Model):
         return f"{self.camp.name} - {self.blood_group}: {self.units_needed} units"
 
 
+class CampSlot(models.Model):
+    """A capacity-limited arrival window of a camp; see camp.slots"""
+    
+    camp = models.ForeignKey(Camp, on_delete=models.CASCADE, related_name='slots')
+    start_time = models.TimeField()
+    end_time = models.TimeField()
+    capacity = models.PositiveIntegerField()
+    
+    class Meta:
+        db_table = 'camp_slots'
+        unique_together = ['camp', 'start_time']
+        ordering = ['start_time']
+    
+    def __str__(self):
+        return f"{self.camp.name} - {self.start_time:%H:%M}-{self.end_time:%H:%M}"
+
+
 class CampAttendance(models.Model):
     """Track donor attendance at camps"""
     
@@ -109,6 +175,8 @@ class CampAttendance(models.Model):
     # Status
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='REGISTERED')
     notes = models.TextField(blank=True)
+    last_event_at = models.DateTimeField(null=True, blank=True)  # Client time of the last check-in desk event applied
+    roster_version = models.PositiveIntegerField(default=0)
     
     # Staff
     checked_in_by = models.ForeignKey('accounts.User', on_delete=models.SET_NULL, null=True, blank=True, related_name='checked_in_donors')
@@ -121,6 +189,34 @@ class CampAttendance(models.Model):
         db_table = 'camp_attendance'
         unique_together = ['camp', 'donor']
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['camp', 'roster_version'], name='camp_attendance_version_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.donor.user.get_full_name()} - {self.camp.name}"
+
+
+class CampAttendanceEvent(models.Model):
+    """
+    An attendance event synced from a check-in desk. The idempotency key is
+    unique per camp, so a batch replayed after a lost response is not
+    applied twice; see camp.checkin.
+    """
+    
+    camp = models.ForeignKey(Camp, on_delete=models.CASCADE, related_name='attendance_events')
+    donor = models.ForeignKey(DonorProfile, on_delete=models.CASCADE, related_name='camp_attendance_events')
+    idempotency_key = models.CharField(max_length=64)
+    status = models.CharField(max_length=20, choices=CampAttendance.STATUS_CHOICES)
+    client_time = models.DateTimeField()
+    applied = models.BooleanField(default=True)  # False when a later event for the donor had already been applied
+    recorded_by = models.ForeignKey('accounts.User', on_delete=models.SET_NULL, null=True, blank=True)
+    received_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        db_table = 'camp_attendance_events'
+        unique_together = ['camp', 'idempotency_key']
+        ordering = ['-received_at']
     
     def __str__(self):
-        return f"{self.donor.user.get_full_name()} - {self.camp.name}"
\ No newline at end of file
+        return f"{self.camp.name} - {self.idempotency_key}: {self.status}"
\ No newline at end of file
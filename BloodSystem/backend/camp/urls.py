@@ -8,11 +8,19 @@ urlpatterns = [
     # Camps Management
     path('camps/', views.camps_list, name='camps_list'),
     path('camps/create/', views.create_camp, name='create_camp'),
+    path('camps/slots/allocate/', views.allocate_camp_slots, name='allocate_camp_slots'),
+    path('camps/close/', views.close_camp_day, name='close_camp_day'),
     
     # Applications
     path('applications/', views.camp_applications, name='camp_applications'),
     path('applications/review/', views.review_application, name='review_application'),
+    path('applications/review/bulk/', views.bulk_review_applications, name='bulk_review_applications'),
+    
+    # Exports
+    path('export/', views.export_camp_data, name='export_camp_data'),
     
     # Attendance
     path('attendance/mark/', views.mark_attendance, name='mark_attendance'),
+    path('attendance/roster/', views.attendance_roster, name='attendance_roster'),
+    path('attendance/sync/', views.sync_attendance_events, name='sync_attendance_events'),
 ]
\ No newline at end of file
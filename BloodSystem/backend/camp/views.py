@@ -2,11 +2,22 @@ from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework import status
+from django.db import transaction
+from django.http import StreamingHttpResponse
+from django.utils.dateparse import parse_date
 from django.utils import timezone
 from datetime import timedelta
 from .models import Camp, CampRequirement, CampAttendance
+from .applications import BULK_REVIEW_LIMIT, apply_decision, decision_notification, review_applications
+from .checkin import (
+    ATTENDANCE_STATUSES, SYNC_LIMIT, clean_units_donated, next_roster_version, roster, sync_attendance
+)
+from .slots import allocate_slots, rebuild_slots, slot_summary
+from .donations import close_camp, record_camp_donations
+from .exports import EXPORTS, export_queryset, export_rows, status_choices
 from donor.models import CampApplication
 from accounts.models import CampProfile
+from bloodsystem.geo import parse_coordinates
 from notifications.views import create_notification
 
 @api_view(['GET'])
@@ -61,7 +72,7 @@ def camps_list(request):
     try:
         camp_profile = request.user.camp_profile
         
-        camps = Camp.objects.filter(
+        camps = Camp.objects.with_stats().filter(
             organizer=camp_profile
         ).order_by('-date')
         
@@ -110,6 +121,11 @@ def create_camp(request):
         camp_profile = request.user.camp_profile
         print("Camp profile found:", camp_profile.organization_name)
         
+        try:
+            latitude, longitude = parse_coordinates(request.data.get('latitude'), request.data.get('longitude'))
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
         camp = Camp.objects.create(
             organizer=camp_profile,
             name=request.data.get('name'),
@@ -119,6 +135,8 @@ def create_camp(request):
             city=request.data.get('city'),
             state=request.data.get('state'),
             pincode=request.data.get('pincode'),
+            latitude=latitude,
+            longitude=longitude,
             date=request.data.get('date'),
             start_time=request.data.get('start_time'),
             end_time=request.data.get('end_time'),
@@ -195,6 +213,52 @@ def camp_applications(request):
         return Response({'error': 'Camp profile not found'}, status=status.HTTP_404_NOT_FOUND)
 
 
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def export_camp_data(request):
+    """
+    Stream all of the organizer's applications or attendance as CSV.
+
+    Query parameters: type (applications or attendance), and optionally
+    camp_id, status and date_from / date_to (camp date, YYYY-MM-DD).
+    """
+    if request.user.role != 'CAMP':
+        return Response({'error': 'Access denied'}, status=status.HTTP_403_FORBIDDEN)
+    
+    try:
+        camp_profile = request.user.camp_profile
+        export = request.GET.get('type', 'applications')
+        camp_id = request.GET.get('camp_id')
+        export_status = request.GET.get('status')
+        
+        if export not in EXPORTS:
+            return Response({'error': f'type must be one of {", ".join(EXPORTS)}'}, status=status.HTTP_400_BAD_REQUEST)
+        if export_status and export_status not in status_choices(export):
+            return Response({'error': 'Invalid status'}, status=status.HTTP_400_BAD_REQUEST)
+        if camp_id and not Camp.objects.filter(id=camp_id, organizer=camp_profile).exists():
+            return Response({'error': 'Camp not found'}, status=status.HTTP_404_NOT_FOUND)
+        
+        dates = {}
+        for param in ('date_from', 'date_to'):
+            if request.GET.get(param):
+                try:
+                    dates[param] = parse_date(request.GET[param])
+                except ValueError:
+                    dates[param] = None
+                if dates[param] is None:
+                    return Response({'error': f'{param} must be a date (YYYY-MM-DD)'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        queryset = export_queryset(export, camp_profile, camp_id, export_status, **dates)
+        response = StreamingHttpResponse(export_rows(export, queryset), content_type='text/csv')
+        filename = f'camp-{export}-{camp_id}.csv' if camp_id else f'camp-{export}.csv'
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
+    except (ValueError, TypeError):
+        return Response({'error': 'Camp not found'}, status=status.HTTP_404_NOT_FOUND)
+    except CampProfile.DoesNotExist:
+        return Response({'error': 'Camp profile not found'}, status=status.HTTP_404_NOT_FOUND)
+
+
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def review_application(request):
@@ -210,32 +274,19 @@ def review_application(request):
         if not application_id or decision not in ['APPROVED', 'REJECTED']:
             return Response({'error': 'Invalid application ID or decision'}, status=status.HTTP_400_BAD_REQUEST)
         
-        application = CampApplication.objects.get(
+        application = CampApplication.objects.select_related('donor__user', 'camp').get(
             id=application_id,
             camp__organizer=request.user.camp_profile
         )
         
-        application.status = decision
-        application.reviewed_at = timezone.now()
-        application.reviewed_by = request.user
-        application.rejection_reason = notes if decision == 'REJECTED' else ''
-        application.save()
-        
-        # Create notification for donor
-        if decision == 'APPROVED':
-            create_notification(
-                recipient=application.donor.user,
-                title='Camp Application Approved',
-                message=f'Your application for "{application.camp.name}" has been approved! Please check your email for further details.',
-                notification_type='CAMP_APPROVAL'
-            )
-        else:
-            create_notification(
-                recipient=application.donor.user,
-                title='Camp Application Rejected',
-                message=f'Your application for "{application.camp.name}" has been rejected. {notes if notes else "Please try applying to other camps."}',
-                notification_type='CAMP_REJECTION'
-            )
+        apply_decision(application, decision, notes, request.user, timezone.now())
+        with transaction.atomic():
+            application.roster_version = next_roster_version(application.camp_id)
+            application.save()
+            allocate_slots(application.camp_id, application.roster_version)
+            
+            # Create notification for donor
+            create_notification(**decision_notification(application, decision, notes))
         
         return Response({
             'message': f'Application {decision.lower()} successfully',
@@ -248,6 +299,33 @@ def review_application(request):
         return Response({'error': 'Camp profile not found'}, status=status.HTTP_404_NOT_FOUND)
 
 
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def bulk_review_applications(request):
+    """Review many camp applications in one request"""
+    if request.user.role != 'CAMP':
+        return Response({'error': 'Access denied'}, status=status.HTTP_403_FORBIDDEN)
+    
+    try:
+        camp_profile = request.user.camp_profile
+        decisions = request.data.get('decisions')
+        
+        if not isinstance(decisions, list) or not decisions:
+            return Response({'error': 'decisions must be a non-empty list'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(decisions) > BULK_REVIEW_LIMIT:
+            return Response({'error': f'At most {BULK_REVIEW_LIMIT} decisions per request'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        results = review_applications(camp_profile, decisions, request.user)
+        
+        return Response({
+            'results': results,
+            'reviewed': sum(1 for result in results if 'status' in result),
+            'failed': sum(1 for result in results if 'error' in result)
+        })
+    except CampProfile.DoesNotExist:
+        return Response({'error': 'Camp profile not found'}, status=status.HTTP_404_NOT_FOUND)
+
+
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def mark_attendance(request):
@@ -260,29 +338,49 @@ def mark_attendance(request):
         donor_id = request.data.get('donor_id')
         attendance_status = request.data.get('status', 'CHECKED_IN')
         
-        camp = Camp.objects.get(id=camp_id, organizer=request.user.camp_profile)
+        if attendance_status not in ATTENDANCE_STATUSES:
+            return Response({'error': 'Invalid status'}, status=status.HTTP_400_BAD_REQUEST)
+        units_donated = None
+        if attendance_status == 'DONATED':
+            try:
+                units_donated = clean_units_donated(request.data.get('units_donated', 1))
+            except ValueError as e:
+                return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
         
-        # Get or create attendance record
-        attendance, created = CampAttendance.objects.get_or_create(
-            camp=camp,
-            donor_id=donor_id,
-            defaults={
-                'status': attendance_status,
-                'checked_in_by': request.user
-            }
-        )
+        camp = Camp.objects.get(id=camp_id, organizer=request.user.camp_profile)
         
-        if not created:
-            attendance.status = attendance_status
-            if attendance_status == 'CHECKED_IN':
-                attendance.check_in_time = timezone.now()
-                attendance.checked_in_by = request.user
-            elif attendance_status == 'DONATED':
-                attendance.donation_time = timezone.now()
-                attendance.donation_recorded_by = request.user
-                attendance.units_donated = request.data.get('units_donated', 1)
+        with transaction.atomic():
+            roster_version = next_roster_version(camp.id)
             
-            attendance.save()
+            # Get or create attendance record
+            attendance, created = CampAttendance.objects.get_or_create(
+                camp=camp,
+                donor_id=donor_id,
+                defaults={
+                    'status': attendance_status,
+                    'checked_in_by': request.user,
+                    'last_event_at': timezone.now(),
+                    'roster_version': roster_version
+                }
+            )
+            
+            if not created or attendance_status == 'DONATED':
+                attendance.status = attendance_status
+                attendance.last_event_at = timezone.now()
+                attendance.roster_version = roster_version
+                if attendance_status == 'CHECKED_IN':
+                    attendance.check_in_time = timezone.now()
+                    attendance.checked_in_by = request.user
+                elif attendance_status == 'DONATED':
+                    attendance.donation_time = timezone.now()
+                    attendance.donation_recorded_by = request.user
+                    attendance.units_donated = units_donated
+                
+                attendance.save()
+            
+            # Write the donation history and counters for a donation
+            if attendance_status == 'DONATED':
+                record_camp_donations(camp, [attendance.donor_id], roster_version)
         
         return Response({
             'message': 'Attendance marked successfully',
@@ -292,4 +390,118 @@ def mark_attendance(request):
     except Camp.DoesNotExist:
         return Response({'error': 'Camp not found'}, status=status.HTTP_404_NOT_FOUND)
     except CampProfile.DoesNotExist:
-        return Response({'error': 'Camp profile not found'}, status=status.HTTP_404_NOT_FOUND)
\ No newline at end of file
+        return Response({'error': 'Camp profile not found'}, status=status.HTTP_404_NOT_FOUND)
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def close_camp_day(request):
+    """Close a camp: record its donations and finalize attendance and applications"""
+    if request.user.role != 'CAMP':
+        return Response({'error': 'Access denied'}, status=status.HTTP_403_FORBIDDEN)
+    
+    try:
+        camp = Camp.objects.get(id=request.data.get('camp_id'), organizer=request.user.camp_profile)
+        
+        if camp.status not in ['ACTIVE', 'COMPLETED']:
+            return Response({'error': f'Cannot close a {camp.status.lower()} camp'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        summary = close_camp(camp)
+        
+        return Response({
+            'message': 'Camp closed successfully',
+            'camp_id': camp.id,
+            'status': camp.status,
+            **summary
+        })
+    except (Camp.DoesNotExist, ValueError, TypeError):
+        return Response({'error': 'Camp not found'}, status=status.HTTP_404_NOT_FOUND)
+    except CampProfile.DoesNotExist:
+        return Response({'error': 'Camp profile not found'}, status=status.HTTP_404_NOT_FOUND)
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def allocate_camp_slots(request):
+    """Split a camp into arrival slots (first time or with rebuild) and assign approved donors to them"""
+    if request.user.role != 'CAMP':
+        return Response({'error': 'Access denied'}, status=status.HTTP_403_FORBIDDEN)
+    
+    try:
+        camp = Camp.objects.get(id=request.data.get('camp_id'), organizer=request.user.camp_profile)
+        slot_minutes = request.data.get('slot_minutes')
+        
+        if slot_minutes is not None and (not isinstance(slot_minutes, int) or not 10 <= slot_minutes <= 240):
+            return Response({'error': 'slot_minutes must be between 10 and 240'}, status=status.HTTP_400_BAD_REQUEST)
+        if camp.start_time >= camp.end_time:
+            return Response({'error': 'Camp has no opening hours to split'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        if request.data.get('rebuild') or not camp.slots.exists():
+            assigned, waiting = rebuild_slots(camp, slot_minutes)
+        else:
+            assigned, waiting = allocate_slots(camp.id)
+        
+        return Response({
+            'camp_id': camp.id,
+            'assigned': assigned,
+            'waiting': waiting,
+            'slots': slot_summary(camp.id)
+        })
+    except (Camp.DoesNotExist, ValueError, TypeError):
+        return Response({'error': 'Camp not found'}, status=status.HTTP_404_NOT_FOUND)
+    except CampProfile.DoesNotExist:
+        return Response({'error': 'Camp profile not found'}, status=status.HTTP_404_NOT_FOUND)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def attendance_roster(request):
+    """Roster of approved applicants and attendance for check-in desks, optionally only changes since a version"""
+    if request.user.role != 'CAMP':
+        return Response({'error': 'Access denied'}, status=status.HTTP_403_FORBIDDEN)
+    
+    try:
+        camp = Camp.objects.get(id=request.GET.get('camp_id'), organizer=request.user.camp_profile)
+        
+        try:
+            since = int(request.GET.get('since', 0))
+        except ValueError:
+            return Response({'error': 'since must be a roster version'}, status=status.HTTP_400_BAD_REQUEST)
+        if since < 0:
+            return Response({'error': 'since must be a roster version'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        return Response(roster(camp, since))
+    except (Camp.DoesNotExist, ValueError):
+        return Response({'error': 'Camp not found'}, status=status.HTTP_404_NOT_FOUND)
+    except CampProfile.DoesNotExist:
+        return Response({'error': 'Camp profile not found'}, status=status.HTTP_404_NOT_FOUND)
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def sync_attendance_events(request):
+    """Apply a batch of attendance events queued by an offline check-in desk"""
+    if request.user.role != 'CAMP':
+        return Response({'error': 'Access denied'}, status=status.HTTP_403_FORBIDDEN)
+    
+    try:
+        camp = Camp.objects.get(id=request.data.get('camp_id'), organizer=request.user.camp_profile)
+        events = request.data.get('events')
+        
+        if not isinstance(events, list) or not events:
+            return Response({'error': 'events must be a non-empty list'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(events) > SYNC_LIMIT:
+            return Response({'error': f'At most {SYNC_LIMIT} events per request'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        results, version = sync_attendance(camp, events, request.user)
+        
+        return Response({
+            'results': results,
+            'version': version,
+            'applied': sum(1 for result in results if result.get('result') == 'applied'),
+            'failed': sum(1 for result in results if 'error' in result)
+        })
+    except (Camp.DoesNotExist, ValueError, TypeError):
+        return Response({'error': 'Camp not found'}, status=status.HTTP_404_NOT_FOUND)
+    except CampProfile.DoesNotExist:
+        return Response({'error': 'Camp profile not found'}, status=status.HTTP_404_NOT_FOUND)
@@ -12,7 +12,9 @@ django.setup()
 from accounts.models import User, DonorProfile, HospitalProfile, CampProfile, PatientProfile
 from camp.models import Camp
 from donor.models import DonationHistory, CampApplication
-from hospital.models import BloodStock, HospitalNetwork
+from donor.eligibility import record_donation
+from hospital.models import HospitalNetwork
+from hospital.stock import change_stock, provision_stock_rows, refresh_expiry_alerts
 from notifications.models import Notification
 
 def create_dummy_data():
@@ -195,15 +197,15 @@ def create_dummy_data():
         
         hospital_profiles.append(hospital_profile)
         
-        # Create blood stock for hospitals with blood banks
+        # Create blood stock for hospitals with blood banks: the units go in
+        # through change_stock so that they have batches and alert levels
         if hospital_data['has_blood_bank']:
+            provision_stock_rows([hospital_profile.id])
             for blood_group in blood_groups:
-                BloodStock.objects.create(
-                    hospital=hospital_profile,
-                    blood_group=blood_group,
-                    units_available=random.randint(5, 50),
-                    units_reserved=random.randint(0, 5),
-                    expiry_alerts=random.randint(0, 3)
+                collected_on = datetime.now().date() - timedelta(days=random.randint(0, 30))
+                change_stock(
+                    hospital_profile, blood_group, 'add', random.randint(5, 50),
+                    notes='Dummy data', collected_on=collected_on
                 )
         
         created_users.append({
@@ -215,6 +217,8 @@ def create_dummy_data():
         })
         print(f"✅ Created hospital: {hospital_data['hospital_name']}")
     
+    refresh_expiry_alerts()
+    
     # Create hospital network connections
     print("\n   Creating hospital network connections...")
     for i, hospital1 in enumerate(hospital_profiles):
@@ -387,12 +391,11 @@ def create_dummy_data():
         if random.choice([True, False]):  # 50% chance of having donation history
             for j in range(random.randint(1, 5)):
                 donation_date = datetime.now() - timedelta(days=random.randint(60, 365*3))
-                DonationHistory.objects.create(
-                    donor=donor_profile,
+                record_donation(
+                    donor_profile,
                     donation_date=donation_date,
                     location=f"{random.choice(['Hospital', 'Camp', 'Blood Bank'])} - {city}",
                     units_donated=1,
-                    blood_group=donor_profile.blood_group,
                     hemoglobin_level=random.uniform(12.0, 16.0),
                     notes='Successful donation'
                 )
@@ -3,4 +3,7 @@ from django.apps import AppConfig
 
 class DonorConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
-    name = 'donor'
\ No newline at end of file
+    name = 'donor'
+
+    def ready(self):
+        from . import signals  # noqa: F401
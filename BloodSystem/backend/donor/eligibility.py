@@ -0,0 +1,113 @@
+"""
+Donor eligibility bookkeeping.
+
+DonorProfile.total_donations, last_donation_date, next_eligible_date and
+is_eligible are a materialized summary of DonationHistory. They are
+updated in the same transaction as every recorded donation, and
+recompute_eligibility() rebuilds them from scratch for repair or backfill.
+
+is_eligible also changes with the date alone: a donor becomes eligible
+again on next_eligible_date without any write. refresh_eligibility() sets
+the flag back for every donor whose date has come, with one UPDATE; the
+refresh_donor_eligibility command runs it and is meant to be scheduled
+daily, shortly after midnight. Code that needs the answer for today
+should compare next_eligible_date with the date rather than trust the flag.
+"""
+
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, Count, F, Max, Q, Value, When
+from django.utils import timezone
+
+from accounts.models import DonorProfile
+from .models import DonationHistory
+
+
+def next_eligible_after(donation_day):
+    """First date a donor may give again after donating on donation_day"""
+    return donation_day + timedelta(days=settings.DONATION_GAP_DAYS)
+
+
+def apply_donations(donor_ids, donation_day, count=1):
+    """
+    Fold count donations on donation_day into the profiles of donor_ids
+    with a single UPDATE. Counters are incremented with F() and the
+    date fields only move forward, so concurrent and out-of-order
+    recordings stay consistent.
+    """
+    next_eligible = next_eligible_after(donation_day)
+    is_newer = Q(last_donation_date__isnull=True) | Q(last_donation_date__lt=donation_day)
+    return DonorProfile.objects.filter(pk__in=donor_ids).update(
+        total_donations=F('total_donations') + count,
+        last_donation_date=Case(When(is_newer, then=Value(donation_day)), default=F('last_donation_date')),
+        next_eligible_date=Case(When(is_newer, then=Value(next_eligible)), default=F('next_eligible_date')),
+        is_eligible=Case(
+            When(is_newer, then=Value(next_eligible <= timezone.localdate())),
+            default=F('is_eligible')
+        ),
+    )
+
+
+def refresh_eligibility(today=None):
+    """Mark eligible the donors whose next_eligible_date has come; returns the number updated"""
+    today = today or timezone.localdate()
+    return DonorProfile.objects.filter(is_eligible=False, next_eligible_date__lte=today).update(is_eligible=True)
+
+
+def record_donation(donor, donation_date, location, units_donated=1, hemoglobin_level=None, notes=''):
+    """
+    Create a DonationHistory row and update the donor's eligibility fields
+    atomically. donation_date may be a date or a datetime; naive values
+    are taken as local time.
+    """
+    if not isinstance(donation_date, datetime):
+        donation_date = datetime.combine(donation_date, time.min)
+    if timezone.is_naive(donation_date):
+        donation_date = timezone.make_aware(donation_date)
+    with transaction.atomic():
+        donation = DonationHistory.objects.create(
+            donor=donor,
+            donation_date=donation_date,
+            location=location,
+            units_donated=units_donated,
+            blood_group=donor.blood_group,
+            hemoglobin_level=hemoglobin_level,
+            notes=notes
+        )
+        apply_donations([donor.id], timezone.localdate(donation_date))
+    return donation
+
+
+def recompute_eligibility(donor_ids):
+    """Rebuild eligibility fields for donor_ids from DonationHistory (two queries plus one bulk UPDATE)"""
+    today = timezone.localdate()
+    history = {
+        row['donor_id']: row
+        for row in DonationHistory.objects.filter(donor_id__in=donor_ids)
+        .order_by()
+        .values('donor_id')
+        .annotate(total=Count('id'), last=Max('donation_date'))
+    }
+
+    profiles = list(DonorProfile.objects.filter(pk__in=donor_ids).only(
+        'id', 'total_donations', 'last_donation_date', 'next_eligible_date', 'is_eligible'
+    ))
+    for profile in profiles:
+        row = history.get(profile.id)
+        if row:
+            profile.total_donations = row['total']
+            profile.last_donation_date = timezone.localdate(row['last'])
+        else:
+            # No recorded history: keep a self-reported last donation date, if any
+            profile.total_donations = 0
+        profile.next_eligible_date = (
+            next_eligible_after(profile.last_donation_date) if profile.last_donation_date else None
+        )
+        profile.is_eligible = profile.next_eligible_date is None or profile.next_eligible_date <= today
+
+    DonorProfile.objects.bulk_update(
+        profiles, ['total_donations', 'last_donation_date', 'next_eligible_date', 'is_eligible']
+    )
+    return len(profiles)
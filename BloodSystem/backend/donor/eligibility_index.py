@@ -0,0 +1,249 @@
+"""
+In-memory bitmap index of donors for emergency targeting.
+
+Donors are bucketed by (city, blood group). Each donor gets a dense bit
+position (0, 1, 2, ... in the order they are indexed, whatever their
+profile ids) and each bucket is a Python int used as a bitset over those
+positions, so answering "eligible donors in city X who can give to group
+Y" is a handful of bitwise ORs over the compatible groups and one AND NOT
+against the ineligible set, with no database access.
+
+Usage from other apps:
+
+    from donor.eligibility_index import donor_index
+
+    donor_ids = donor_index.eligible_donor_ids('Pune', 'A+')
+    count = donor_index.count_eligible('Pune', 'A+')
+
+Bit positions are reassigned by every rebuild, so a bitmap from bitmap()
+or eligible_bitmap() must be turned into ids with to_ids() straight away.
+
+The index is built lazily on first use and kept current incrementally by
+the receivers in donor/signals.py. Each process holds its own copy, so
+writes made by other processes are picked up by the periodic rebuild
+(settings.DONOR_INDEX_REBUILD_SECONDS). A rebuild loads the new index
+without holding the lock, so queries keep using the old one meanwhile,
+and swaps it in at the end; donors updated while it was loading are then
+reloaded on top.
+"""
+
+import heapq
+import threading
+import time
+
+from django.conf import settings
+from django.utils import timezone
+
+from accounts.models import DonorProfile, normalize_city
+from bloodsystem.compatibility import donor_groups
+
+
+def _bitmap_count(bitmap):
+    return bin(bitmap).count('1')
+
+
+class DonorBitmapIndex:
+    """Bitsets of donor positions keyed by (city, blood group) plus an ineligible bitset"""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._build_lock = threading.Lock()  # One rebuild at a time
+        self._built_at = None
+        self._touched = None        # donor ids updated while a rebuild loads, else None
+        self._buckets = {}          # city_key -> {blood_group: bitmap}
+        self._ineligible = 0        # bitmap of donors inside their donation gap
+        self._donors = {}           # donor_id -> (city_key, blood_group, next_eligible_date)
+        self._positions = {}        # donor_id -> bit position
+        self._ids = []              # bit position -> donor_id
+        self._eligible_queue = []   # heap of (next_eligible_date, donor_id)
+
+    # Maintenance
+
+    def build(self):
+        """(Re)load the whole index from the database and swap it in"""
+        with self._build_lock:
+            with self._lock:
+                self._touched = set()
+
+            buckets = {}
+            ineligible = 0
+            donors = {}
+            positions = {}
+            ids = []
+            queue = []
+            today = timezone.now().date()
+
+            rows = DonorProfile.objects.filter(user__is_active=True).values_list(
+                'id', 'city', 'blood_group', 'next_eligible_date'
+            ).order_by('id').iterator(chunk_size=5000)
+            for donor_id, city, blood_group, next_eligible_date in rows:
+                city_key = normalize_city(city)
+                positions[donor_id] = len(ids)
+                bit = 1 << len(ids)
+                ids.append(donor_id)
+                groups = buckets.setdefault(city_key, {})
+                groups[blood_group] = groups.get(blood_group, 0) | bit
+                donors[donor_id] = (city_key, blood_group, next_eligible_date)
+                if next_eligible_date and next_eligible_date > today:
+                    ineligible |= bit
+                    queue.append((next_eligible_date, donor_id))
+            heapq.heapify(queue)
+
+            with self._lock:
+                self._buckets = buckets
+                self._ineligible = ineligible
+                self._donors = donors
+                self._positions = positions
+                self._ids = ids
+                self._eligible_queue = queue
+                self._built_at = time.monotonic()
+                touched, self._touched = self._touched, None
+        # Their rows may have been read before the write that touched them
+        self.refresh_donors(touched)
+
+    def _ensure_built(self):
+        """Build on first use; past the rebuild interval, rebuild unless another thread already is"""
+        if self._built_at is None:
+            with self._build_lock:
+                built = self._built_at is not None
+            if not built:
+                self.build()
+            return
+        max_age = getattr(settings, 'DONOR_INDEX_REBUILD_SECONDS', 300)
+        if time.monotonic() - self._built_at > max_age and not self._build_lock.locked():
+            self.build()
+
+    def _bit(self, donor_id):
+        """The donor's bit, giving it the next free position if it has none"""
+        position = self._positions.get(donor_id)
+        if position is None:
+            position = self._positions[donor_id] = len(self._ids)
+            self._ids.append(donor_id)
+        return 1 << position
+
+    def _promote_due(self):
+        """Clear the ineligible bit of donors whose donation gap has elapsed"""
+        today = timezone.now().date()
+        queue = self._eligible_queue
+        while queue and queue[0][0] <= today:
+            next_eligible_date, donor_id = heapq.heappop(queue)
+            entry = self._donors.get(donor_id)
+            # Skip stale heap entries left behind by later updates
+            if entry and entry[2] == next_eligible_date:
+                self._ineligible &= ~self._bit(donor_id)
+
+    def update_donor(self, donor_id, city, blood_group, next_eligible_date, is_active=True):
+        """Insert, move or remove a single donor"""
+        with self._lock:
+            if self._touched is not None:
+                self._touched.add(donor_id)
+            if self._built_at is None:
+                return  # Nothing to patch; the first query builds from the database
+            self._discard(donor_id)
+            if not is_active:
+                return
+
+            city_key = normalize_city(city)
+            bit = self._bit(donor_id)
+            groups = self._buckets.setdefault(city_key, {})
+            groups[blood_group] = groups.get(blood_group, 0) | bit
+            self._donors[donor_id] = (city_key, blood_group, next_eligible_date)
+            if next_eligible_date and next_eligible_date > timezone.now().date():
+                self._ineligible |= bit
+                heapq.heappush(self._eligible_queue, (next_eligible_date, donor_id))
+
+    def remove_donor(self, donor_id):
+        with self._lock:
+            if self._touched is not None:
+                self._touched.add(donor_id)
+            self._discard(donor_id)
+
+    def _discard(self, donor_id):
+        # The position is kept, so a donor who comes back reuses it; rebuilds compact
+        entry = self._donors.pop(donor_id, None)
+        if entry is None:
+            return
+        city_key, blood_group, _ = entry
+        bit = self._bit(donor_id)
+        groups = self._buckets.get(city_key, {})
+        remaining = groups.get(blood_group, 0) & ~bit
+        if remaining:
+            groups[blood_group] = remaining
+        else:
+            groups.pop(blood_group, None)
+            if not groups:
+                self._buckets.pop(city_key, None)
+        self._ineligible &= ~bit
+
+    def refresh_donors(self, donor_ids):
+        """Reload the given donors from the database (one query)"""
+        donor_ids = set(donor_ids or ())
+        if not donor_ids or self._built_at is None:
+            return
+        rows = DonorProfile.objects.filter(pk__in=donor_ids).values_list(
+            'id', 'city', 'blood_group', 'next_eligible_date', 'user__is_active'
+        )
+        seen = set()
+        for donor_id, city, blood_group, next_eligible_date, is_active in rows:
+            seen.add(donor_id)
+            self.update_donor(donor_id, city, blood_group, next_eligible_date, is_active)
+        for donor_id in donor_ids - seen:
+            self.remove_donor(donor_id)
+
+    # Queries
+
+    def bitmap(self, city=None, blood_groups=None, eligible_only=True):
+        """
+        Bitmap of donors in city (all cities if None) with one of
+        blood_groups (all groups if None).
+        """
+        self._ensure_built()
+        with self._lock:
+            return self._bitmap(city, blood_groups, eligible_only)
+
+    def _bitmap(self, city, blood_groups, eligible_only):
+        # Call with the lock held
+        self._promote_due()
+        if city is None:
+            cities = self._buckets.values()
+        else:
+            cities = [self._buckets.get(normalize_city(city), {})]
+
+        result = 0
+        for groups in cities:
+            if blood_groups is None:
+                for bucket in groups.values():
+                    result |= bucket
+            else:
+                for blood_group in blood_groups:
+                    result |= groups.get(blood_group, 0)
+        if eligible_only:
+            result &= ~self._ineligible
+        return result
+
+    def eligible_bitmap(self, city, recipient_group):
+        """Donors in city who can give to recipient_group right now"""
+        return self.bitmap(city, donor_groups(recipient_group))
+
+    def count_eligible(self, city, recipient_group):
+        return _bitmap_count(self.eligible_bitmap(city, recipient_group))
+
+    def eligible_donor_ids(self, city, recipient_group):
+        self._ensure_built()
+        # Hold the lock so that a rebuild cannot renumber positions in between
+        with self._lock:
+            return self.to_ids(self._bitmap(city, donor_groups(recipient_group), True))
+
+    def to_ids(self, bitmap):
+        """Donor ids set in bitmap, ascending"""
+        bits = bin(bitmap)[:1:-1]
+        with self._lock:
+            ids = self._ids
+            return sorted(ids[position] for position, bit in enumerate(bits) if bit == '1')
+
+    @staticmethod
+    def count(bitmap):
+        return _bitmap_count(bitmap)
+
+
+donor_index = DonorBitmapIndex()
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from accounts.models import DonorProfile
+from donor.eligibility import recompute_eligibility
+
+
+class Command(BaseCommand):
+    help = 'Recompute donor eligibility fields from donation history in chunked batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Donors per batch (default 1000)')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        last_id = 0
+        total = 0
+
+        while True:
+            donor_ids = list(
+                DonorProfile.objects.filter(pk__gt=last_id)
+                .order_by('pk')
+                .values_list('pk', flat=True)[:batch_size]
+            )
+            if not donor_ids:
+                break
+
+            with transaction.atomic():
+                total += recompute_eligibility(donor_ids)
+            last_id = donor_ids[-1]
+            self.stdout.write(f'Processed {total} donors')
+
+        self.stdout.write(self.style.SUCCESS(f'Recomputed eligibility for {total} donors'))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from donor.eligibility import refresh_eligibility
+
+
+class Command(BaseCommand):
+    help = 'Mark donors eligible again once their next eligible date has come (run daily)'
+
+    def handle(self, *args, **options):
+        refreshed = refresh_eligibility()
+        self.stdout.write(self.style.SUCCESS(f'Marked {refreshed} donor(s) eligible again'))
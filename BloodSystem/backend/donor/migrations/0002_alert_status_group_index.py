@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-18 04:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('donor', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='donorhospitalalert',
+            index=models.Index(fields=['status', 'blood_group', 'required_by'], name='alert_status_group_idx'),
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 4.2.7 on 2026-10-18 04:45
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def skip_existing_alerts(apps, schema_editor):
+    # Alerts created before the fan-out worker existed have already been
+    # seen through polling; don't notify every donor about them again.
+    DonorHospitalAlert = apps.get_model('donor', 'DonorHospitalAlert')
+    DonorHospitalAlert.objects.update(fanout_status='COMPLETED')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('donor', '0002_alert_status_group_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='donorhospitalalert',
+            name='created_by',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='created_donor_alerts', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='donorhospitalalert',
+            name='fanout_completed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='donorhospitalalert',
+            name='fanout_status',
+            field=models.CharField(choices=[('PENDING', 'Pending'), ('RUNNING', 'Running'), ('COMPLETED', 'Completed'), ('FAILED', 'Failed')], db_index=True, default='PENDING', max_length=20),
+        ),
+        migrations.AddField(
+            model_name='donorhospitalalert',
+            name='notified_donors',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(skip_existing_alerts, migrations.RunPython.noop),
+    ]
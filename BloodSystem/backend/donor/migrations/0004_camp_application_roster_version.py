@@ -0,0 +1,22 @@
+# Generated by Django 4.2.7 on 2026-10-18 05:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('donor', '0003_alert_fanout'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='campapplication',
+            name='roster_version',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='campapplication',
+            index=models.Index(fields=['camp', 'roster_version'], name='camp_application_version_idx'),
+        ),
+    ]
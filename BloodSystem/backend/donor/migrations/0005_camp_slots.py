@@ -0,0 +1,25 @@
+# Generated by Django 4.2.7 on 2026-10-18 05:55
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('camp', '0004_camp_slots'),
+        ('donor', '0004_camp_application_roster_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='campapplication',
+            name='preferred_time',
+            field=models.TimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='campapplication',
+            name='slot',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='applications', to='camp.campslot'),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 4.2.7 on 2026-10-18 05:57
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('camp', '0004_camp_slots'),
+        ('donor', '0005_camp_slots'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='donationhistory',
+            name='camp_attendance',
+            field=models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='donation', to='camp.campattendance'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 4.2.7 on 2026-10-18 06:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('donor', '0006_donation_camp_attendance'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='donorhospitalalert',
+            name='fanout_attempts',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='donorhospitalalert',
+            name='fanout_claimed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='donorhospitalalert',
+            name='fanout_cursor',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
@@ -11,6 +11,9 @@ class DonationHistory(models.Model):
     blood_group = models.CharField(max_length=3, choices=settings.BLOOD_GROUPS)
     hemoglobin_level = models.FloatField(null=True, blank=True)
     notes = models.TextField(blank=True)
+    camp_attendance = models.OneToOneField(
+        'camp.CampAttendance', on_delete=models.SET_NULL, null=True, blank=True, related_name='donation'
+    )  # The camp attendance this donation was recorded from; see camp.donations
     created_at = models.DateTimeField(auto_now_add=True)
     
     class Meta:
@@ -54,6 +57,9 @@ class CampApplication(models.Model):
     reviewed_at = models.DateTimeField(null=True, blank=True)
     reviewed_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='reviewed_camp_applications')
     rejection_reason = models.TextField(blank=True)
+    preferred_time = models.TimeField(null=True, blank=True)  # Arrival time the donor asked for
+    slot = models.ForeignKey('camp.CampSlot', on_delete=models.SET_NULL, null=True, blank=True, related_name='applications')
+    roster_version = models.PositiveIntegerField(default=0)  # Camp.roster_version of the last review; see camp.checkin
     
     # Consent
     consent_given = models.BooleanField(default=False)
@@ -62,6 +68,9 @@ class CampApplication(models.Model):
         db_table = 'camp_applications'
         unique_together = ['donor', 'camp']
         ordering = ['-applied_at']
+        indexes = [
+            models.Index(fields=['camp', 'roster_version'], name='camp_application_version_idx'),
+        ]
     
     def __str__(self):
         return f"{self.donor.user.get_full_name()} - {self.camp.name}"
@@ -83,6 +92,13 @@ class DonorHospitalAlert(models.Model):
         ('CANCELLED', 'Cancelled'),
     ]
     
+    FANOUT_STATUS_CHOICES = [
+        ('PENDING', 'Pending'),
+        ('RUNNING', 'Running'),
+        ('COMPLETED', 'Completed'),
+        ('FAILED', 'Failed'),
+    ]
+    
     hospital = models.ForeignKey('accounts.HospitalProfile', on_delete=models.CASCADE, related_name='donor_alerts')
     blood_group = models.CharField(max_length=3, choices=settings.BLOOD_GROUPS)
     units_needed = models.PositiveIntegerField()
@@ -95,12 +111,24 @@ class DonorHospitalAlert(models.Model):
     
     # Status
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='ACTIVE')
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='created_donor_alerts')
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    # Donor notification fan-out (run by the run_alert_fanout worker)
+    fanout_status = models.CharField(max_length=20, choices=FANOUT_STATUS_CHOICES, default='PENDING', db_index=True)
+    notified_donors = models.PositiveIntegerField(default=0)
+    fanout_completed_at = models.DateTimeField(null=True, blank=True)
+    fanout_claimed_at = models.DateTimeField(null=True, blank=True)  # Renewed after every batch
+    fanout_attempts = models.PositiveSmallIntegerField(default=0)
+    fanout_cursor = models.PositiveIntegerField(default=0)  # Last donor user id notified
+    
     class Meta:
         db_table = 'donor_hospital_alerts'
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'blood_group', 'required_by'], name='alert_status_group_idx'),
+        ]
     
     def __str__(self):
         return f"{self.hospital.hospital_name} - {self.blood_group} ({self.units_needed} units)"
@@ -0,0 +1,36 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from accounts.models import DonorProfile, User
+from .models import DonationHistory
+from .eligibility_index import donor_index
+
+
+@receiver(post_save, sender=DonorProfile)
+def index_donor_profile(sender, instance, **kwargs):
+    """Move the donor to its current bucket once the write is committed"""
+    transaction.on_commit(lambda: donor_index.update_donor(
+        instance.id, instance.city, instance.blood_group, instance.next_eligible_date, instance.user.is_active
+    ))
+
+
+@receiver(post_save, sender=User)
+def reindex_donor_user(sender, instance, created=False, **kwargs):
+    """Deactivating or reactivating a donor's account saves only the user row"""
+    if instance.role == 'DONOR' and not created:
+        transaction.on_commit(lambda: donor_index.refresh_donors(
+            DonorProfile.objects.filter(user=instance).values_list('id', flat=True)
+        ))
+
+
+@receiver(post_delete, sender=DonorProfile)
+def unindex_donor_profile(sender, instance, **kwargs):
+    transaction.on_commit(lambda: donor_index.remove_donor(instance.id))
+
+
+@receiver(post_save, sender=DonationHistory)
+@receiver(post_delete, sender=DonationHistory)
+def reindex_donor_on_donation(sender, instance, **kwargs):
+    """Eligibility fields are updated with queryset updates, so reload the profile row"""
+    transaction.on_commit(lambda: donor_index.refresh_donors([instance.donor_id]))
@@ -12,6 +12,7 @@ urlpatterns = [
     # Camps
     path('camps/suggestions/', views.camp_suggestions, name='camp_suggestions'),
     path('camps/apply/', views.apply_to_camp, name='apply_to_camp'),
+    path('camps/applications/', views.my_camp_applications, name='my_camp_applications'),
     
     # Hospital Alerts
     path('hospital-alerts/', views.hospital_alerts, name='hospital_alerts'),
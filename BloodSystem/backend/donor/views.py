@@ -3,12 +3,14 @@ from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework import status
 from django.utils import timezone
-from datetime import timedelta
-from django.db.models import Q
+from django.utils.dateparse import parse_time
+from django.conf import settings
 from .models import DonationHistory, CampApplication, DonorHospitalAlert, DonorHospitalAlertResponse
 from camp.models import Camp
-from accounts.models import DonorProfile
+from accounts.models import DonorProfile, normalize_city
 from notifications.views import create_notification
+from bloodsystem.compatibility import recipient_groups
+from bloodsystem.geo import within_radius_q, haversine_km, parse_coordinates
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
@@ -20,22 +22,14 @@ def donor_dashboard(request):
     try:
         donor_profile = request.user.donor_profile
         
-        # Get donor stats
-        total_donations = DonationHistory.objects.filter(donor=donor_profile).count()
-        last_donation = DonationHistory.objects.filter(donor=donor_profile).first()
-        
-        # Calculate next eligible date
-        next_eligible_date = None
-        if last_donation:
-            next_eligible_date = last_donation.donation_date.date() + timedelta(days=56)
-        
+        # Eligibility fields are maintained on the profile when donations are recorded
         return Response({
             'message': 'Donor dashboard',
             'user': request.user.get_full_name(),
             'stats': {
-                'total_donations': total_donations,
-                'last_donation_date': last_donation.donation_date.date() if last_donation else None,
-                'next_eligible_date': next_eligible_date
+                'total_donations': donor_profile.total_donations,
+                'last_donation_date': donor_profile.last_donation_date,
+                'next_eligible_date': donor_profile.next_eligible_date
             }
         })
     except DonorProfile.DoesNotExist:
@@ -52,19 +46,11 @@ def donor_stats(request):
     try:
         donor_profile = request.user.donor_profile
         
-        # Get donation history
-        donations = DonationHistory.objects.filter(donor=donor_profile)
-        total_donations = donations.count()
-        last_donation = donations.first()
-        
-        # Calculate next eligible date
-        next_eligible_date = None
-        if last_donation:
-            next_eligible_date = last_donation.donation_date.date() + timedelta(days=56)
+        next_eligible_date = donor_profile.next_eligible_date
         
         return Response({
-            'total_donations': total_donations,
-            'last_donation_date': last_donation.donation_date.date() if last_donation else None,
+            'total_donations': donor_profile.total_donations,
+            'last_donation_date': donor_profile.last_donation_date,
             'next_eligible_date': next_eligible_date,
             'is_eligible': next_eligible_date is None or next_eligible_date <= timezone.now().date()
         })
@@ -75,27 +61,65 @@ def donor_stats(request):
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def camp_suggestions(request):
-    """Get nearby camp suggestions for donor"""
+    """
+    Get nearby camp suggestions for donor.
+
+    Only camps needing a blood group the donor can give to (or not naming
+    any) are suggested. By default camps in the donor's city are returned. Passing radius_km
+    switches to distance mode: camps within that many km of the donor
+    (or of lat/lng if given), ordered by distance and then date.
+    """
     if request.user.role != 'DONOR':
         return Response({'error': 'Access denied'}, status=status.HTTP_403_FORBIDDEN)
     
     try:
         donor_profile = request.user.donor_profile
         
-        # Get active camps in donor's city
-        camps = Camp.objects.filter(
+        upcoming_camps = Camp.objects.with_stats().needing_donor_group(donor_profile.blood_group).filter(
             status='ACTIVE',
             is_active=True,
-            city__iexact=donor_profile.city,
             date__gte=timezone.now().date()
         ).exclude(
             # Exclude camps where donor already applied
             applications__donor=donor_profile
-        )[:10]
+        )
+        
+        distances = {}
+        if 'radius_km' in request.GET:
+            try:
+                radius_km = float(request.GET.get('radius_km') or settings.CAMP_SEARCH_RADIUS_KM)
+                latitude = float(request.GET.get('lat', donor_profile.latitude))
+                longitude = float(request.GET.get('lng', donor_profile.longitude))
+            except (TypeError, ValueError):
+                return Response({
+                    'error': 'A numeric radius_km and a location (profile coordinates or lat/lng) are required'
+                }, status=status.HTTP_400_BAD_REQUEST)
+            
+            if not 0 < radius_km <= settings.MAX_CAMP_SEARCH_RADIUS_KM:
+                return Response({
+                    'error': f'radius_km must be between 0 and {settings.MAX_CAMP_SEARCH_RADIUS_KM}'
+                }, status=status.HTTP_400_BAD_REQUEST)
+            
+            # Cell ranges narrow the scan to the bounding box, haversine trims the corners
+            candidates = upcoming_camps.filter(
+                within_radius_q(latitude, longitude, radius_km)
+            ).exclude(latitude=None).exclude(longitude=None).order_by()
+            
+            nearby = []
+            for camp in candidates:
+                distance = haversine_km(latitude, longitude, camp.latitude, camp.longitude)
+                if distance <= radius_km:
+                    distances[camp.id] = round(distance, 2)
+                    nearby.append(camp)
+            nearby.sort(key=lambda camp: (distances[camp.id], camp.date, camp.start_time))
+            camps = nearby[:10]
+        else:
+            # Get active camps in donor's city
+            camps = upcoming_camps.filter(city__iexact=donor_profile.city)[:10]
         
         camp_data = []
         for camp in camps:
-            camp_data.append({
+            camp_item = {
                 'id': camp.id,
                 'name': camp.name,
                 'organizer': camp.organizer.organization_name,
@@ -109,7 +133,10 @@ def camp_suggestions(request):
                 'applications_count': camp.applications_count,
                 'contact_person': camp.contact_person,
                 'contact_phone': camp.contact_phone
-            })
+            }
+            if camp.id in distances:
+                camp_item['distance_km'] = distances[camp.id]
+            camp_data.append(camp_item)
         
         return Response({
             'results': camp_data,
@@ -142,6 +169,16 @@ def apply_to_camp(request):
         if CampApplication.objects.filter(donor=donor_profile, camp=camp).exists():
             return Response({'error': 'Already applied to this camp'}, status=status.HTTP_400_BAD_REQUEST)
         
+        # Optional arrival time, used when the camp assigns arrival slots
+        preferred_time = request.data.get('preferred_time')
+        if preferred_time:
+            try:
+                preferred_time = parse_time(preferred_time)
+            except (TypeError, ValueError):
+                preferred_time = None
+            if preferred_time is None or not camp.start_time <= preferred_time < camp.end_time:
+                return Response({'error': 'preferred_time must be within the camp hours'}, status=status.HTTP_400_BAD_REQUEST)
+        
         # Create application
         application = CampApplication.objects.create(
             donor=donor_profile,
@@ -152,7 +189,8 @@ def apply_to_camp(request):
             health_status=request.data.get('health_status', 'GOOD'),
             health_issues=request.data.get('health_issues', ''),
             medications=request.data.get('medications', ''),
-            consent_given=request.data.get('consent', False)
+            consent_given=request.data.get('consent', False),
+            preferred_time=preferred_time or None
         )
         
         # Create notification for donor
@@ -173,6 +211,43 @@ def apply_to_camp(request):
         return Response({'error': 'Donor profile not found'}, status=status.HTTP_404_NOT_FOUND)
 
 
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def my_camp_applications(request):
+    """Donor's camp applications with their status and arrival slot"""
+    if request.user.role != 'DONOR':
+        return Response({'error': 'Access denied'}, status=status.HTTP_403_FORBIDDEN)
+    
+    try:
+        donor_profile = request.user.donor_profile
+        
+        applications = CampApplication.objects.filter(
+            donor=donor_profile
+        ).select_related('camp', 'slot')[:50]
+        
+        application_data = []
+        for application in applications:
+            application_data.append({
+                'id': application.id,
+                'camp_id': application.camp_id,
+                'camp_name': application.camp.name,
+                'camp_date': application.camp.date,
+                'location': application.camp.location,
+                'status': application.status,
+                'preferred_time': application.preferred_time,
+                'slot_start': application.slot.start_time if application.slot else None,
+                'slot_end': application.slot.end_time if application.slot else None,
+                'applied_at': application.applied_at
+            })
+        
+        return Response({
+            'results': application_data,
+            'count': len(application_data)
+        })
+    except DonorProfile.DoesNotExist:
+        return Response({'error': 'Donor profile not found'}, status=status.HTTP_404_NOT_FOUND)
+
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def hospital_alerts(request):
@@ -183,15 +258,13 @@ def hospital_alerts(request):
     try:
         donor_profile = request.user.donor_profile
         
-        # Get active alerts matching donor's blood group and location
+        # Get active alerts for groups the donor can give to, in the donor's city
         alerts = DonorHospitalAlert.objects.filter(
             status='ACTIVE',
+            blood_group__in=recipient_groups(donor_profile.blood_group),
             required_by__gte=timezone.now(),
-            hospital__city__iexact=donor_profile.city
-        ).filter(
-            Q(blood_group=donor_profile.blood_group) |
-            Q(blood_group='O-')  # O- can donate to anyone
-        ).exclude(
+            hospital__city_key=normalize_city(donor_profile.city)
+        ).select_related('hospital').exclude(
             # Exclude alerts where donor already responded
             donor_responses__donor=donor_profile
         )[:10]
@@ -319,6 +392,14 @@ def update_donor_profile(request):
         for field in profile_fields:
             if field in request.data:
                 setattr(donor_profile, field, request.data[field])
+        if 'latitude' in request.data or 'longitude' in request.data:
+            try:
+                donor_profile.latitude, donor_profile.longitude = parse_coordinates(
+                    request.data.get('latitude', donor_profile.latitude),
+                    request.data.get('longitude', donor_profile.longitude)
+                )
+            except ValueError as e:
+                return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
         
         # Save changes
         user.save()
@@ -337,7 +418,9 @@ def update_donor_profile(request):
                 'city': donor_profile.city,
                 'state': donor_profile.state,
                 'weight': donor_profile.weight,
-                'gender': donor_profile.gender
+                'gender': donor_profile.gender,
+                'latitude': donor_profile.latitude,
+                'longitude': donor_profile.longitude
             }
         })
         
@@ -3,4 +3,7 @@ from django.apps import AppConfig
 
 class HospitalConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
-    name = 'hospital'
\ No newline at end of file
+    name = 'hospital'
+
+    def ready(self):
+        from . import signals  # noqa: F401
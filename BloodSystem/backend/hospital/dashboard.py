@@ -0,0 +1,81 @@
+"""
+Hospital dashboard snapshot.
+
+The dashboard counters (active patient requests, stock per blood group
+and pending donor alert responses) are kept per hospital in a
+HospitalDashboardSummary row. The receivers in hospital.signals recompute
+a hospital's row after every committed write that changes one of the
+counters, in whichever process made the write (web workers, management
+commands, the fan-out worker), so the row is never older than the last
+write.
+
+A page load reads that row by its unique hospital_id, which is as cheap
+as a cache hit and, unlike a per-process cache, current in every worker.
+
+The nightly demand forecasts live in the DemandForecast table, written
+by hospital.forecasting from the nightly command, and are read the same
+way through the (hospital, blood_group) index.
+"""
+
+from django.utils import timezone
+
+from accounts.models import HospitalProfile
+from donor.models import DonorHospitalAlert, DonorHospitalAlertResponse
+from .models import BloodStock, DemandForecast, HospitalDashboardSummary, HospitalPatientRequest
+
+SUMMARY_FIELDS = ['active_requests', 'total_stock', 'pending_applications', 'stock_by_group']
+
+
+def _count(hospital_id):
+    stock_by_group = dict(BloodStock.objects.filter(
+        hospital_id=hospital_id
+    ).values_list('blood_group', 'units_available'))
+    return {
+        'active_requests': HospitalPatientRequest.objects.filter(
+            hospital_id=hospital_id, status__in=['PENDING', 'APPROVED']
+        ).count(),
+        'total_stock': sum(stock_by_group.values()),
+        'pending_applications': DonorHospitalAlertResponse.objects.filter(
+            alert__hospital_id=hospital_id, status='PENDING'
+        ).count(),
+        'stock_by_group': stock_by_group,
+    }
+
+
+def refresh_dashboard_summary(hospital_id):
+    """Recompute one hospital's snapshot and store it in the summary row"""
+    summary = _count(hospital_id)
+    updated = HospitalDashboardSummary.objects.filter(hospital_id=hospital_id).update(
+        updated_at=timezone.now(), **summary
+    )
+    if not updated:
+        if not HospitalProfile.objects.filter(id=hospital_id).exists():
+            return None
+        HospitalDashboardSummary.objects.get_or_create(hospital_id=hospital_id, defaults=summary)
+    return summary
+
+
+def alert_response_hospital_id(response):
+    return DonorHospitalAlert.objects.filter(pk=response.alert_id).values_list('hospital_id', flat=True).first()
+
+
+def _forecast_row(forecast):
+    return {
+        'blood_group': forecast.blood_group,
+        'starts_on': forecast.starts_on,
+        'daily_units': forecast.daily_units,
+        'total_units': forecast.total_units,
+        'mean_abs_error': forecast.mean_abs_error,
+    }
+
+
+def get_dashboard(hospital_id):
+    """Return (summary dict, list of forecast dicts) for one hospital"""
+    summary = HospitalDashboardSummary.objects.filter(hospital_id=hospital_id).values(*SUMMARY_FIELDS).first()
+    if summary is None:
+        summary = refresh_dashboard_summary(hospital_id)
+    forecasts = [
+        _forecast_row(forecast)
+        for forecast in DemandForecast.objects.filter(hospital_id=hospital_id).order_by('blood_group')
+    ]
+    return summary, forecasts
@@ -0,0 +1,199 @@
+"""
+Background fan-out of hospital emergency alerts to donors.
+
+create_emergency_alert only stores the alert with fanout_status PENDING.
+The run_alert_fanout worker process claims pending alerts and writes one
+Notification per eligible, compatible donor near the hospital. It uses
+chunked bulk_create, and the urgency sets the radius and batch pacing
+(settings.ALERT_FANOUT).
+
+Donors are notified in user id order and every batch records the last id
+written (fanout_cursor) and renews the claim (fanout_claimed_at). An
+alert left RUNNING by a worker that died is claimed again once the claim
+is ALERT_FANOUT_LEASE_SECONDS old, and a FAILED one is retried; either
+way the new run resumes after the cursor, so donors are not notified
+twice. An alert gets at most ALERT_FANOUT_MAX_ATTEMPTS runs, after which
+it stays FAILED. Every write by a run is conditional on its own claim, so
+a worker that lost its lease stops instead of racing the new one.
+"""
+
+import logging
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Q, Value, When
+from django.utils import timezone
+
+from accounts.models import DonorProfile, normalize_city
+from bloodsystem.compatibility import donor_groups
+from bloodsystem.geo import haversine_km, within_radius_q
+from donor.models import DonorHospitalAlert
+from notifications.models import Notification
+
+logger = logging.getLogger(__name__)
+
+
+def fanout_config(urgency):
+    return settings.ALERT_FANOUT.get(urgency, settings.ALERT_FANOUT['LOW'])
+
+
+class LeaseLost(Exception):
+    """Raised when another worker has claimed the alert this run was fanning out"""
+
+
+def recipient_user_ids(alert, radius_km, after=0):
+    """
+    Yield user ids above after, in order, of active donors who can give to
+    the alert's blood group, are past their donation gap and are within
+    radius_km of the hospital. Donors without coordinates are matched on
+    the hospital's city. If the hospital has no coordinates, city matching
+    is used for everyone.
+    """
+    hospital = alert.hospital
+    today = timezone.now().date()
+    donors = DonorProfile.objects.filter(
+        blood_group__in=donor_groups(alert.blood_group),
+        user__is_active=True
+    ).filter(
+        Q(next_eligible_date__isnull=True) | Q(next_eligible_date__lte=today)
+    ).exclude(
+        hospital_alert_responses__alert=alert
+    ).filter(user_id__gt=after).order_by('user_id')
+
+    same_city = Q(city_key=normalize_city(hospital.city))
+    if hospital.latitude is None or hospital.longitude is None:
+        yield from donors.filter(same_city).values_list('user_id', flat=True).iterator(chunk_size=5000)
+        return
+
+    nearby = within_radius_q(hospital.latitude, hospital.longitude, radius_km)
+    rows = donors.filter(
+        nearby | (same_city & Q(geo_cell__isnull=True))
+    ).values_list('user_id', 'latitude', 'longitude').iterator(chunk_size=5000)
+    for user_id, latitude, longitude in rows:
+        if latitude is None or longitude is None:
+            yield user_id
+        elif haversine_km(hospital.latitude, hospital.longitude, latitude, longitude) <= radius_km:
+            yield user_id
+
+
+def _notification_for(alert):
+    notification_type = 'DISASTER_ALERT' if alert.urgency == 'DISASTER' else 'EMERGENCY_ALERT'
+    title = f'{alert.get_urgency_display()} blood alert: {alert.blood_group} needed'
+    message = (
+        f'{alert.hospital.hospital_name} needs {alert.units_needed} unit(s) of {alert.blood_group} blood '
+        f'at {alert.location} by {timezone.localtime(alert.required_by):%d %b %Y %H:%M}. '
+        'Your blood group is compatible - please respond from your dashboard if you can donate.'
+    )
+    return title, message, notification_type
+
+
+def _claimed(alert):
+    """The alert's row, if this run's claim on it still stands"""
+    return DonorHospitalAlert.objects.filter(
+        pk=alert.pk, fanout_status='RUNNING', fanout_claimed_at=alert.fanout_claimed_at
+    )
+
+
+def _write_batch(alert, batch, notified):
+    """Write a batch and move the cursor and claim past it in one transaction"""
+    now = timezone.now()
+    with transaction.atomic():
+        if not _claimed(alert).update(
+            notified_donors=notified, fanout_cursor=batch[-1].recipient_id, fanout_claimed_at=now
+        ):
+            raise LeaseLost(alert.pk)
+        Notification.objects.bulk_create(batch)
+    alert.fanout_claimed_at = now
+
+
+def fan_out_alert(alert, sleep=time.sleep):
+    """
+    Write notifications for one claimed alert in paced batches, resuming
+    after its cursor; returns the number of donors notified in all runs
+    """
+    config = fanout_config(alert.urgency)
+    batch_size = config['batch_size']
+    title, message, notification_type = _notification_for(alert)
+
+    notified = alert.notified_donors
+    batch = []
+    for user_id in recipient_user_ids(alert, config['radius_km'], after=alert.fanout_cursor):
+        batch.append(Notification(
+            recipient_id=user_id,
+            title=title,
+            message=message,
+            notification_type=notification_type
+        ))
+        if len(batch) >= batch_size:
+            notified += len(batch)
+            _write_batch(alert, batch, notified)
+            batch = []
+            if config['batch_delay_seconds']:
+                sleep(config['batch_delay_seconds'])
+    if batch:
+        notified += len(batch)
+        _write_batch(alert, batch, notified)
+    return notified
+
+
+def claim_next_alert():
+    """
+    Atomically move the most urgent, oldest alert that is pending, failed
+    with attempts left or abandoned by a crashed worker to RUNNING;
+    returns it or None
+    """
+    now = timezone.now()
+    max_attempts = settings.ALERT_FANOUT_MAX_ATTEMPTS
+    abandoned = Q(
+        fanout_status='RUNNING',
+        fanout_claimed_at__lt=now - timedelta(seconds=settings.ALERT_FANOUT_LEASE_SECONDS)
+    )
+    # Abandoned runs that were the last attempt fail for good
+    DonorHospitalAlert.objects.filter(abandoned, fanout_attempts__gte=max_attempts).update(fanout_status='FAILED')
+    claimable = Q(fanout_status='PENDING') | (
+        (abandoned | Q(fanout_status='FAILED')) & Q(fanout_attempts__lt=max_attempts)
+    )
+
+    urgency_rank = Case(
+        When(urgency='DISASTER', then=Value(0)),
+        When(urgency='EMERGENCY', then=Value(1)),
+        default=Value(2),
+        output_field=IntegerField()
+    )
+    candidates = DonorHospitalAlert.objects.filter(
+        claimable
+    ).order_by(urgency_rank, 'created_at').values_list('pk', flat=True)[:10]
+    for alert_id in candidates:
+        # Conditional update so that concurrent workers never claim the same alert
+        claimed = DonorHospitalAlert.objects.filter(claimable, pk=alert_id).update(
+            fanout_status='RUNNING', fanout_claimed_at=now, fanout_attempts=F('fanout_attempts') + 1
+        )
+        if claimed:
+            return DonorHospitalAlert.objects.select_related('hospital').get(pk=alert_id)
+    return None
+
+
+def process_alert(alert, sleep=time.sleep):
+    """Fan out a claimed alert and record the outcome on it"""
+    if alert.status != 'ACTIVE' or alert.required_by < timezone.now():
+        _claimed(alert).update(fanout_status='COMPLETED', fanout_completed_at=timezone.now())
+        return 0
+
+    try:
+        notified = fan_out_alert(alert, sleep=sleep)
+    except LeaseLost:
+        logger.warning('Alert %s was claimed by another worker; stopping', alert.pk)
+        raise
+    except Exception:
+        logger.exception('Fan-out failed for alert %s (attempt %s)', alert.pk, alert.fanout_attempts)
+        _claimed(alert).update(fanout_status='FAILED')
+        raise
+
+    _claimed(alert).update(
+        fanout_status='COMPLETED',
+        notified_donors=notified,
+        fanout_completed_at=timezone.now()
+    )
+    return notified
@@ -0,0 +1,139 @@
+"""
+Blood demand forecasting.
+
+Demand is the number of units requested per day, from both patient
+request tables (hospital.HospitalPatientRequest and patient.BloodRequest,
+cancelled requests left out). Hospitals are forecast one region (state)
+at a time. A region's whole history is fetched in one query, summed per
+hospital, blood group and day in the database, and loaded into an array
+of shape (hospitals, blood groups, days). Days are UTC dates.
+
+The model is additive exponential smoothing with a weekly seasonal term
+(Holt-Winters without the trend). Each day updates a deseasonalised level
+and that weekday's seasonal offset. The update runs once per day of
+history over the whole array, so its cost hardly depends on the number
+of hospitals.
+"""
+
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.db.models import DateField, Sum
+from django.db.models.functions import Cast
+from django.utils import timezone
+
+from accounts.models import HospitalProfile
+from bloodsystem.compatibility import BLOOD_GROUP_CODES
+from patient.models import BloodRequest
+from .models import DemandForecast, HospitalPatientRequest
+
+SEASON_DAYS = 7
+
+# Index of each blood group along the array's second axis, ordered as in settings.BLOOD_GROUPS
+GROUP_INDEX = {code: index for index, code in enumerate(BLOOD_GROUP_CODES)}
+
+
+def _midnight(day):
+    return datetime.combine(day, time.min, tzinfo=dt_timezone.utc)
+
+
+def _daily_demand(queryset, hospital_ids, start, end):
+    return queryset.filter(
+        hospital_id__in=hospital_ids, created_at__gte=_midnight(start), created_at__lt=_midnight(end)
+    ).exclude(status='CANCELLED').annotate(day=Cast('created_at', DateField())).values_list(
+        'hospital_id', 'blood_group', 'day'
+    ).annotate(units=Sum('units_needed')).order_by()
+
+
+def load_demand(hospital_ids, start, days):
+    """
+    Units requested per day from start for a region's hospitals, as an
+    array of shape (len(hospital_ids), blood groups, days). hospital_ids
+    must be sorted.
+    """
+    end = start + timedelta(days=days)
+    id_list = hospital_ids.tolist()
+    rows = list(_daily_demand(HospitalPatientRequest.objects.all(), id_list, start, end).union(
+        _daily_demand(BloodRequest.objects.all(), id_list, start, end), all=True
+    ))
+    demand = np.zeros((len(hospital_ids), len(BLOOD_GROUP_CODES), days))
+    if not rows:
+        return demand
+    row_hospitals, row_groups, row_days, row_units = zip(*rows)
+    hospital_index = np.searchsorted(hospital_ids, np.array(row_hospitals))
+    group_index = np.array([GROUP_INDEX[group] for group in row_groups])
+    day_index = (np.array(row_days, dtype='datetime64[D]') - np.datetime64(start, 'D')).astype(int)
+    # Both tables can have a row for the same hospital, group and day
+    np.add.at(demand, (hospital_index, group_index, day_index), np.array(row_units, dtype=float))
+    return demand
+
+
+def smooth(demand, horizon, level_smoothing, season_smoothing):
+    """
+    Forecast the next horizon days of every series in demand (last axis
+    is days, at least two weeks of it). Returns (forecast, mean absolute
+    one-day-ahead error), the forecast shaped like demand with horizon days.
+    """
+    days = demand.shape[-1]
+    # Start from the first week: its mean as the level, its days as the offsets
+    level = demand[..., :SEASON_DAYS].mean(axis=-1)
+    season = demand[..., :SEASON_DAYS] - level[..., None]
+    abs_error = np.zeros_like(level)
+    for day in range(SEASON_DAYS, days):
+        weekday = day % SEASON_DAYS
+        actual = demand[..., day]
+        abs_error += np.abs(actual - level - season[..., weekday])
+        new_level = level + level_smoothing * (actual - season[..., weekday] - level)
+        season[..., weekday] += season_smoothing * (actual - new_level - season[..., weekday])
+        level = new_level
+    weekdays = np.arange(days, days + horizon) % SEASON_DAYS
+    forecast = np.clip(level[..., None] + season[..., weekdays], 0, None)
+    return forecast, abs_error / (days - SEASON_DAYS)
+
+
+def forecast_region(region, hospital_ids, today=None):
+    """Replace the forecasts of one region's hospitals; returns the number stored"""
+    config = settings.DEMAND_FORECAST
+    today = today or timezone.now().date()
+    history_days = config['history_days']
+    start = today - timedelta(days=history_days)
+    hospital_ids = np.array(sorted(hospital_ids))
+
+    demand = load_demand(hospital_ids, start, history_days)
+    forecast, abs_error = smooth(
+        demand, config['horizon_days'], config['level_smoothing'], config['season_smoothing']
+    )
+    daily_units = forecast.round(1).tolist()
+    total_units = forecast.sum(axis=-1).round(1).tolist()
+    abs_error = abs_error.round(2).tolist()
+    history_units = demand.sum(axis=-1).astype(int).tolist()
+
+    forecasts = [
+        DemandForecast(
+            hospital_id=hospital_id, blood_group=group, starts_on=today,
+            daily_units=daily_units[h][g], total_units=total_units[h][g],
+            mean_abs_error=abs_error[h][g], history_units=history_units[h][g]
+        )
+        for h, hospital_id in enumerate(hospital_ids.tolist())
+        for g, group in enumerate(BLOOD_GROUP_CODES)
+    ]
+    with transaction.atomic():
+        DemandForecast.objects.filter(hospital__state=region).delete()
+        DemandForecast.objects.bulk_create(forecasts, batch_size=2000)
+    return len(forecasts)
+
+
+def forecast_demand(region=None, today=None):
+    """
+    Forecast every approved hospital, region by region (or only the given
+    region). Returns {region: forecasts stored}.
+    """
+    hospitals = HospitalProfile.objects.filter(verification_status='APPROVED')
+    if region:
+        hospitals = hospitals.filter(state=region)
+    regions = {}
+    for hospital_id, state in hospitals.values_list('id', 'state').order_by():
+        regions.setdefault(state, []).append(hospital_id)
+    return {state: forecast_region(state, hospital_ids, today) for state, hospital_ids in sorted(regions.items())}
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from hospital.forecasting import forecast_demand
+
+
+class Command(BaseCommand):
+    help = 'Forecast blood demand for every approved hospital and blood group (run nightly)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--state', help='Only forecast hospitals in this state')
+
+    def handle(self, *args, **options):
+        stored = forecast_demand(region=options['state'])
+        for state, count in stored.items():
+            self.stdout.write(f'{state}: {count} forecasts')
+        self.stdout.write(self.style.SUCCESS(
+            f'Stored {sum(stored.values())} demand forecasts for {len(stored)} regions'
+        ))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from hospital.reservations import release_expired_reservations
+
+
+class Command(BaseCommand):
+    help = 'Release stock reservations whose patient request is past its required-by time (run every few minutes)'
+
+    def handle(self, *args, **options):
+        released = release_expired_reservations()
+        self.stdout.write(self.style.SUCCESS(f'Released {released} expired stock reservation(s)'))
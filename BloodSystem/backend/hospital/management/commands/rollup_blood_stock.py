@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from hospital.rollups import rebuild_rollups, roll_up
+
+
+class Command(BaseCommand):
+    help = 'Roll new stock ledger entries up into hourly, daily and weekly trend buckets (run every few minutes)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rebuild', action='store_true', help='Drop all rollups and rebuild them from the ledger')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Ledger rows per transaction')
+
+    def handle(self, *args, **options):
+        if options['rebuild']:
+            rolled = rebuild_rollups(batch_size=options['batch_size'])
+        else:
+            rolled = roll_up(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Rolled up {rolled} stock ledger entries'))
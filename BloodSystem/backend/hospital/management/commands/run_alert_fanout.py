@@ -0,0 +1,39 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from hospital.fanout import claim_next_alert, process_alert
+
+
+class Command(BaseCommand):
+    help = 'Worker that fans out pending hospital emergency alerts to nearby compatible donors'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Drain pending alerts and exit')
+        parser.add_argument(
+            '--poll-interval', type=float, default=settings.ALERT_FANOUT_POLL_SECONDS,
+            help='Seconds to wait when no alert is pending'
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write('Alert fan-out worker started')
+        while True:
+            alert = claim_next_alert()
+            if alert is None:
+                if options['once']:
+                    break
+                time.sleep(options['poll_interval'])
+                continue
+
+            started = time.monotonic()
+            try:
+                notified = process_alert(alert)
+            except Exception as e:
+                self.stderr.write(f'Alert {alert.id} failed: {e}')
+                continue
+            elapsed = time.monotonic() - started
+            self.stdout.write(
+                f'Alert {alert.id} ({alert.urgency}, {alert.blood_group}): '
+                f'notified {notified} donors in {elapsed:.2f}s'
+            )
@@ -0,0 +1,20 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from hospital.stock import expire_all_stock, refresh_expiry_alerts
+
+
+class Command(BaseCommand):
+    help = 'Write off expired blood unit batches and recompute expiring-soon counts (run daily)'
+
+    def handle(self, *args, **options):
+        expired = expire_all_stock()
+        for (hospital_id, blood_group), units in expired.items():
+            self.stdout.write(f'Hospital {hospital_id} {blood_group}: {units} unit(s) expired')
+
+        updated = refresh_expiry_alerts()
+        self.stdout.write(self.style.SUCCESS(
+            f'Expired {sum(expired.values())} unit(s) across {len(expired)} stock group(s); '
+            f'updated {updated} expiring-soon count(s) ({settings.EXPIRY_ALERT_DAYS} day window)'
+        ))
+
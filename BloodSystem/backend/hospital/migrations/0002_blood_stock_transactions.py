@@ -0,0 +1,37 @@
+# Generated by Django 4.2.7 on 2026-10-18 04:47
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('accounts', '0004_hospital_location'),
+        ('hospital', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BloodStockTransaction',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('blood_group', models.CharField(choices=[('A+', 'A Positive'), ('A-', 'A Negative'), ('B+', 'B Positive'), ('B-', 'B Negative'), ('O+', 'O Positive'), ('O-', 'O Negative'), ('AB+', 'AB Positive'), ('AB-', 'AB Negative')], max_length=3)),
+                ('transaction_type', models.CharField(choices=[('ADD', 'Added'), ('SUBTRACT', 'Issued'), ('SET', 'Adjusted'), ('TRANSFER_IN', 'Transfer In'), ('TRANSFER_OUT', 'Transfer Out')], max_length=20)),
+                ('units_change', models.IntegerField(help_text='Signed change in units_available')),
+                ('balance_after', models.PositiveIntegerField()),
+                ('notes', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='stock_transactions', to=settings.AUTH_USER_MODEL)),
+                ('hospital', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_transactions', to='accounts.hospitalprofile')),
+                ('network_request', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='stock_transactions', to='hospital.hospitalnetwork')),
+            ],
+            options={
+                'db_table': 'hospital_blood_stock_transactions',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['hospital', 'blood_group', 'created_at'], name='stock_txn_hospital_group_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,69 @@
+# Generated by Django 4.2.7 on 2026-10-18 04:50
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+from django.utils import timezone
+from datetime import timedelta
+
+
+def batch_existing_stock(apps, schema_editor):
+    # Existing counts have no collection dates. last_updated is only the
+    # last time the count was edited, not when the units were collected,
+    # so expiring from it would write off whole groups on the first sweep.
+    # Give them a full shelf life from the migration date instead; older
+    # units can be written off with a 'set' correction.
+    BloodStock = apps.get_model('hospital', 'BloodStock')
+    BloodUnitBatch = apps.get_model('hospital', 'BloodUnitBatch')
+    today = timezone.localdate()
+    expires_on = today + timedelta(days=settings.BLOOD_UNIT_SHELF_LIFE_DAYS)
+    batches = []
+    for stock in BloodStock.objects.filter(units_available__gt=0).iterator():
+        batches.append(BloodUnitBatch(
+            hospital_id=stock.hospital_id,
+            blood_group=stock.blood_group,
+            units_received=stock.units_available,
+            units_remaining=stock.units_available,
+            collected_on=min(timezone.localdate(stock.last_updated), today),
+            expires_on=expires_on,
+            source='MIGRATED'
+        ))
+    BloodUnitBatch.objects.bulk_create(batches, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0004_hospital_location'),
+        ('hospital', '0002_blood_stock_transactions'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='bloodstocktransaction',
+            name='transaction_type',
+            field=models.CharField(choices=[('ADD', 'Added'), ('SUBTRACT', 'Issued'), ('SET', 'Adjusted'), ('TRANSFER_IN', 'Transfer In'), ('TRANSFER_OUT', 'Transfer Out'), ('EXPIRED', 'Expired')], max_length=20),
+        ),
+        migrations.CreateModel(
+            name='BloodUnitBatch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('blood_group', models.CharField(choices=[('A+', 'A Positive'), ('A-', 'A Negative'), ('B+', 'B Positive'), ('B-', 'B Negative'), ('O+', 'O Positive'), ('O-', 'O Negative'), ('AB+', 'AB Positive'), ('AB-', 'AB Negative')], max_length=3)),
+                ('units_received', models.PositiveIntegerField()),
+                ('units_remaining', models.PositiveIntegerField()),
+                ('collected_on', models.DateField()),
+                ('expires_on', models.DateField()),
+                ('source', models.CharField(choices=[('STOCK_ENTRY', 'Stock Entry'), ('TRANSFER', 'Transfer'), ('MIGRATED', 'Migrated')], default='STOCK_ENTRY', max_length=20)),
+                ('status', models.CharField(choices=[('AVAILABLE', 'Available'), ('DEPLETED', 'Depleted'), ('EXPIRED', 'Expired')], default='AVAILABLE', max_length=20)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('hospital', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='blood_unit_batches', to='accounts.hospitalprofile')),
+                ('network_request', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='unit_batches', to='hospital.hospitalnetwork')),
+            ],
+            options={
+                'db_table': 'hospital_blood_unit_batches',
+                'ordering': ['expires_on', 'id'],
+                'indexes': [models.Index(fields=['hospital', 'blood_group', 'expires_on'], name='unit_batch_fefo_idx'), models.Index(fields=['status', 'expires_on'], name='unit_batch_expiry_idx')],
+            },
+        ),
+        migrations.RunPython(batch_existing_stock, migrations.RunPython.noop),
+    ]
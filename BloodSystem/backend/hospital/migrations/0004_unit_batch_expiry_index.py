@@ -0,0 +1,21 @@
+# Generated by Django 4.2.7 on 2026-10-18 05:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hospital', '0003_blood_unit_batches'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='bloodunitbatch',
+            name='unit_batch_expiry_idx',
+        ),
+        migrations.AddIndex(
+            model_name='bloodunitbatch',
+            index=models.Index(fields=['expires_on', 'status'], name='unit_batch_expiry_idx'),
+        ),
+    ]
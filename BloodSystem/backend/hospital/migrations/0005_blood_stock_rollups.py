@@ -0,0 +1,59 @@
+# Generated by Django 4.2.7 on 2026-10-18 05:14
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0004_hospital_location'),
+        ('hospital', '0004_unit_batch_expiry_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BloodStockRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('blood_group', models.CharField(choices=[('A+', 'A Positive'), ('A-', 'A Negative'), ('B+', 'B Positive'), ('B-', 'B Negative'), ('O+', 'O Positive'), ('O-', 'O Negative'), ('AB+', 'AB Positive'), ('AB-', 'AB Negative')], max_length=3)),
+                ('granularity', models.CharField(choices=[('HOUR', 'Hourly'), ('DAY', 'Daily'), ('WEEK', 'Weekly')], max_length=4)),
+                ('bucket_start', models.DateTimeField()),
+                ('units_close', models.PositiveIntegerField()),
+                ('units_in', models.PositiveIntegerField(default=0)),
+                ('units_out', models.PositiveIntegerField(default=0)),
+                ('changes', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'db_table': 'hospital_blood_stock_rollups',
+            },
+        ),
+        migrations.CreateModel(
+            name='StockRollupCursor',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('last_transaction_id', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'hospital_stock_rollup_cursor',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='bloodstocktransaction',
+            index=models.Index(fields=['created_at'], name='stock_txn_created_idx'),
+        ),
+        migrations.AddField(
+            model_name='bloodstockrollup',
+            name='hospital',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_rollups', to='accounts.hospitalprofile'),
+        ),
+        migrations.AddIndex(
+            model_name='bloodstockrollup',
+            index=models.Index(fields=['granularity', 'bucket_start'], name='stock_rollup_bucket_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='bloodstockrollup',
+            unique_together={('hospital', 'blood_group', 'granularity', 'bucket_start')},
+        ),
+    ]
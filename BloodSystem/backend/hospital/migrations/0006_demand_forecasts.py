@@ -0,0 +1,33 @@
+# Generated by Django 4.2.7 on 2026-10-18 05:18
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0004_hospital_location'),
+        ('hospital', '0005_blood_stock_rollups'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DemandForecast',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('blood_group', models.CharField(choices=[('A+', 'A Positive'), ('A-', 'A Negative'), ('B+', 'B Positive'), ('B-', 'B Negative'), ('O+', 'O Positive'), ('O-', 'O Negative'), ('AB+', 'AB Positive'), ('AB-', 'AB Negative')], max_length=3)),
+                ('starts_on', models.DateField()),
+                ('daily_units', models.JSONField(default=list)),
+                ('total_units', models.FloatField(default=0)),
+                ('mean_abs_error', models.FloatField(default=0)),
+                ('history_units', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('hospital', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='demand_forecasts', to='accounts.hospitalprofile')),
+            ],
+            options={
+                'db_table': 'hospital_demand_forecasts',
+                'unique_together': {('hospital', 'blood_group')},
+            },
+        ),
+    ]
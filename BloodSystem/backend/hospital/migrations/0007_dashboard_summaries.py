@@ -0,0 +1,30 @@
+# Generated by Django 4.2.7 on 2026-10-18 05:30
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0004_hospital_location'),
+        ('hospital', '0006_demand_forecasts'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HospitalDashboardSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('active_requests', models.PositiveIntegerField(default=0)),
+                ('total_stock', models.PositiveIntegerField(default=0)),
+                ('pending_applications', models.PositiveIntegerField(default=0)),
+                ('stock_by_group', models.JSONField(default=dict)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('hospital', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='dashboard_summary', to='accounts.hospitalprofile')),
+            ],
+            options={
+                'db_table': 'hospital_dashboard_summaries',
+            },
+        ),
+    ]
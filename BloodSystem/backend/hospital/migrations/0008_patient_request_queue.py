@@ -0,0 +1,50 @@
+# Generated by Django 4.2.7 on 2026-10-18 06:10
+
+from django.conf import settings
+from django.db import migrations, models
+from datetime import timedelta
+
+
+def set_priority_due(apps, schema_editor):
+    # Same rule as hospital.request_queue.effective_deadline
+    BloodStock = apps.get_model('hospital', 'BloodStock')
+    HospitalPatientRequest = apps.get_model('hospital', 'HospitalPatientRequest')
+    config = settings.PATIENT_REQUEST_PRIORITY
+    stock = {
+        (hospital_id, blood_group): units
+        for hospital_id, blood_group, units in BloodStock.objects.values_list('hospital_id', 'blood_group', 'units_available')
+    }
+    requests = []
+    for request in HospitalPatientRequest.objects.only('id', 'hospital_id', 'blood_group', 'units_needed', 'request_type', 'required_by').iterator():
+        lead_hours = config['type_lead_hours'].get(request.request_type, 0)
+        if request.units_needed > stock.get((request.hospital_id, request.blood_group), 0):
+            lead_hours += config['shortfall_lead_hours']
+        request.priority_due = request.required_by - timedelta(hours=lead_hours)
+        requests.append(request)
+    HospitalPatientRequest.objects.bulk_update(requests, ['priority_due'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0004_hospital_location'),
+        ('hospital', '0007_dashboard_summaries'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='hospitalpatientrequest',
+            name='priority_due',
+            field=models.DateTimeField(null=True),
+        ),
+        migrations.RunPython(set_priority_due, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='hospitalpatientrequest',
+            name='priority_due',
+            field=models.DateTimeField(),
+        ),
+        migrations.AddIndex(
+            model_name='hospitalpatientrequest',
+            index=models.Index(fields=['hospital', 'status', 'priority_due', 'id'], name='patient_request_queue_idx'),
+        ),
+    ]
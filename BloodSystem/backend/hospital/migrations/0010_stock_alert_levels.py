@@ -0,0 +1,71 @@
+# Generated by Django 4.2.7 on 2026-10-18 05:42
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def set_thresholds_and_levels(apps, schema_editor):
+    # Same rules as hospital.stock_alerts.thresholds_for; existing rows get
+    # the plain level for their count (no earlier level to apply hysteresis to)
+    BloodStock = apps.get_model('hospital', 'BloodStock')
+    config = settings.STOCK_ALERT_THRESHOLDS
+    stocks = list(BloodStock.objects.select_related('hospital'))
+    for stock in stocks:
+        capacity = stock.hospital.storage_capacity
+        if capacity:
+            per_group = capacity / len(settings.BLOOD_GROUPS)
+            low = max(round(per_group * config['low_share']), 2)
+            critical = min(max(round(per_group * config['critical_share']), 1), low - 1)
+        else:
+            low, critical = config['default_low'], config['default_critical']
+        stock.low_threshold = low
+        stock.critical_threshold = critical
+        stock.threshold_margin = max(round(low * config['hysteresis_share']), 1)
+        if stock.units_available < critical:
+            stock.alert_level = 'CRITICAL'
+        elif stock.units_available < low:
+            stock.alert_level = 'LOW'
+        else:
+            stock.alert_level = 'GOOD'
+        stock.previous_alert_level = stock.alert_level
+    BloodStock.objects.bulk_update(
+        stocks,
+        ['low_threshold', 'critical_threshold', 'threshold_margin', 'alert_level', 'previous_alert_level'],
+        batch_size=500
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hospital', '0009_stock_reservations'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='bloodstock',
+            name='alert_level',
+            field=models.CharField(choices=[('GOOD', 'Good'), ('LOW', 'Low'), ('CRITICAL', 'Critical')], default='CRITICAL', max_length=10),
+        ),
+        migrations.AddField(
+            model_name='bloodstock',
+            name='critical_threshold',
+            field=models.PositiveIntegerField(default=5),
+        ),
+        migrations.AddField(
+            model_name='bloodstock',
+            name='low_threshold',
+            field=models.PositiveIntegerField(default=10),
+        ),
+        migrations.AddField(
+            model_name='bloodstock',
+            name='previous_alert_level',
+            field=models.CharField(choices=[('GOOD', 'Good'), ('LOW', 'Low'), ('CRITICAL', 'Critical')], default='CRITICAL', max_length=10),
+        ),
+        migrations.AddField(
+            model_name='bloodstock',
+            name='threshold_margin',
+            field=models.PositiveIntegerField(default=2),
+        ),
+        migrations.RunPython(set_thresholds_and_levels, migrations.RunPython.noop),
+    ]
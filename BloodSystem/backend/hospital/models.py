@@ -1,6 +1,15 @@
 from django.db import models
 from django.conf import settings
 from accounts.models import HospitalProfile, PatientProfile
+from .stock_alerts import next_alert_level
+
+
+ALERT_LEVEL_CHOICES = [
+    ('GOOD', 'Good'),
+    ('LOW', 'Low'),
+    ('CRITICAL', 'Critical'),
+]
+
 
 class BloodStock(models.Model):
     """Hospital blood stock management"""
@@ -11,6 +20,14 @@ class BloodStock(models.Model):
     expiry_alerts = models.PositiveIntegerField(default=0)
     last_updated = models.DateTimeField(auto_now=True)
     
+    # Alert level with hysteresis, set by the same UPDATE that changes
+    # units_available (see hospital.stock_alerts)
+    alert_level = models.CharField(max_length=10, choices=ALERT_LEVEL_CHOICES, default='CRITICAL')
+    previous_alert_level = models.CharField(max_length=10, choices=ALERT_LEVEL_CHOICES, default='CRITICAL')
+    low_threshold = models.PositiveIntegerField(default=10)
+    critical_threshold = models.PositiveIntegerField(default=5)
+    threshold_margin = models.PositiveIntegerField(default=2)
+    
     class Meta:
         db_table = 'hospital_blood_stock'
         unique_together = ['hospital', 'blood_group']
@@ -18,14 +35,191 @@ class BloodStock(models.Model):
     def __str__(self):
         return f"{self.hospital.hospital_name} - {self.blood_group}: {self.units_available} units"
     
+    @property
+    def net_available(self):
+        """Units not held by a StockReservation"""
+        return max(self.units_available - self.units_reserved, 0)
+    
     @property
     def status(self):
-        if self.units_available >= 10:
-            return 'GOOD'
-        elif self.units_available >= 5:
-            return 'LOW'
-        else:
-            return 'CRITICAL'
+        return self.alert_level
+    
+    def update_alert_level(self):
+        """
+        Set the alert level for units_available on a row written directly
+        (admin, seed scripts) rather than through hospital.stock; a new row
+        starts from GOOD, an existing one moves from its stored level
+        """
+        level = 'GOOD' if self._state.adding else self.alert_level
+        self.alert_level = next_alert_level(
+            level, self.units_available, self.low_threshold, self.critical_threshold, self.threshold_margin
+        )
+        if self._state.adding:
+            self.previous_alert_level = self.alert_level
+    
+    def save(self, *args, **kwargs):
+        self.update_alert_level()
+        if kwargs.get('update_fields') is not None and 'units_available' in kwargs['update_fields']:
+            kwargs['update_fields'] = set(kwargs['update_fields']) | {'alert_level'}
+        super().save(*args, **kwargs)
+
+
+class BloodUnitBatch(models.Model):
+    """
+    A batch of blood units with a common collection and expiry date.
+    BloodStock.units_available is the cached total of units_remaining over
+    a hospital's unexpired batches of each group.
+    """
+    
+    SOURCE_CHOICES = [
+        ('STOCK_ENTRY', 'Stock Entry'),
+        ('TRANSFER', 'Transfer'),
+        ('MIGRATED', 'Migrated'),
+    ]
+    
+    STATUS_CHOICES = [
+        ('AVAILABLE', 'Available'),
+        ('DEPLETED', 'Depleted'),
+        ('EXPIRED', 'Expired'),
+    ]
+    
+    hospital = models.ForeignKey(HospitalProfile, on_delete=models.CASCADE, related_name='blood_unit_batches')
+    blood_group = models.CharField(max_length=3, choices=settings.BLOOD_GROUPS)
+    units_received = models.PositiveIntegerField()
+    units_remaining = models.PositiveIntegerField()
+    collected_on = models.DateField()
+    expires_on = models.DateField()
+    source = models.CharField(max_length=20, choices=SOURCE_CHOICES, default='STOCK_ENTRY')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='AVAILABLE')
+    network_request = models.ForeignKey('HospitalNetwork', on_delete=models.SET_NULL, null=True, blank=True, related_name='unit_batches')
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        db_table = 'hospital_blood_unit_batches'
+        ordering = ['expires_on', 'id']
+        indexes = [
+            models.Index(fields=['hospital', 'blood_group', 'expires_on'], name='unit_batch_fefo_idx'),
+            models.Index(fields=['expires_on', 'status'], name='unit_batch_expiry_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.hospital.hospital_name} - {self.blood_group}: {self.units_remaining} units (expires {self.expires_on})"
+
+
+class BloodStockTransaction(models.Model):
+    """Append-only ledger of every change to a hospital's blood stock"""
+    
+    TRANSACTION_TYPES = [
+        ('ADD', 'Added'),
+        ('SUBTRACT', 'Issued'),
+        ('SET', 'Adjusted'),
+        ('TRANSFER_IN', 'Transfer In'),
+        ('TRANSFER_OUT', 'Transfer Out'),
+        ('EXPIRED', 'Expired'),
+    ]
+    
+    hospital = models.ForeignKey(HospitalProfile, on_delete=models.CASCADE, related_name='stock_transactions')
+    blood_group = models.CharField(max_length=3, choices=settings.BLOOD_GROUPS)
+    transaction_type = models.CharField(max_length=20, choices=TRANSACTION_TYPES)
+    units_change = models.IntegerField(help_text="Signed change in units_available")
+    balance_after = models.PositiveIntegerField()
+    network_request = models.ForeignKey('HospitalNetwork', on_delete=models.SET_NULL, null=True, blank=True, related_name='stock_transactions')
+    created_by = models.ForeignKey('accounts.User', on_delete=models.SET_NULL, null=True, blank=True, related_name='stock_transactions')
+    notes = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        db_table = 'hospital_blood_stock_transactions'
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['hospital', 'blood_group', 'created_at'], name='stock_txn_hospital_group_idx'),
+            models.Index(fields=['created_at'], name='stock_txn_created_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.hospital.hospital_name} - {self.blood_group}: {self.units_change:+d} ({self.transaction_type})"
+
+
+class BloodStockRollup(models.Model):
+    """
+    Hourly, daily or weekly summary of a hospital's stock ledger for one
+    blood group. Buckets without any change are not stored.
+    """
+    
+    GRANULARITY_CHOICES = [
+        ('HOUR', 'Hourly'),
+        ('DAY', 'Daily'),
+        ('WEEK', 'Weekly'),
+    ]
+    
+    hospital = models.ForeignKey(HospitalProfile, on_delete=models.CASCADE, related_name='stock_rollups')
+    blood_group = models.CharField(max_length=3, choices=settings.BLOOD_GROUPS)
+    granularity = models.CharField(max_length=4, choices=GRANULARITY_CHOICES)
+    bucket_start = models.DateTimeField()
+    units_close = models.PositiveIntegerField()  # Balance after the bucket's last change
+    units_in = models.PositiveIntegerField(default=0)
+    units_out = models.PositiveIntegerField(default=0)
+    changes = models.PositiveIntegerField(default=0)
+    
+    class Meta:
+        db_table = 'hospital_blood_stock_rollups'
+        unique_together = ['hospital', 'blood_group', 'granularity', 'bucket_start']
+        indexes = [
+            models.Index(fields=['granularity', 'bucket_start'], name='stock_rollup_bucket_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.hospital.hospital_name} - {self.blood_group} {self.granularity} {self.bucket_start}: {self.units_close}"
+
+
+class StockRollupCursor(models.Model):
+    """Id of the last ledger row included in the rollups (a single row)"""
+    last_transaction_id = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        db_table = 'hospital_stock_rollup_cursor'
+
+
+class DemandForecast(models.Model):
+    """
+    Forecast blood demand (units requested per day) for one hospital and
+    blood group, replaced nightly by hospital.forecasting.
+    """
+    hospital = models.ForeignKey(HospitalProfile, on_delete=models.CASCADE, related_name='demand_forecasts')
+    blood_group = models.CharField(max_length=3, choices=settings.BLOOD_GROUPS)
+    starts_on = models.DateField()  # Day of daily_units[0]
+    daily_units = models.JSONField(default=list)
+    total_units = models.FloatField(default=0)  # Sum of daily_units
+    mean_abs_error = models.FloatField(default=0)  # One-day-ahead error over the history
+    history_units = models.PositiveIntegerField(default=0)  # Units requested in the history window
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        db_table = 'hospital_demand_forecasts'
+        unique_together = ['hospital', 'blood_group']
+    
+    def __str__(self):
+        return f"{self.hospital.hospital_name} - {self.blood_group} from {self.starts_on}: {self.total_units:.1f}"
+
+
+class HospitalDashboardSummary(models.Model):
+    """
+    Dashboard counters for one hospital, recomputed by hospital.dashboard
+    whenever its stock, patient requests or donor alert responses change
+    """
+    hospital = models.OneToOneField(HospitalProfile, on_delete=models.CASCADE, related_name='dashboard_summary')
+    active_requests = models.PositiveIntegerField(default=0)
+    total_stock = models.PositiveIntegerField(default=0)
+    pending_applications = models.PositiveIntegerField(default=0)
+    stock_by_group = models.JSONField(default=dict)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        db_table = 'hospital_dashboard_summaries'
+    
+    def __str__(self):
+        return f"{self.hospital.hospital_name} dashboard"
 
 
 class HospitalPatientRequest(models.Model):
@@ -42,6 +236,7 @@ class HospitalPatientRequest(models.Model):
         ('REJECTED', 'Rejected'),
         ('FULFILLED', 'Fulfilled'),
         ('CANCELLED', 'Cancelled'),
+        ('EXPIRED', 'Expired'),  # Approved, but its reservation lapsed at required_by before fulfilment
     ]
     
     patient = models.ForeignKey(PatientProfile, on_delete=models.CASCADE, related_name='hospital_requests')
@@ -58,6 +253,10 @@ class HospitalPatientRequest(models.Model):
     doctor_name = models.CharField(max_length=200, blank=True)
     doctor_contact = models.CharField(max_length=15, blank=True)
     
+    # Queue position, kept by hospital.request_queue: required_by brought
+    # forward for the request type and for a stock shortfall
+    priority_due = models.DateTimeField()
+    
     # Status
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='PENDING')
     created_at = models.DateTimeField(auto_now_add=True)
@@ -68,6 +267,9 @@ class HospitalPatientRequest(models.Model):
     class Meta:
         db_table = 'hospital_patient_requests'
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['hospital', 'status', 'priority_due', 'id'], name='patient_request_queue_idx'),
+        ]
     
     def __str__(self):
         return f"{self.patient.user.get_full_name()} - {self.blood_group} ({self.units_needed} units)"
@@ -122,4 +324,38 @@ class HospitalNetwork(models.Model):
         ordering = ['-requested_at']
     
     def __str__(self):
-        return f"{self.requesting_hospital.hospital_name} → {self.providing_hospital.hospital_name} ({self.blood_group})"
\ No newline at end of file
+        return f"{self.requesting_hospital.hospital_name} → {self.providing_hospital.hospital_name} ({self.blood_group})"
+
+
+class StockReservation(models.Model):
+    """
+    Units of a hospital's stock held for an approved patient request.
+    While HELD they are counted in BloodStock.units_reserved; see
+    hospital.reservations.
+    """
+    
+    STATUS_CHOICES = [
+        ('HELD', 'Held'),
+        ('FULFILLED', 'Fulfilled'),
+        ('RELEASED', 'Released'),
+    ]
+    
+    hospital = models.ForeignKey(HospitalProfile, on_delete=models.CASCADE, related_name='stock_reservations')
+    blood_group = models.CharField(max_length=3, choices=settings.BLOOD_GROUPS)
+    units = models.PositiveIntegerField()
+    patient_request = models.ForeignKey(HospitalPatientRequest, on_delete=models.CASCADE, related_name='reservations')
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='HELD')
+    expires_at = models.DateTimeField()  # The request's required_by; released by the sweeper after it
+    created_at = models.DateTimeField(auto_now_add=True)
+    closed_at = models.DateTimeField(null=True, blank=True)
+    created_by = models.ForeignKey('accounts.User', on_delete=models.SET_NULL, null=True, blank=True)
+    
+    class Meta:
+        db_table = 'hospital_stock_reservations'
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'expires_at'], name='stock_reservation_expiry_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.hospital.hospital_name} - {self.blood_group}: {self.units} unit(s) {self.status}"
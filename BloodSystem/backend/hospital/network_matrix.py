@@ -0,0 +1,109 @@
+"""
+Network-wide blood stock matrix (hospital x blood group) held in the cache.
+
+The matrix is stored as one cache entry per approved blood bank plus an
+index entry listing their ids, so a stock write only has to patch its own
+hospital's entry. Reading the whole network is one get_many. The
+database is only touched when entries are missing.
+
+Only a cache shared by every process (Redis, Memcached, the database
+cache) can be patched that way: a per-process cache such as the default
+LocMemCache never sees another worker's writes, so with one of those the
+matrix is not cached at all and every read builds it from the database.
+"""
+
+from django.conf import settings
+from django.core.cache import DEFAULT_CACHE_ALIAS, cache, caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+
+from accounts.models import HospitalProfile
+from .models import BloodStock
+
+INDEX_KEY = 'network_stock:index'
+HOSPITAL_KEY = 'network_stock:hospital:{}'
+
+
+def _hospital_key(hospital_id):
+    return HOSPITAL_KEY.format(hospital_id)
+
+
+def _shared_cache():
+    return not isinstance(caches[DEFAULT_CACHE_ALIAS], (LocMemCache, DummyCache))
+
+
+def _timeout():
+    return settings.NETWORK_STOCK_CACHE_SECONDS
+
+
+def _network_hospitals():
+    return HospitalProfile.objects.filter(verification_status='APPROVED', has_blood_bank=True)
+
+
+def _stock_by_hospital(hospital_ids):
+    """{hospital_id: ({blood_group: units on offer}, {blood_group: alert level})}"""
+    stock = {hospital_id: ({}, {}) for hospital_id in hospital_ids}
+    rows = BloodStock.objects.filter(hospital_id__in=hospital_ids).values_list(
+        'hospital_id', 'blood_group', 'units_available', 'units_reserved', 'alert_level'
+    )
+    for hospital_id, blood_group, units_available, units_reserved, alert_level in rows:
+        # Units held for a hospital's own patients are not on offer
+        stock[hospital_id][0][blood_group] = max(units_available - units_reserved, 0)
+        stock[hospital_id][1][blood_group] = alert_level
+    return stock
+
+
+def _build_rows(hospitals):
+    hospitals = list(hospitals)
+    stock = _stock_by_hospital([hospital.id for hospital in hospitals])
+    return {
+        hospital.id: {
+            'id': hospital.id,
+            'hospital_name': hospital.hospital_name,
+            'city': hospital.city,
+            'state': hospital.state,
+            'latitude': hospital.latitude,
+            'longitude': hospital.longitude,
+            'contact_person': hospital.authorized_person_name,
+            'contact_phone': hospital.authorized_person_mobile,
+            'stock': stock[hospital.id][0],
+            'alert_levels': stock[hospital.id][1],
+        }
+        for hospital in hospitals
+    }
+
+
+def get_network_matrix():
+    """Rows for every approved blood bank, keyed by hospital id"""
+    if not _shared_cache():
+        return _build_rows(_network_hospitals())
+    hospital_ids = cache.get(INDEX_KEY)
+    if hospital_ids is None:
+        rows = _build_rows(_network_hospitals())
+        cache.set_many({_hospital_key(hospital_id): row for hospital_id, row in rows.items()}, _timeout())
+        cache.set(INDEX_KEY, list(rows), _timeout())
+        return rows
+
+    cached = cache.get_many([_hospital_key(hospital_id) for hospital_id in hospital_ids])
+    rows = {row['id']: row for row in cached.values()}
+    missing = [hospital_id for hospital_id in hospital_ids if hospital_id not in rows]
+    if missing:
+        rebuilt = _build_rows(_network_hospitals().filter(id__in=missing))
+        cache.set_many({_hospital_key(hospital_id): row for hospital_id, row in rebuilt.items()}, _timeout())
+        rows.update(rebuilt)
+    return rows
+
+
+def refresh_hospital_stock(hospital_id):
+    """Patch one hospital's cached stock from the database after a stock write"""
+    key = _hospital_key(hospital_id)
+    row = cache.get(key)
+    if row is None:
+        return  # Not cached; it is rebuilt on the next read
+    row['stock'], row['alert_levels'] = _stock_by_hospital([hospital_id])[hospital_id]
+    cache.set(key, row, _timeout())
+
+
+def invalidate_network_matrix():
+    """Drop the index so that membership and hospital details are rebuilt on the next read"""
+    cache.delete(INDEX_KEY)
@@ -0,0 +1,103 @@
+"""
+Priority queue of patient blood requests.
+
+A request's priority is stored as priority_due, an effective deadline:
+required_by brought forward by a lead time for its request type and by
+another when the hospital has fewer units of the group in stock than the
+request needs. Ordering by it puts a DISASTER request due in two hours
+ahead of newer NORMAL ones, and the order does not change as time passes,
+so it can be kept in a column. The composite index (hospital, status,
+priority_due, id) then answers a page of the queue without sorting.
+
+priority_due is set when a request is saved and recomputed for the
+hospital's open requests whenever its stock changes (see hospital.signals).
+Pages are fetched by keyset: the cursor is the (priority_due, id) of the
+last request on the previous page.
+"""
+
+import base64
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+from .models import BloodStock, HospitalPatientRequest
+
+OPEN_STATUSES = ['PENDING', 'APPROVED']
+
+
+def effective_deadline(request_type, required_by, units_needed, units_available):
+    config = settings.PATIENT_REQUEST_PRIORITY
+    lead_hours = config['type_lead_hours'].get(request_type, 0)
+    if units_needed > units_available:
+        lead_hours += config['shortfall_lead_hours']
+    return required_by - timedelta(hours=lead_hours)
+
+
+def _units_available(hospital_id, blood_groups=None):
+    stocks = BloodStock.objects.filter(hospital_id=hospital_id)
+    if blood_groups is not None:
+        stocks = stocks.filter(blood_group__in=blood_groups)
+    return dict(stocks.values_list('blood_group', 'units_available'))
+
+
+def set_priority(patient_request):
+    """Fill in priority_due on a request about to be saved"""
+    units_available = _units_available(patient_request.hospital_id, [patient_request.blood_group])
+    patient_request.priority_due = effective_deadline(
+        patient_request.request_type, patient_request.required_by, patient_request.units_needed,
+        units_available.get(patient_request.blood_group, 0)
+    )
+
+
+def update_priorities(hospital_id, blood_groups=None):
+    """Recompute priority_due for a hospital's open requests after a stock change"""
+    units_available = _units_available(hospital_id, blood_groups)
+    requests = HospitalPatientRequest.objects.filter(hospital_id=hospital_id, status__in=OPEN_STATUSES)
+    if blood_groups is not None:
+        requests = requests.filter(blood_group__in=blood_groups)
+    changed = []
+    for patient_request in requests.only('id', 'blood_group', 'units_needed', 'request_type', 'required_by', 'priority_due'):
+        priority_due = effective_deadline(
+            patient_request.request_type, patient_request.required_by, patient_request.units_needed,
+            units_available.get(patient_request.blood_group, 0)
+        )
+        if priority_due != patient_request.priority_due:
+            patient_request.priority_due = priority_due
+            changed.append(patient_request)
+    HospitalPatientRequest.objects.bulk_update(changed, ['priority_due'], batch_size=500)
+    return len(changed)
+
+
+def encode_cursor(patient_request):
+    value = f'{patient_request.priority_due.isoformat()}|{patient_request.id}'
+    return base64.urlsafe_b64encode(value.encode()).decode()
+
+
+def decode_cursor(cursor):
+    """Return (priority_due, id) from a cursor or raise ValueError"""
+    try:
+        priority_due, request_id = base64.urlsafe_b64decode(cursor.encode()).decode().split('|')
+        priority_due = parse_datetime(priority_due)
+        request_id = int(request_id)
+    except (ValueError, UnicodeError):
+        raise ValueError('Invalid cursor')
+    if priority_due is None:
+        raise ValueError('Invalid cursor')
+    return priority_due, request_id
+
+
+def queue_page(hospital_id, request_status, limit, cursor=None):
+    """
+    Up to limit requests of one hospital and status in priority order,
+    after cursor. Returns (requests, next cursor or None).
+    """
+    requests = HospitalPatientRequest.objects.filter(hospital_id=hospital_id, status=request_status)
+    if cursor:
+        priority_due, request_id = decode_cursor(cursor)
+        requests = requests.filter(Q(priority_due__gt=priority_due) | Q(priority_due=priority_due, id__gt=request_id))
+    page = list(requests.select_related('patient__user').order_by('priority_due', 'id')[:limit + 1])
+    if len(page) > limit:
+        return page[:limit], encode_cursor(page[limit - 1])
+    return page, None
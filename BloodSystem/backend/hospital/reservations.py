@@ -0,0 +1,126 @@
+"""
+Stock reservations for approved patient requests.
+
+Approving a request holds its units: a conditional UPDATE adds them to
+BloodStock.units_reserved only if units_available minus units_reserved
+still covers them, and a HELD StockReservation records the hold. Reserved
+units stay in units_available (and in their batches) until the request
+is fulfilled, but subtractions and transfers only draw on the net
+available units, so the same units cannot be promised twice.
+
+A reservation is closed exactly once: release and fulfilment close it
+with a conditional HELD -> FULFILLED/RELEASED UPDATE before decrementing
+units_reserved, and the sweeper selects the expired rows FOR UPDATE
+before closing them. Every path thus locks the reservation row before the
+stock row, so releases and the sweeper cannot deadlock each other.
+"""
+
+from django.db import transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from .models import BloodStock, HospitalPatientRequest, StockReservation
+from .signals import stock_changed
+from .stock import InsufficientStock, change_stock
+
+
+def reserve_units(patient_request, user=None):
+    """Hold the request's units; raises InsufficientStock if the net available units are short"""
+    units = patient_request.units_needed
+    with transaction.atomic():
+        held = BloodStock.objects.filter(
+            hospital_id=patient_request.hospital_id, blood_group=patient_request.blood_group,
+            units_available__gte=F('units_reserved') + units
+        ).update(units_reserved=F('units_reserved') + units, last_updated=timezone.now())
+        if not held:
+            raise InsufficientStock(patient_request.blood_group, units)
+        reservation = StockReservation.objects.create(
+            hospital_id=patient_request.hospital_id, blood_group=patient_request.blood_group, units=units,
+            patient_request=patient_request, expires_at=patient_request.required_by, created_by=user
+        )
+        stock_changed.send(
+            sender=BloodStock, hospital_id=patient_request.hospital_id, blood_groups=[patient_request.blood_group]
+        )
+    return reservation
+
+
+def _close(reservation, closed_status, now):
+    """Close one HELD reservation and give back its reserved units; False if it was already closed"""
+    closed = StockReservation.objects.filter(pk=reservation.pk, status='HELD').update(
+        status=closed_status, closed_at=now
+    )
+    if closed:
+        BloodStock.objects.filter(hospital_id=reservation.hospital_id, blood_group=reservation.blood_group).update(
+            units_reserved=Greatest(F('units_reserved') - reservation.units, 0), last_updated=now
+        )
+    return bool(closed)
+
+
+def release_reservations(patient_request):
+    """Release the request's held units (rejected or cancelled); returns the units released"""
+    now = timezone.now()
+    released = 0
+    with transaction.atomic():
+        for reservation in patient_request.reservations.filter(status='HELD'):
+            if _close(reservation, 'RELEASED', now):
+                released += reservation.units
+        if released:
+            stock_changed.send(
+                sender=BloodStock, hospital_id=patient_request.hospital_id, blood_groups=[patient_request.blood_group]
+            )
+    return released
+
+
+def fulfil_request_stock(patient_request, user=None):
+    """
+    Issue the request's units from stock (earliest expiry first), turning
+    a held reservation into the issue. A reservation the sweeper already
+    released (the request is then EXPIRED) is no longer covered, so the
+    units come from the net available stock. Raises InsufficientStock when
+    they are not there.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        for reservation in patient_request.reservations.filter(status='HELD'):
+            _close(reservation, 'FULFILLED', now)
+        return change_stock(
+            patient_request.hospital_id, patient_request.blood_group, 'subtract', patient_request.units_needed,
+            user=user, notes=f'Patient request #{patient_request.id}'
+        )
+
+
+def release_expired_reservations(now=None):
+    """
+    Release every HELD reservation past its expiry. The expired rows are
+    locked and read through the (status, expires_at) index first, so
+    exactly those are closed by id and only their units are given back,
+    with one UPDATE per stock row. Their approved patient requests become
+    EXPIRED, so the lapsed holds show up in the hospital's queue. Returns
+    the number of reservations released.
+    """
+    now = now or timezone.now()
+    with transaction.atomic():
+        expired = list(StockReservation.objects.select_for_update().filter(
+            status='HELD', expires_at__lt=now
+        ).order_by('id').values_list('id', 'hospital_id', 'blood_group', 'units', 'patient_request_id'))
+        if not expired:
+            return 0
+        StockReservation.objects.filter(id__in=[row[0] for row in expired]).update(
+            status='RELEASED', closed_at=now
+        )
+        HospitalPatientRequest.objects.filter(
+            id__in={row[4] for row in expired}, status='APPROVED'
+        ).update(status='EXPIRED', updated_at=now)
+        totals = {}
+        for _, hospital_id, blood_group, units, _ in expired:
+            totals[hospital_id, blood_group] = totals.get((hospital_id, blood_group), 0) + units
+        changed_groups = {}
+        for (hospital_id, blood_group), units in sorted(totals.items()):
+            BloodStock.objects.filter(hospital_id=hospital_id, blood_group=blood_group).update(
+                units_reserved=Greatest(F('units_reserved') - units, 0), last_updated=now
+            )
+            changed_groups.setdefault(hospital_id, []).append(blood_group)
+        for hospital_id, blood_groups in changed_groups.items():
+            stock_changed.send(sender=BloodStock, hospital_id=hospital_id, blood_groups=blood_groups)
+    return len(expired)
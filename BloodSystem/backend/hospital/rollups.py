@@ -0,0 +1,206 @@
+"""
+Stock trend rollups.
+
+The BloodStockTransaction ledger is the raw time series: it is append
+only and every stock change writes one row with the balance after it.
+roll_up() folds new ledger rows into hourly BloodStockRollup buckets,
+hourly buckets into daily ones and daily into weekly (weeks start on
+Monday, UTC). StockRollupCursor records the last ledger row included.
+
+stock_trend() answers a chart request from the tier that fits the
+window. It reads per-bucket totals grouped in the database, so a 90-day
+window is at most a few hundred rows however many hospitals it covers. The
+levels are rebuilt backwards from the current BloodStock totals, with
+ledger rows newer than the cursor added on top.
+"""
+
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+
+from django.db import transaction
+from django.db.models import Max, Sum
+from django.utils import timezone
+
+from .models import BloodStock, BloodStockRollup, BloodStockTransaction, StockRollupCursor
+
+# Ledger rows younger than this are left for the next run, so that rows
+# from transactions that commit out of id order are not skipped
+SETTLE_SECONDS = 60
+
+# (granularity, longest window it serves, bucket length); a 90-day chart uses days
+TIERS = [
+    ('HOUR', timedelta(days=3), timedelta(hours=1)),
+    ('DAY', timedelta(days=120), timedelta(days=1)),
+    ('WEEK', None, timedelta(weeks=1)),
+]
+BUCKET_LENGTHS = {granularity: length for granularity, _, length in TIERS}
+
+
+def bucket_start(granularity, moment):
+    """Start (UTC) of the bucket containing moment"""
+    moment = moment.astimezone(dt_timezone.utc)
+    if granularity == 'HOUR':
+        return moment.replace(minute=0, second=0, microsecond=0)
+    day = datetime.combine(moment.date(), time.min, tzinfo=dt_timezone.utc)
+    if granularity == 'DAY':
+        return day
+    return day - timedelta(days=day.weekday())
+
+
+def granularity_for(window):
+    for granularity, longest, _ in TIERS:
+        if longest is None or window <= longest:
+            return granularity
+
+
+def _summarise(granularity, series_rows):
+    """
+    Build rollups for (hospital_id, blood_group, moment, units_close,
+    units_in, units_out, changes) rows, ordered by time within each series
+    """
+    buckets = {}
+    for hospital_id, blood_group, moment, units_close, units_in, units_out, changes in series_rows:
+        key = (hospital_id, blood_group, bucket_start(granularity, moment))
+        rollup = buckets.get(key)
+        if rollup is None:
+            rollup = buckets[key] = BloodStockRollup(
+                hospital_id=hospital_id, blood_group=blood_group, granularity=granularity,
+                bucket_start=key[2], units_close=units_close
+            )
+        rollup.units_close = units_close
+        rollup.units_in += units_in
+        rollup.units_out += units_out
+        rollup.changes += changes
+    return buckets
+
+
+def _replace(granularity, hospital_ids, start, end, buckets):
+    """Swap the stored rollups of these hospitals in [start, end) for freshly computed ones"""
+    BloodStockRollup.objects.filter(
+        granularity=granularity, hospital_id__in=hospital_ids, bucket_start__gte=start, bucket_start__lt=end
+    ).delete()
+    BloodStockRollup.objects.bulk_create(buckets.values(), batch_size=1000)
+
+
+def _roll_tier(granularity, finer, hospital_ids, start, end):
+    """
+    Recompute the granularity buckets overlapping [start, end) for
+    hospital_ids from the finer rollups; returns the range covered
+    """
+    start = bucket_start(granularity, start)
+    end = bucket_start(granularity, end - timedelta(microseconds=1)) + BUCKET_LENGTHS[granularity]
+    rows = BloodStockRollup.objects.filter(
+        granularity=finer, hospital_id__in=hospital_ids, bucket_start__gte=start, bucket_start__lt=end
+    ).order_by('hospital_id', 'blood_group', 'bucket_start').values_list(
+        'hospital_id', 'blood_group', 'bucket_start', 'units_close', 'units_in', 'units_out', 'changes'
+    )
+    _replace(granularity, hospital_ids, start, end, _summarise(granularity, rows))
+    return start, end
+
+
+def roll_up(batch_size=5000):
+    """
+    Fold settled ledger rows newer than the cursor into the rollups, in
+    batches of batch_size ledger rows. Every bucket a batch touches is
+    recomputed whole, for all of the hospital's blood groups, so running
+    a batch twice is harmless. Returns the number of ledger rows rolled up.
+    """
+    cursor, _ = StockRollupCursor.objects.get_or_create(pk=1)
+    settled = timezone.now() - timedelta(seconds=SETTLE_SECONDS)
+    upper = BloodStockTransaction.objects.filter(
+        id__gt=cursor.last_transaction_id, created_at__lt=settled
+    ).aggregate(upper=Max('id'))['upper']
+    total = 0
+    while upper is not None and cursor.last_transaction_id < upper:
+        new_rows = list(BloodStockTransaction.objects.filter(
+            id__gt=cursor.last_transaction_id, id__lte=upper
+        ).order_by('id').values_list('id', 'hospital_id', 'created_at')[:batch_size])
+        last_id = new_rows[-1][0]
+        hospital_ids = {hospital_id for _, hospital_id, _ in new_rows}
+        start = bucket_start('HOUR', min(moment for _, _, moment in new_rows))
+        end = bucket_start('HOUR', max(moment for _, _, moment in new_rows)) + BUCKET_LENGTHS['HOUR']
+
+        with transaction.atomic():
+            ledger = BloodStockTransaction.objects.filter(
+                hospital_id__in=hospital_ids, created_at__gte=start, created_at__lt=end, id__lte=last_id
+            ).order_by('hospital_id', 'blood_group', 'created_at', 'id').values_list(
+                'hospital_id', 'blood_group', 'created_at', 'balance_after', 'units_change'
+            )
+            hourly = _summarise('HOUR', (
+                (hospital_id, blood_group, moment, balance_after, max(units_change, 0), max(-units_change, 0), 1)
+                for hospital_id, blood_group, moment, balance_after, units_change in ledger
+            ))
+            _replace('HOUR', hospital_ids, start, end, hourly)
+            day_range = _roll_tier('DAY', 'HOUR', hospital_ids, start, end)
+            _roll_tier('WEEK', 'DAY', hospital_ids, *day_range)
+
+            StockRollupCursor.objects.filter(pk=cursor.pk).update(last_transaction_id=last_id)
+        cursor.last_transaction_id = last_id
+        total += len(new_rows)
+    return total
+
+
+def rebuild_rollups(batch_size=5000):
+    """Drop every rollup and roll the whole ledger up again"""
+    with transaction.atomic():
+        BloodStockRollup.objects.all().delete()
+        StockRollupCursor.objects.update_or_create(pk=1, defaults={'last_transaction_id': 0})
+    return roll_up(batch_size)
+
+
+def stock_trend(hospital_filter, window, blood_group=None, now=None):
+    """
+    Stock levels over the last window (a timedelta) for the hospitals
+    matched by hospital_filter (lookups on the hospital relation, e.g.
+    {'hospital_id': 3} or {'hospital__state__iexact': 'Kerala'}).
+    Returns (granularity, {blood_group: [point, ...]}) with one point per
+    bucket, each holding bucket_start, units (level at the end of the
+    bucket), units_in and units_out.
+    """
+    now = now or timezone.now()
+    granularity = granularity_for(window)
+    length = BUCKET_LENGTHS[granularity]
+    first = bucket_start(granularity, now - window)
+    starts = []
+    start = first
+    while start <= now:
+        starts.append(start)
+        start += length
+
+    def scoped(queryset):
+        queryset = queryset.filter(**hospital_filter)
+        return queryset.filter(blood_group=blood_group) if blood_group else queryset
+
+    levels = {
+        row['blood_group']: row['units'] or 0
+        for row in scoped(BloodStock.objects.all()).values('blood_group').annotate(units=Sum('units_available'))
+    }
+    flows = {}  # (blood_group, bucket_start) -> [units_in, units_out]
+    rolled = scoped(BloodStockRollup.objects.filter(granularity=granularity, bucket_start__gte=first))
+    for row in rolled.values('blood_group', 'bucket_start').annotate(
+        units_in=Sum('units_in'), units_out=Sum('units_out')
+    ).order_by():
+        flows[(row['blood_group'], row['bucket_start'])] = [row['units_in'], row['units_out']]
+
+    # Ledger rows not rolled up yet (only the last few minutes when the job runs regularly)
+    cursor = StockRollupCursor.objects.filter(pk=1).values_list('last_transaction_id', flat=True).first() or 0
+    recent = scoped(BloodStockTransaction.objects.filter(id__gt=cursor, created_at__gte=first))
+    for group, moment, units_change in recent.values_list('blood_group', 'created_at', 'units_change').iterator():
+        key = (group, bucket_start(granularity, moment))
+        flow = flows.setdefault(key, [0, 0])
+        flow[0 if units_change > 0 else 1] += abs(units_change)
+
+    groups = [blood_group] if blood_group else sorted(levels)
+    trend = {}
+    for group in groups:
+        # Walk back from the current level to the level before the window
+        level = levels.get(group, 0)
+        for start in starts:
+            units_in, units_out = flows.get((group, start), (0, 0))
+            level -= units_in - units_out
+        points = []
+        for start in starts:
+            units_in, units_out = flows.get((group, start), (0, 0))
+            level += units_in - units_out
+            points.append({'bucket_start': start, 'units': level, 'units_in': units_in, 'units_out': units_out})
+        trend[group] = points
+    return granularity, trend
@@ -0,0 +1,165 @@
+"""
+Split an inter-hospital blood request across providers.
+
+Every unit a provider could send costs, in km-equivalents, its distance
+from the requester plus a penalty when it is a compatible substitute
+rather than the requested group, plus a term that grows with the shelf
+life it has left. The last term means units that would otherwise expire
+at the provider are sent first. Units held for a provider's own patient
+requests (BloodStock.units_reserved) are never offered. With a single
+destination and linear costs, the min-cost allocation is simply the
+cheapest units first.
+
+Providers are searched in widening rings around the requester through
+the geo_cell index. A unit outside a ring of radius r costs at least r,
+so the search stops as soon as the plan is filled and its dearest unit
+costs no more than the ring radius. A request therefore touches a few
+nearby hospitals and their unit batches, however large the network is.
+"""
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q, Sum
+from django.utils import timezone
+
+from accounts.models import HospitalProfile
+from bloodsystem.compatibility import donor_groups
+from bloodsystem.geo import haversine_km, within_radius_q
+from .models import BloodStock, BloodUnitBatch, HospitalNetwork
+
+# Search radii in km; a final round takes every remaining provider
+RING_RADII_KM = [25, 50, 100, 200, 400]
+
+
+def _rounds(hospital):
+    """
+    Yield (provider filter, radius) rounds. Every provider not matched by
+    the rounds so far is farther than radius; the last round has radius
+    None and matches everyone. Providers without coordinates are costed
+    by city, so they are all taken in the first round.
+    """
+    if hospital.latitude is None or hospital.longitude is None:
+        yield Q(), None
+        return
+    unlocated = Q(geo_cell__isnull=True)
+    for radius in RING_RADII_KM:
+        yield within_radius_q(hospital.latitude, hospital.longitude, radius) | unlocated, radius
+    yield Q(), None
+
+
+def _base_cost(hospital, provider):
+    """(distance_km or None, distance cost) from the requester to a provider"""
+    if None not in (hospital.latitude, hospital.longitude, provider['latitude'], provider['longitude']):
+        distance = haversine_km(hospital.latitude, hospital.longitude, provider['latitude'], provider['longitude'])
+        return distance, distance
+    if provider['city'].lower() == hospital.city.lower():
+        return None, 0
+    return None, settings.NETWORK_ROUTING['unknown_distance_km']
+
+
+def _lots(hospital_ids, groups, required_on):
+    """
+    Units per (hospital, group, expiry date) that are still usable on
+    required_on, capped at the units the provider has not reserved. A
+    transfer issues the earliest-expiring of these same lots, so the cap
+    is taken from the latest-expiring ones.
+    """
+    unreserved = {
+        (hospital_id, group): units
+        for hospital_id, group, units in BloodStock.objects.filter(
+            hospital_id__in=hospital_ids, blood_group__in=groups
+        ).values_list('hospital_id', 'blood_group', F('units_available') - F('units_reserved'))
+    }
+    lots = BloodUnitBatch.objects.filter(
+        hospital_id__in=hospital_ids,
+        blood_group__in=groups,
+        status='AVAILABLE',
+        expires_on__gte=required_on
+    ).values('hospital_id', 'blood_group', 'expires_on').annotate(units=Sum('units_remaining')).order_by('expires_on')
+    for lot in lots:
+        key = (lot['hospital_id'], lot['blood_group'])
+        lot['units'] = min(lot['units'], max(unreserved.get(key, 0), 0))
+        if lot['units']:
+            unreserved[key] -= lot['units']
+            yield lot
+
+
+def plan_route(hospital, blood_group, units, required_by, allow_substitutes=True):
+    """
+    Return (allocations, units_short) for units of blood_group needed by
+    hospital before required_by (a datetime). Each allocation is a dict
+    with the provider (id, hospital_name, city, latitude, longitude),
+    blood_group, units, distance_km and total cost, cheapest first.
+    """
+    costs = settings.NETWORK_ROUTING
+    shelf_life = settings.BLOOD_UNIT_SHELF_LIFE_DAYS
+    required_on = timezone.localdate(required_by)
+    groups = donor_groups(blood_group) if allow_substitutes else [blood_group]
+
+    providers = {}
+    priced = []  # (cost per unit, hospital_id, group, units)
+    for query, radius in _rounds(hospital):
+        found = HospitalProfile.objects.filter(
+            query, verification_status='APPROVED', has_blood_bank=True
+        ).exclude(id=hospital.id).values('id', 'hospital_name', 'city', 'latitude', 'longitude')
+        new = {}
+        for provider in found:
+            if provider['id'] not in providers:
+                provider['distance_km'], provider['cost'] = _base_cost(hospital, provider)
+                new[provider['id']] = provider
+        providers.update(new)
+
+        for lot in _lots(list(new), groups, required_on) if new else []:
+            penalty = 0 if lot['blood_group'] == blood_group else costs['substitute_penalty_km']
+            days_left = (lot['expires_on'] - required_on).days
+            expiry_cost = costs['expiry_weight_km'] * min(days_left, shelf_life) / shelf_life
+            cost = new[lot['hospital_id']]['cost'] + penalty + expiry_cost
+            priced.append((cost, lot['hospital_id'], lot['blood_group'], lot['units']))
+
+        priced.sort(key=lambda lot: lot[0])
+        taken = []
+        remaining = units
+        for lot in priced:
+            if not remaining:
+                break
+            take = min(lot[3], remaining)
+            taken.append((lot, take))
+            remaining -= take
+
+        # Nothing farther out can undercut the dearest unit taken
+        if not remaining and radius is not None and taken[-1][0][0] <= radius:
+            break
+
+    allocations = {}
+    for (cost, hospital_id, group, _), take in taken:
+        key = (hospital_id, group)
+        if key not in allocations:
+            provider = providers[hospital_id]
+            allocations[key] = {
+                'provider': provider,
+                'blood_group': group,
+                'units': 0,
+                'distance_km': provider['distance_km'],
+                'cost': 0.0,
+            }
+        allocations[key]['units'] += take
+        allocations[key]['cost'] += cost * take
+    return list(allocations.values()), remaining
+
+
+def create_routed_requests(hospital, allocations, user, urgency, reason, required_by):
+    """Create one HospitalNetwork request per allocation in a single transaction"""
+    with transaction.atomic():
+        return HospitalNetwork.objects.bulk_create([
+            HospitalNetwork(
+                requesting_hospital=hospital,
+                providing_hospital_id=allocation['provider']['id'],
+                blood_group=allocation['blood_group'],
+                units_requested=allocation['units'],
+                reason=reason,
+                urgency=urgency,
+                required_by=required_by,
+                requested_by=user
+            )
+            for allocation in allocations
+        ])
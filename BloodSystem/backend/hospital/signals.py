@@ -0,0 +1,93 @@
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import post_save, post_delete, pre_save
+from django.dispatch import Signal, receiver
+
+from accounts.models import HospitalProfile
+from donor.models import DonorHospitalAlertResponse
+from .dashboard import alert_response_hospital_id, refresh_dashboard_summary
+from .models import BloodStock, HospitalPatientRequest
+from .network_matrix import invalidate_network_matrix, refresh_hospital_stock
+from .request_queue import set_priority, update_priorities
+from .stock_alerts import alert_level_update, raise_stock_alert, thresholds_for
+
+# Sent by hospital.stock inside the write transaction after BloodStock rows
+# change. Arguments: hospital_id, blood_groups.
+stock_changed = Signal()
+
+# Sent by hospital.stock inside the write transaction when a blood group
+# moves to a worse alert level. Arguments: hospital_id, blood_group,
+# alert_level, units_available, target_units.
+stock_alert = Signal()
+
+
+@receiver(stock_changed)
+def patch_network_matrix(sender, hospital_id, **kwargs):
+    transaction.on_commit(lambda: refresh_hospital_stock(hospital_id))
+
+
+@receiver(post_save, sender=HospitalProfile)
+@receiver(post_delete, sender=HospitalProfile)
+def reset_network_matrix(sender, instance, **kwargs):
+    transaction.on_commit(invalidate_network_matrix)
+
+
+@receiver(pre_save, sender=HospitalProfile)
+def note_storage_capacity_change(sender, instance, raw=False, update_fields=None, **kwargs):
+    instance._storage_capacity_changed = (
+        not raw and instance.pk is not None
+        and (update_fields is None or 'storage_capacity' in update_fields)
+        and HospitalProfile.objects.filter(pk=instance.pk).values_list('storage_capacity', flat=True).first()
+        != instance.storage_capacity
+    )
+
+
+@receiver(post_save, sender=HospitalProfile)
+def update_stock_thresholds(sender, instance, **kwargs):
+    # storage_capacity changed; levels catch up with the new thresholds at once
+    if getattr(instance, '_storage_capacity_changed', False):
+        rows = BloodStock.objects.filter(hospital_id=instance.id)
+        rows.update(**thresholds_for(instance.storage_capacity))
+        rows.update(**alert_level_update(F('units_available')))
+
+
+def _refresh_dashboard_on_commit(hospital_id):
+    if hospital_id is not None:
+        transaction.on_commit(lambda: refresh_dashboard_summary(hospital_id))
+
+
+@receiver(stock_changed)
+def refresh_dashboard_stock(sender, hospital_id, **kwargs):
+    _refresh_dashboard_on_commit(hospital_id)
+
+
+@receiver(post_save, sender=BloodStock)
+@receiver(post_delete, sender=BloodStock)
+@receiver(post_save, sender=HospitalPatientRequest)
+@receiver(post_delete, sender=HospitalPatientRequest)
+def refresh_dashboard_hospital(sender, instance, **kwargs):
+    _refresh_dashboard_on_commit(instance.hospital_id)
+
+
+@receiver(post_save, sender=DonorHospitalAlertResponse)
+@receiver(post_delete, sender=DonorHospitalAlertResponse)
+def refresh_dashboard_alert_response(sender, instance, **kwargs):
+    _refresh_dashboard_on_commit(alert_response_hospital_id(instance))
+
+
+@receiver(pre_save, sender=HospitalPatientRequest)
+def set_request_priority(sender, instance, raw=False, **kwargs):
+    if not raw:
+        set_priority(instance)
+
+
+@receiver(stock_changed)
+def update_request_priorities(sender, hospital_id, blood_groups=None, **kwargs):
+    transaction.on_commit(lambda: update_priorities(hospital_id, blood_groups))
+
+
+@receiver(stock_alert)
+def raise_alert_on_commit(sender, hospital_id, blood_group, alert_level, units_available, target_units, **kwargs):
+    transaction.on_commit(
+        lambda: raise_stock_alert(hospital_id, blood_group, alert_level, units_available, target_units)
+    )
@@ -0,0 +1,466 @@
+"""
+Blood stock write path.
+
+Units are held as BloodUnitBatch rows (one per receipt, with collection
+and expiry dates); BloodStock.units_available is the per-group total
+kept alongside them as a cache. Every change goes through change_stock(),
+transfer_stock() or expire_stock(). These functions update the BloodStock
+row first with a conditional UPDATE using F() expressions inside
+transaction.atomic(). That row lock serialises writers of one hospital's
+blood group, and the batches are then adjusted under it. The
+same UPDATE sets the row's low-stock alert level (hospital.stock_alerts)
+and last_updated, which QuerySet.update() does not fill in from auto_now. A
+BloodStockTransaction ledger row is appended in the same transaction.
+Concurrent writers therefore never lose updates, and a subtraction that
+would take the count below zero is rejected instead of clamped. So is a
+'set' (or sync) below the units reserved, which would leave holds with no
+units behind them.
+
+Units leave first-expired-first-out: subtractions and transfers draw on
+the unexpired batch with the earliest expiry date first. They may only
+take units not held for approved patient requests (units_reserved, see
+hospital.reservations).
+"""
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F, Sum, Value
+from django.utils import timezone
+
+from accounts.models import HospitalProfile
+from .models import BloodStock, BloodStockTransaction, BloodUnitBatch
+from .signals import stock_alert, stock_changed
+from .stock_alerts import SEVERITY, alert_level_update, set_alert_level, thresholds_for
+
+BLOOD_GROUP_CODES = {code for code, _ in settings.BLOOD_GROUPS}
+
+OPERATIONS = {
+    'add': 'ADD',
+    'subtract': 'SUBTRACT',
+    'set': 'SET',
+}
+
+
+class InsufficientStock(Exception):
+    """Raised when a subtraction would take stock below zero"""
+
+    def __init__(self, blood_group, units_requested):
+        self.blood_group = blood_group
+        self.units_requested = units_requested
+        super().__init__(f'Insufficient {blood_group} stock for {units_requested} unit(s)')
+
+
+class ReservedStockConflict(InsufficientStock):
+    """Raised when a 'set' would take stock below the units reserved for patient requests"""
+
+    def __init__(self, blood_group, units_requested, units_reserved):
+        self.blood_group = blood_group
+        self.units_requested = units_requested
+        self.units_reserved = units_reserved
+        Exception.__init__(
+            self, f'{units_reserved} unit(s) of {blood_group} are reserved for approved patient requests; '
+                  f'release them before setting the count to {units_requested}'
+        )
+
+
+def provision_stock_rows(hospital_ids):
+    """Create any missing BloodStock rows (one per blood group) for hospital_ids in a single INSERT"""
+    capacities = dict(HospitalProfile.objects.filter(id__in=hospital_ids).values_list('id', 'storage_capacity'))
+    BloodStock.objects.bulk_create(
+        [
+            BloodStock(hospital_id=hospital_id, blood_group=blood_group, **thresholds_for(capacities.get(hospital_id)))
+            for hospital_id in hospital_ids
+            for blood_group, _ in settings.BLOOD_GROUPS
+        ],
+        ignore_conflicts=True
+    )
+    for hospital_id in hospital_ids:
+        stock_changed.send(sender=BloodStock, hospital_id=hospital_id, blood_groups=list(BLOOD_GROUP_CODES))
+
+
+def _provision(hospital_id, blood_group):
+    # Rows are normally provisioned on approval, so this rarely runs
+    capacity = HospitalProfile.objects.filter(id=hospital_id).values_list('storage_capacity', flat=True).first()
+    BloodStock.objects.bulk_create(
+        [BloodStock(hospital_id=hospital_id, blood_group=blood_group, **thresholds_for(capacity))],
+        ignore_conflicts=True
+    )
+
+
+def _detect_crossing(stock):
+    """Send stock_alert if the write just made moved the row to a worse alert level"""
+    if SEVERITY[stock.alert_level] > SEVERITY[stock.previous_alert_level]:
+        stock_alert.send(
+            sender=BloodStock, hospital_id=stock.hospital_id, blood_group=stock.blood_group,
+            alert_level=stock.alert_level, units_available=stock.units_available,
+            target_units=stock.low_threshold + stock.threshold_margin
+        )
+
+
+def default_lot(units, collected_on=None, expires_on=None):
+    """
+    A (collected_on, expires_on, units) lot, filling in today and the
+    standard shelf life. Already expired units are refused: FEFO issue
+    skips them, so they would only inflate units_available until the sweep.
+    """
+    today = timezone.localdate()
+    collected_on = collected_on or today
+    expires_on = expires_on or collected_on + timedelta(days=settings.BLOOD_UNIT_SHELF_LIFE_DAYS)
+    if expires_on < collected_on:
+        raise ValueError('Expiry date must not be before the collection date')
+    if expires_on < today:
+        raise ValueError('Expiry date must not be in the past')
+    return collected_on, expires_on, units
+
+
+def _receive(hospital_id, blood_group, lots, source, network_request=None):
+    _receive_groups(hospital_id, {blood_group: lots}, source, network_request)
+
+
+def _receive_groups(hospital_id, lots_by_group, source, network_request=None):
+    """Create a batch for every (collected_on, expires_on, units) lot in {blood_group: lots}"""
+    BloodUnitBatch.objects.bulk_create([
+        BloodUnitBatch(
+            hospital_id=hospital_id,
+            blood_group=blood_group,
+            units_received=units,
+            units_remaining=units,
+            collected_on=collected_on,
+            expires_on=expires_on,
+            source=source,
+            network_request=network_request
+        )
+        for blood_group, lots in lots_by_group.items()
+        for collected_on, expires_on, units in lots
+        if units > 0
+    ])
+
+
+def _issue_groups(hospital_id, wanted, include_expired=False, required_on=None):
+    """
+    Take units from the batches that expire first for several blood
+    groups at once ({blood_group: units}) and return {blood_group: lots
+    taken}. Only unexpired batches are used unless include_expired is set
+    (for stock count corrections); with required_on, only batches still
+    usable on that date.
+    """
+    batches = BloodUnitBatch.objects.filter(
+        hospital_id=hospital_id, blood_group__in=list(wanted), status='AVAILABLE'
+    ).order_by('blood_group', 'expires_on', 'id')
+    if not include_expired:
+        today = timezone.localdate()
+        batches = batches.filter(expires_on__gte=max(required_on or today, today))
+
+    remaining = dict(wanted)
+    issued = {blood_group: [] for blood_group in wanted}
+    depleted = []
+    partial = []
+    for batch in batches.only('id', 'blood_group', 'units_remaining', 'collected_on', 'expires_on'):
+        if not remaining[batch.blood_group]:
+            continue
+        taken = min(batch.units_remaining, remaining[batch.blood_group])
+        remaining[batch.blood_group] -= taken
+        issued[batch.blood_group].append((batch.collected_on, batch.expires_on, taken))
+        if taken == batch.units_remaining:
+            depleted.append(batch.id)
+        else:
+            batch.units_remaining -= taken
+            partial.append(batch)
+    for blood_group, units in remaining.items():
+        if units:
+            raise InsufficientStock(blood_group, wanted[blood_group])
+    # Emptied batches in one UPDATE; at most one batch per group is left part-used
+    BloodUnitBatch.objects.filter(id__in=depleted).update(units_remaining=0, status='DEPLETED')
+    BloodUnitBatch.objects.bulk_update(partial, ['units_remaining'])
+    return issued
+
+
+def _issue(hospital_id, blood_group, units, include_expired=False, required_on=None):
+    """Take units of one blood group first-expired-first-out and return the lots taken"""
+    return _issue_groups(hospital_id, {blood_group: units}, include_expired, required_on)[blood_group]
+
+
+def _apply(rows, hospital_id, blood_group, operation, units, lots, source, network_request, required_on=None):
+    """Run the conditional UPDATE for one operation, move the batches and return (signed change, lots issued)"""
+    if operation == 'add':
+        added = F('units_available') + units
+        if not rows.update(units_available=added, last_updated=timezone.now(), **alert_level_update(added)):
+            _provision(hospital_id, blood_group)
+            rows.update(units_available=added, last_updated=timezone.now(), **alert_level_update(added))
+        _receive(hospital_id, blood_group, lots, source, network_request)
+        return units, []
+
+    if operation == 'subtract':
+        # Matches no row when the unreserved stock is short (or the row does not exist yet)
+        taken = F('units_available') - units
+        if not rows.filter(units_available__gte=F('units_reserved') + units).update(
+            units_available=taken, last_updated=timezone.now(), **alert_level_update(taken)
+        ):
+            raise InsufficientStock(blood_group, units)
+        return -units, _issue(hospital_id, blood_group, units, required_on=required_on)
+
+    # 'set' needs the previous value for the ledger, so lock the row first
+    stock = rows.select_for_update().only('units_available', 'units_reserved').first()
+    if stock is None:
+        _provision(hospital_id, blood_group)
+        stock = rows.select_for_update().only('units_available', 'units_reserved').get()
+    if units < stock.units_reserved:
+        raise ReservedStockConflict(blood_group, units, stock.units_reserved)
+    rows.update(units_available=units, last_updated=timezone.now(), **alert_level_update(Value(units)))
+    units_change = units - stock.units_available
+    if units_change > 0:
+        _receive(hospital_id, blood_group, [lots[0][:2] + (units_change,)], source, network_request)
+        return units_change, []
+    if units_change < 0:
+        # A count correction: write off the oldest units, expired or not
+        return units_change, _issue(hospital_id, blood_group, -units_change, include_expired=True)
+    return 0, []
+
+
+def _change(hospital_id, blood_group, operation, units, user, transaction_type, network_request, notes,
+            lots, source, required_on=None):
+    rows = BloodStock.objects.filter(hospital_id=hospital_id, blood_group=blood_group)
+    units_change, issued = _apply(
+        rows, hospital_id, blood_group, operation, units, lots, source, network_request, required_on
+    )
+    stock = rows.get()
+    _detect_crossing(stock)
+    BloodStockTransaction.objects.create(
+        hospital_id=hospital_id,
+        blood_group=blood_group,
+        transaction_type=transaction_type or OPERATIONS[operation],
+        units_change=units_change,
+        balance_after=stock.units_available,
+        network_request=network_request,
+        created_by=user,
+        notes=notes
+    )
+    stock_changed.send(sender=BloodStock, hospital_id=hospital_id, blood_groups=[blood_group])
+    return stock, issued
+
+
+def _validate(blood_group, units, operation='add'):
+    if blood_group not in BLOOD_GROUP_CODES:
+        raise ValueError(f'Invalid blood group: {blood_group}')
+    if operation not in OPERATIONS:
+        raise ValueError(f'Invalid operation: {operation}')
+    try:
+        units = int(units)
+    except (TypeError, ValueError):
+        raise ValueError('Units must be a number')
+    if units < 0:
+        raise ValueError('Units must not be negative')
+    return units
+
+
+def change_stock(hospital, blood_group, operation, units, user=None, transaction_type=None,
+                 network_request=None, notes='', collected_on=None, expires_on=None):
+    """
+    Apply operation ('add', 'subtract' or 'set') with units to a hospital's
+    stock of blood_group and record it in the ledger. Units added (including
+    the increase from a 'set') form a new batch collected on collected_on
+    (default today) that expires on expires_on (default after
+    BLOOD_UNIT_SHELF_LIFE_DAYS). Returns the updated BloodStock row.
+    Raises ValueError for bad input and InsufficientStock when a
+    subtraction exceeds the unreserved, unexpired units.
+    """
+    units = _validate(blood_group, units, operation)
+    lots = [default_lot(units, collected_on, expires_on)]
+
+    hospital_id = getattr(hospital, 'pk', hospital)
+    with transaction.atomic():
+        stock, _ = _change(
+            hospital_id, blood_group, operation, units, user, transaction_type, network_request, notes,
+            lots, 'STOCK_ENTRY'
+        )
+    return stock
+
+
+def transfer_stock(providing_hospital, requesting_hospital, blood_group, units, user=None,
+                   network_request=None, notes='', required_on=None):
+    """
+    Move units of blood_group between hospitals in one transaction. The
+    provider's earliest-expiring units are issued and the requester
+    receives batches with the same collection and expiry dates. With
+    required_on (a date), only units still usable on that day are sent,
+    matching what hospital.routing offered; InsufficientStock is raised
+    if there are too few. Both stock rows are locked up front in primary
+    key order. Returns the (provider, requester) BloodStock rows.
+    """
+    units = _validate(blood_group, units)
+    providing_id = getattr(providing_hospital, 'pk', providing_hospital)
+    requesting_id = getattr(requesting_hospital, 'pk', requesting_hospital)
+    if providing_id == requesting_id:
+        raise ValueError('A hospital cannot transfer stock to itself')
+    with transaction.atomic():
+        if connection.features.has_select_for_update:
+            # Lock both rows in primary key order first, so that transfers in
+            # opposite directions queue behind each other instead of deadlocking.
+            # (SQLite has no row locks; its single writer lock is taken by the
+            # first UPDATE, and a read beforehand would only make it fail fast.)
+            _provision(requesting_id, blood_group)
+            list(BloodStock.objects.select_for_update().filter(
+                hospital_id__in=[providing_id, requesting_id], blood_group=blood_group
+            ).order_by('pk').values_list('pk', flat=True))
+        provider, issued = _change(
+            providing_id, blood_group, 'subtract', units, user, 'TRANSFER_OUT', network_request, notes,
+            [], 'TRANSFER', required_on
+        )
+        requester, _ = _change(
+            requesting_id, blood_group, 'add', units, user, 'TRANSFER_IN', network_request, notes,
+            issued, 'TRANSFER'
+        )
+    return provider, requester
+
+
+def sync_hospital_stock(hospital_id, counts, user=None, notes=''):
+    """
+    Set several of one hospital's blood groups to absolute counts in one
+    transaction, e.g. from its lab information system. counts maps blood
+    group to a default_lot() tuple: any increase becomes a batch with its
+    dates and any decrease writes off the oldest units.
+    Rows are written with bulk_update and the ledger with bulk_create.
+    Returns {blood_group: (units_available, units_change)}.
+    """
+    now = timezone.now()
+    capacity = HospitalProfile.objects.filter(id=hospital_id).values_list('storage_capacity', flat=True).first()
+    with transaction.atomic():
+        # Provisioning first also takes SQLite's write lock before the reads
+        BloodStock.objects.bulk_create(
+            [
+                BloodStock(hospital_id=hospital_id, blood_group=blood_group, **thresholds_for(capacity))
+                for blood_group in counts
+            ],
+            ignore_conflicts=True
+        )
+        stocks = BloodStock.objects.select_for_update().filter(hospital_id=hospital_id, blood_group__in=list(counts))
+
+        changed = []
+        received = {}
+        written_off = {}
+        ledger = []
+        results = {}
+        for stock in stocks:
+            collected_on, expires_on, units = counts[stock.blood_group]
+            if units < stock.units_reserved:
+                raise ReservedStockConflict(stock.blood_group, units, stock.units_reserved)
+            units_change = units - stock.units_available
+            results[stock.blood_group] = (units, units_change)
+            if not units_change:
+                continue
+            if units_change > 0:
+                received[stock.blood_group] = [(collected_on, expires_on, units_change)]
+            else:
+                written_off[stock.blood_group] = -units_change
+            set_alert_level(stock, units)
+            stock.last_updated = now
+            changed.append(stock)
+            ledger.append(BloodStockTransaction(
+                hospital_id=hospital_id,
+                blood_group=stock.blood_group,
+                transaction_type='SET',
+                units_change=units_change,
+                balance_after=units,
+                created_by=user,
+                notes=notes
+            ))
+
+        BloodStock.objects.bulk_update(
+            changed, ['units_available', 'alert_level', 'previous_alert_level', 'last_updated']
+        )
+        if written_off:
+            _issue_groups(hospital_id, written_off, include_expired=True)
+        _receive_groups(hospital_id, received, 'STOCK_ENTRY')
+        BloodStockTransaction.objects.bulk_create(ledger)
+        for stock in changed:
+            _detect_crossing(stock)
+        if changed:
+            stock_changed.send(
+                sender=BloodStock, hospital_id=hospital_id, blood_groups=[stock.blood_group for stock in changed]
+            )
+    return results
+
+
+def expire_stock(hospital_id, blood_group, today=None):
+    """
+    Mark a hospital's batches of blood_group that expired before today as
+    EXPIRED and take their units out of stock. Returns the units written off.
+    """
+    today = today or timezone.localdate()
+    with transaction.atomic():
+        rows = BloodStock.objects.filter(hospital_id=hospital_id, blood_group=blood_group)
+        stock = rows.select_for_update().first()
+        expired = BloodUnitBatch.objects.filter(
+            hospital_id=hospital_id, blood_group=blood_group, status='AVAILABLE', expires_on__lt=today
+        )
+        units = expired.aggregate(total=Sum('units_remaining'))['total'] or 0
+        # units_remaining is kept on expired batches as the record of wastage
+        expired.update(status='EXPIRED')
+        if stock is None or not units:
+            return units
+
+        previous_units = stock.units_available
+        set_alert_level(stock, max(previous_units - units, 0))
+        rows.update(
+            units_available=stock.units_available, alert_level=stock.alert_level,
+            previous_alert_level=stock.previous_alert_level, last_updated=timezone.now()
+        )
+        _detect_crossing(stock)
+        balance = stock.units_available
+        BloodStockTransaction.objects.create(
+            hospital_id=hospital_id,
+            blood_group=blood_group,
+            transaction_type='EXPIRED',
+            units_change=balance - previous_units,
+            balance_after=balance,
+            notes=f'{units} unit(s) expired'
+        )
+        stock_changed.send(sender=BloodStock, hospital_id=hospital_id, blood_groups=[blood_group])
+    return units
+
+
+def expire_all_stock(today=None):
+    """Expire every lapsed batch in the network; returns {(hospital_id, blood_group): units}"""
+    today = today or timezone.localdate()
+    lapsed = BloodUnitBatch.objects.filter(
+        status='AVAILABLE', expires_on__lt=today
+    ).values_list('hospital_id', 'blood_group').distinct().order_by()
+    return {
+        (hospital_id, blood_group): expire_stock(hospital_id, blood_group, today)
+        for hospital_id, blood_group in list(lapsed)
+    }
+
+
+def refresh_expiry_alerts(today=None):
+    """
+    Recompute BloodStock.expiry_alerts (units expiring within
+    EXPIRY_ALERT_DAYS) for the whole network from one range query over
+    the batch expiry index; only rows whose count changed are written.
+    Returns the number of rows updated.
+    """
+    today = today or timezone.localdate()
+    expiring = {
+        (row['hospital_id'], row['blood_group']): row['units']
+        for row in BloodUnitBatch.objects.filter(
+            status='AVAILABLE',
+            expires_on__gte=today,
+            expires_on__lte=today + timedelta(days=settings.EXPIRY_ALERT_DAYS)
+        ).values('hospital_id', 'blood_group').annotate(units=Sum('units_remaining')).order_by()
+    }
+
+    changed = []
+    for stock in BloodStock.objects.only('id', 'hospital_id', 'blood_group', 'expiry_alerts').iterator():
+        units = expiring.get((stock.hospital_id, stock.blood_group), 0)
+        if stock.expiry_alerts != units:
+            stock.expiry_alerts = units
+            changed.append(stock)
+    BloodStock.objects.bulk_update(changed, ['expiry_alerts'], batch_size=500)
+
+    changed_groups = {}
+    for stock in changed:
+        changed_groups.setdefault(stock.hospital_id, []).append(stock.blood_group)
+    for hospital_id, blood_groups in changed_groups.items():
+        stock_changed.send(sender=BloodStock, hospital_id=hospital_id, blood_groups=blood_groups)
+    return len(changed)
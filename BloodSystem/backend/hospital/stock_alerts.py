@@ -0,0 +1,124 @@
+"""
+Low-stock alert levels.
+
+Each BloodStock row carries its hospital's thresholds (derived from
+storage_capacity and settings.STOCK_ALERT_THRESHOLDS) and a stored
+alert_level. The stock writers in hospital.stock set the new level in the
+same UPDATE that changes units_available, from the row's current level and
+the new count, and copy the old level to previous_alert_level. The row
+they read back afterwards therefore shows whether a threshold was crossed
+without any extra query.
+
+Levels use hysteresis: a group enters LOW below low_threshold and
+CRITICAL below critical_threshold, but only leaves a level once it is
+threshold_margin units above that threshold. A count bouncing around a
+threshold does not keep re-raising alerts. Only moves to a worse level
+send the stock_alert signal, which calls raise_stock_alert() after commit.
+"""
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Case, F, Q, Value, When
+from django.db.models.lookups import LessThan
+from django.utils import timezone
+
+from accounts.models import HospitalProfile, User
+from donor.models import DonorHospitalAlert
+from notifications.models import Notification
+
+SEVERITY = {'GOOD': 0, 'LOW': 1, 'CRITICAL': 2}
+
+
+def thresholds_for(storage_capacity):
+    """BloodStock threshold fields for a hospital with this storage capacity (or None)"""
+    config = settings.STOCK_ALERT_THRESHOLDS
+    if storage_capacity:
+        per_group = storage_capacity / len(settings.BLOOD_GROUPS)
+        low = max(round(per_group * config['low_share']), 2)
+        critical = min(max(round(per_group * config['critical_share']), 1), low - 1)
+    else:
+        low, critical = config['default_low'], config['default_critical']
+    return {
+        'low_threshold': low,
+        'critical_threshold': critical,
+        'threshold_margin': max(round(low * config['hysteresis_share']), 1),
+    }
+
+
+def next_alert_level(level, units, low_threshold, critical_threshold, threshold_margin):
+    """The level after a change to units, given the current level"""
+    if units < critical_threshold or (level == 'CRITICAL' and units < critical_threshold + threshold_margin):
+        return 'CRITICAL'
+    if units < low_threshold or (level != 'GOOD' and units < low_threshold + threshold_margin):
+        return 'LOW'
+    return 'GOOD'
+
+
+def alert_level_update(units):
+    """
+    UPDATE keyword arguments that set the level for the new units_available
+    (an expression over the row's current values, e.g. F('units_available') + 3)
+    """
+    return {
+        'previous_alert_level': F('alert_level'),
+        'alert_level': Case(
+            When(LessThan(units, F('critical_threshold')), then=Value('CRITICAL')),
+            When(Q(LessThan(units, F('critical_threshold') + F('threshold_margin'))) & Q(alert_level='CRITICAL'),
+                 then=Value('CRITICAL')),
+            When(LessThan(units, F('low_threshold')), then=Value('LOW')),
+            When(Q(LessThan(units, F('low_threshold') + F('threshold_margin'))) & ~Q(alert_level='GOOD'),
+                 then=Value('LOW')),
+            default=Value('GOOD'),
+        ),
+    }
+
+
+def set_alert_level(stock, units):
+    """Set units_available and the level on a loaded row (for writers that save rows themselves)"""
+    stock.previous_alert_level = stock.alert_level
+    stock.alert_level = next_alert_level(
+        stock.alert_level, units, stock.low_threshold, stock.critical_threshold, stock.threshold_margin
+    )
+    stock.units_available = units
+
+
+def raise_stock_alert(hospital_id, blood_group, alert_level, units_available, target_units):
+    """
+    Notify admins of a group going LOW or CRITICAL. A CRITICAL group also
+    gets a donor alert for the units needed to clear LOW, unless one of
+    those is still active. Returns the DonorHospitalAlert or None.
+    """
+    hospital = HospitalProfile.objects.filter(id=hospital_id).first()
+    if hospital is None:
+        return None
+
+    alert = None
+    now = timezone.now()
+    if alert_level == 'CRITICAL' and not DonorHospitalAlert.objects.filter(
+        hospital_id=hospital_id, blood_group=blood_group, status='ACTIVE', created_by__isnull=True,
+        required_by__gt=now
+    ).exists():
+        alert = DonorHospitalAlert.objects.create(
+            hospital=hospital,
+            blood_group=blood_group,
+            units_needed=max(target_units - units_available, 1),
+            urgency='EMERGENCY',
+            reason=f'{blood_group} stock is critical ({units_available} unit(s) left)',
+            location=f'{hospital.hospital_name}, {hospital.city}',
+            required_by=now + timedelta(hours=settings.STOCK_ALERT_THRESHOLDS['alert_hours'])
+        )
+
+    Notification.objects.bulk_create([
+        Notification(
+            recipient_id=user_id,
+            title=f'{blood_group} stock {alert_level.lower()} at {hospital.hospital_name}',
+            message=(
+                f'{hospital.hospital_name} ({hospital.city}) has {units_available} unit(s) of {blood_group} left.'
+                + (' A donor alert has been raised.' if alert else '')
+            ),
+            notification_type='STOCK_ALERT'
+        )
+        for user_id in User.objects.filter(role='ADMIN', is_active=True).values_list('id', flat=True)
+    ])
+    return alert
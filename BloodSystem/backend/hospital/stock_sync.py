@@ -0,0 +1,196 @@
+"""
+Bulk stock sync from hospital lab information systems.
+
+A sync body is CSV (with a header row) or NDJSON (one JSON object per
+line). Each row has hospital_id, blood_group and units_available, plus
+optional collected_on / expires_on dates for units being added. Hospital
+users may leave hospital_id out; it defaults to their own hospital.
+
+Rows are read from the request stream one at a time and validated as
+they arrive. Consecutive valid rows for the same hospital are applied
+together by sync_hospital_stock() in one transaction, so files should
+be grouped by hospital; a hospital that appears again later just starts
+another run. Only the current run is held in memory, and results are
+yielded per row as each run is applied.
+"""
+
+import csv
+import json
+
+from django.db import DatabaseError
+from django.utils.dateparse import parse_date
+
+from accounts.models import HospitalProfile
+from .stock import BLOOD_GROUP_CODES, InsufficientStock, default_lot, sync_hospital_stock
+
+FORMATS = {
+    'text/csv': 'csv',
+    'application/x-ndjson': 'ndjson',
+    'application/jsonl': 'ndjson',
+}
+
+REQUIRED_COLUMNS = {'blood_group', 'units_available'}
+
+
+class SyncFormatError(Exception):
+    """Raised when a sync body can't be read at all (e.g. a missing CSV column)"""
+
+
+def _decoded(lines):
+    for line in lines:
+        # Undecodable bytes surface as invalid values in that row only
+        yield line.decode('utf-8-sig', errors='replace') if isinstance(line, bytes) else line
+
+
+def _ndjson_rows(lines):
+    number = 0
+    for line in lines:
+        if not line.strip():
+            continue
+        number += 1
+        try:
+            row = json.loads(line)
+        except ValueError:
+            yield number, 'Invalid JSON'
+            continue
+        yield number, row if isinstance(row, dict) else 'Each line must be a JSON object'
+
+
+def read_rows(lines, sync_format):
+    """
+    Return an iterator of (row_number, row dict or error message) over an
+    iterable of body lines. A CSV header is read and checked straight
+    away, raising SyncFormatError if a required column is missing.
+    """
+    lines = _decoded(lines)
+    if sync_format == 'csv':
+        reader = csv.DictReader(lines)
+        missing = REQUIRED_COLUMNS - set(reader.fieldnames or [])
+        if missing:
+            raise SyncFormatError(f'CSV header is missing: {", ".join(sorted(missing))}')
+        return enumerate(reader, start=1)
+    return _ndjson_rows(lines)
+
+
+def _date(row, field):
+    value = row.get(field)
+    if value in (None, ''):
+        return None
+    parsed = parse_date(str(value))
+    if parsed is None:
+        raise ValueError(f'Invalid {field} date')
+    return parsed
+
+
+def validate_row(row, user):
+    """Return (hospital_id, blood_group, lot) for a row or raise ValueError"""
+    hospital_id = row.get('hospital_id')
+    if hospital_id in (None, ''):
+        if user.role != 'HOSPITAL':
+            raise ValueError('hospital_id is required')
+        hospital_id = user.hospital_profile.id
+    try:
+        hospital_id = int(hospital_id)
+    except (TypeError, ValueError):
+        raise ValueError('hospital_id must be a number')
+
+    blood_group = str(row.get('blood_group') or '').strip().upper()
+    if blood_group not in BLOOD_GROUP_CODES:
+        raise ValueError(f'Invalid blood group: {row.get("blood_group")}')
+    try:
+        units = int(row.get('units_available'))
+    except (TypeError, ValueError):
+        raise ValueError('units_available must be a number')
+    if units < 0:
+        raise ValueError('units_available must not be negative')
+    return hospital_id, blood_group, default_lot(units, _date(row, 'collected_on'), _date(row, 'expires_on'))
+
+
+class _Run:
+    """Valid rows for one hospital waiting to be applied together"""
+
+    def __init__(self, hospital_id):
+        self.hospital_id = hospital_id
+        self.counts = {}
+        self.rows = {}
+
+    def add(self, number, blood_group, lot):
+        if blood_group in self.counts:
+            return f'Duplicate {blood_group} row for hospital {self.hospital_id} (first on row {self.rows[blood_group]})'
+        self.counts[blood_group] = lot
+        self.rows[blood_group] = number
+        return None
+
+
+def sync_stock_rows(rows, user):
+    """
+    Apply validated rows from read_rows() and yield one result dict per
+    row, followed by a final {'summary': {...}} dict.
+    """
+    allowed = {}  # hospital_id -> error message or None, looked up once per hospital
+    totals = {'rows': 0, 'applied': 0, 'errors': 0, 'hospitals': 0}
+
+    def permission_error(hospital_id):
+        if hospital_id not in allowed:
+            if user.role == 'HOSPITAL' and hospital_id != user.hospital_profile.id:
+                allowed[hospital_id] = 'Hospitals may only sync their own stock'
+            elif not HospitalProfile.objects.filter(id=hospital_id, verification_status='APPROVED').exists():
+                allowed[hospital_id] = f'Hospital {hospital_id} not found or not approved'
+            else:
+                allowed[hospital_id] = None
+        return allowed[hospital_id]
+
+    def apply(run):
+        totals['hospitals'] += 1
+        try:
+            results = sync_hospital_stock(run.hospital_id, run.counts, user=user, notes='LIS stock sync')
+        except (InsufficientStock, DatabaseError) as e:
+            for blood_group, number in sorted(run.rows.items(), key=lambda item: item[1]):
+                totals['errors'] += 1
+                yield {'row': number, 'hospital_id': run.hospital_id, 'blood_group': blood_group,
+                       'status': 'error', 'error': f'Sync failed: {e}'}
+            return
+        for blood_group, number in sorted(run.rows.items(), key=lambda item: item[1]):
+            units_available, units_change = results[blood_group]
+            totals['applied'] += 1
+            yield {'row': number, 'hospital_id': run.hospital_id, 'blood_group': blood_group, 'status': 'ok',
+                   'units_available': units_available, 'units_change': units_change}
+
+    run = None
+    rows = iter(rows)
+    while True:
+        try:
+            number, row = next(rows)
+        except StopIteration:
+            break
+        except csv.Error as e:
+            # The rest of the body can't be split into rows; apply what was read
+            totals['errors'] += 1
+            yield {'status': 'error', 'error': f'Unreadable CSV after row {totals["rows"]}: {e}'}
+            break
+        totals['rows'] += 1
+        try:
+            if isinstance(row, str):
+                raise ValueError(row)
+            hospital_id, blood_group, lot = validate_row(row, user)
+            error = permission_error(hospital_id)
+            if error:
+                raise ValueError(error)
+        except ValueError as e:
+            totals['errors'] += 1
+            yield {'row': number, 'status': 'error', 'error': str(e)}
+            continue
+
+        if run is not None and run.hospital_id != hospital_id:
+            yield from apply(run)
+            run = None
+        if run is None:
+            run = _Run(hospital_id)
+        error = run.add(number, blood_group, lot)
+        if error:
+            totals['errors'] += 1
+            yield {'row': number, 'status': 'error', 'error': error}
+
+    if run is not None:
+        yield from apply(run)
+    yield {'summary': totals}
@@ -8,9 +8,13 @@ urlpatterns = [
     # Blood Stock Management
     path('blood-stock/', views.blood_stock, name='blood_stock'),
     path('blood-stock/update/', views.update_blood_stock, name='update_blood_stock'),
+    path('blood-stock/sync/', views.sync_blood_stock, name='sync_blood_stock'),
+    path('blood-stock/trend/', views.stock_trend, name='stock_trend'),
     
     # Patient Requests
     path('patient-requests/', views.patient_requests, name='patient_requests'),
+    path('patient-requests/queue/', views.patient_request_queue, name='patient_request_queue'),
+    path('patient-requests/review/', views.review_patient_request, name='review_patient_request'),
     
     # Emergency Alerts
     path('emergency-alert/create/', views.create_emergency_alert, name='create_emergency_alert'),
@@ -23,5 +27,6 @@ urlpatterns = [
     path('network/', views.hospital_network, name='hospital_network'),
     path('network/hospitals/', views.available_hospitals, name='available_hospitals'),
     path('network/request/', views.create_network_request, name='create_network_request'),
+    path('network/route/', views.route_network_request, name='route_network_request'),
     path('network/respond/', views.respond_network_request, name='respond_network_request'),
 ]
\ No newline at end of file
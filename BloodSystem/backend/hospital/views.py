@@ -3,10 +3,25 @@ from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework import status
 from django.utils import timezone
-from django.db.models import Q, Sum
+from django.db import transaction
+from django.db.models import Q
 from django.conf import settings
+from django.utils.http import quote_etag, parse_etags
+from django.utils.dateparse import parse_date, parse_datetime
+from django.http import StreamingHttpResponse
 from datetime import timedelta
+import csv
+import hashlib
+import json
 from .models import BloodStock, HospitalPatientRequest, HospitalNetwork
+from .network_matrix import get_network_matrix
+from .dashboard import get_dashboard
+from .request_queue import queue_page
+from .reservations import reserve_units, release_reservations, fulfil_request_stock
+from .routing import plan_route, create_routed_requests
+from .stock_sync import FORMATS, SyncFormatError, read_rows, sync_stock_rows
+from .rollups import stock_trend as build_stock_trend
+from .stock import change_stock, transfer_stock, provision_stock_rows, InsufficientStock
 from donor.models import DonorHospitalAlert, DonorHospitalAlertResponse
 from accounts.models import HospitalProfile, DonorProfile
 
@@ -27,29 +42,29 @@ def hospital_dashboard(request):
                 'status': hospital_profile.verification_status
             }, status=status.HTTP_403_FORBIDDEN)
         
-        # Get dashboard stats
-        active_requests = HospitalPatientRequest.objects.filter(
-            hospital=hospital_profile,
-            status__in=['PENDING', 'APPROVED']
-        ).count()
-        
-        total_stock = BloodStock.objects.filter(
-            hospital=hospital_profile
-        ).aggregate(total=Sum('units_available'))['total'] or 0
+        # Snapshot kept current by hospital.signals
+        summary, forecasts = get_dashboard(hospital_profile.id)
+        stock_by_group = summary['stock_by_group']
         
-        pending_applications = DonorHospitalAlertResponse.objects.filter(
-            alert__hospital=hospital_profile,
-            status='PENDING'
-        ).count()
+        # Nightly demand forecast against current stock
+        demand_forecast = [
+            dict(
+                forecast,
+                units_available=stock_by_group.get(forecast['blood_group'], 0),
+                projected_shortfall=max(round(forecast['total_units'] - stock_by_group.get(forecast['blood_group'], 0), 1), 0)
+            )
+            for forecast in forecasts
+        ]
         
         return Response({
             'message': 'Hospital dashboard',
             'hospital': hospital_profile.hospital_name,
             'stats': {
-                'active_requests': active_requests,
-                'total_stock': total_stock,
-                'pending_applications': pending_applications
-            }
+                'active_requests': summary['active_requests'],
+                'total_stock': summary['total_stock'],
+                'pending_applications': summary['pending_applications']
+            },
+            'demand_forecast': demand_forecast
         })
     except HospitalProfile.DoesNotExist:
         return Response({'error': 'Hospital profile not found'}, status=status.HTTP_404_NOT_FOUND)
@@ -65,28 +80,41 @@ def blood_stock(request):
     try:
         hospital_profile = request.user.hospital_profile
         
-        # Get or create stock for all blood groups
+        stocks = {stock.blood_group: stock for stock in BloodStock.objects.filter(hospital=hospital_profile)}
+        if len(stocks) < len(settings.BLOOD_GROUPS):
+            # Rows are normally provisioned on approval; fill any gap once
+            provision_stock_rows([hospital_profile.id])
+            stocks = {stock.blood_group: stock for stock in BloodStock.objects.filter(hospital=hospital_profile)}
+        
+        etag = quote_etag(hashlib.md5(repr(sorted(
+            (stock.blood_group, stock.units_available, stock.units_reserved, stock.expiry_alerts,
+             stock.last_updated.isoformat())
+            for stock in stocks.values()
+        )).encode()).hexdigest())
+        if etag in parse_etags(request.META.get('HTTP_IF_NONE_MATCH', '')):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+        
         stock_data = []
         for blood_group_code, blood_group_name in settings.BLOOD_GROUPS:
-            stock, created = BloodStock.objects.get_or_create(
-                hospital=hospital_profile,
-                blood_group=blood_group_code,
-                defaults={'units_available': 0}
-            )
-            
+            stock = stocks[blood_group_code]
             stock_data.append({
                 'blood_group': blood_group_code,
                 'blood_group_name': blood_group_name,
                 'units_available': stock.units_available,
                 'units_reserved': stock.units_reserved,
+                'net_available': stock.net_available,
+                'expiring_soon': stock.expiry_alerts,
                 'status': stock.status,
                 'last_updated': stock.last_updated
             })
         
         return Response({
             'results': stock_data,
-            'total_units': sum(item['units_available'] for item in stock_data)
-        })
+            'total_units': sum(item['units_available'] for item in stock_data),
+            'total_net_available': sum(item['net_available'] for item in stock_data),
+            'expiring_soon_units': sum(item['expiring_soon'] for item in stock_data),
+            'expiry_alert_days': settings.EXPIRY_ALERT_DAYS
+        }, headers={'ETag': etag, 'Cache-Control': 'private, no-cache'})
     except HospitalProfile.DoesNotExist:
         return Response({'error': 'Hospital profile not found'}, status=status.HTTP_404_NOT_FOUND)
 
@@ -107,20 +135,22 @@ def update_blood_stock(request):
         if not blood_group or units is None:
             return Response({'error': 'Blood group and units are required'}, status=status.HTTP_400_BAD_REQUEST)
         
-        stock, created = BloodStock.objects.get_or_create(
-            hospital=hospital_profile,
-            blood_group=blood_group,
-            defaults={'units_available': 0}
-        )
-        
-        if operation == 'set':
-            stock.units_available = max(0, int(units))
-        elif operation == 'add':
-            stock.units_available += int(units)
-        elif operation == 'subtract':
-            stock.units_available = max(0, stock.units_available - int(units))
-        
-        stock.save()
+        # Optional batch dates for units being added (YYYY-MM-DD)
+        batch_dates = {}
+        for field in ['collected_on', 'expires_on']:
+            value = request.data.get(field)
+            if value:
+                batch_dates[field] = parse_date(str(value))
+                if batch_dates[field] is None:
+                    return Response({'error': f'Invalid {field} date'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        try:
+            stock = change_stock(
+                hospital_profile, blood_group, operation, units,
+                user=request.user, notes=request.data.get('notes', ''), **batch_dates
+            )
+        except (InsufficientStock, ValueError) as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
         
         return Response({
             'message': 'Stock updated successfully',
@@ -132,6 +162,102 @@ def update_blood_stock(request):
         return Response({'error': 'Hospital profile not found'}, status=status.HTTP_404_NOT_FOUND)
 
 
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def sync_blood_stock(request):
+    """
+    Bulk stock sync for lab information systems.
+
+    The body is CSV (Content-Type text/csv) or NDJSON (application/x-ndjson)
+    with hospital_id, blood_group and units_available per row. Hospitals
+    may only sync their own stock; admins may sync any approved hospital.
+    The response streams one NDJSON result per row and a final summary.
+    """
+    if request.user.role not in ['HOSPITAL', 'ADMIN']:
+        return Response({'error': 'Access denied'}, status=status.HTTP_403_FORBIDDEN)
+    
+    try:
+        if request.user.role == 'HOSPITAL' and request.user.hospital_profile.verification_status != 'APPROVED':
+            return Response({'error': 'Hospital not verified'}, status=status.HTTP_403_FORBIDDEN)
+        
+        sync_format = FORMATS.get(request.content_type.split(';')[0].strip().lower())
+        if sync_format is None:
+            return Response({
+                'error': f'Unsupported content type; use one of {", ".join(FORMATS)}'
+            }, status=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE)
+        if request.stream is None:
+            return Response({'error': 'Request body is empty'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        # Rows are read from the request as the response is written, never buffered whole
+        try:
+            rows = read_rows(request.stream, sync_format)
+        except (SyncFormatError, csv.Error) as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        results = (json.dumps(result, default=str) + '\n' for result in sync_stock_rows(rows, request.user))
+        return StreamingHttpResponse(results, content_type='application/x-ndjson')
+    except HospitalProfile.DoesNotExist:
+        return Response({'error': 'Hospital profile not found'}, status=status.HTTP_404_NOT_FOUND)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def stock_trend(request):
+    """
+    Blood stock levels over time for charts.
+
+    Query parameters: days (window, default 30), blood_group. Hospitals
+    see their own stock; admins may pass hospital_id, or city and/or
+    state for a region (the whole network by default). The bucket size
+    (hourly, daily or weekly) follows the window length.
+    """
+    if request.user.role not in ['HOSPITAL', 'ADMIN']:
+        return Response({'error': 'Access denied'}, status=status.HTTP_403_FORBIDDEN)
+    
+    try:
+        try:
+            days = int(request.GET.get('days', 30))
+        except ValueError:
+            return Response({'error': 'days must be a number'}, status=status.HTTP_400_BAD_REQUEST)
+        if not 1 <= days <= 730:
+            return Response({'error': 'days must be between 1 and 730'}, status=status.HTTP_400_BAD_REQUEST)
+        blood_group = request.GET.get('blood_group')
+        if blood_group and blood_group not in dict(settings.BLOOD_GROUPS):
+            return Response({'error': 'Invalid blood group'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        if request.user.role == 'HOSPITAL':
+            hospital_filter = {'hospital': request.user.hospital_profile}
+            scope = {'hospital_id': request.user.hospital_profile.id}
+        elif request.GET.get('hospital_id'):
+            try:
+                hospital_id = int(request.GET.get('hospital_id'))
+            except ValueError:
+                return Response({'error': 'hospital_id must be a number'}, status=status.HTTP_400_BAD_REQUEST)
+            hospital = HospitalProfile.objects.get(id=hospital_id)
+            hospital_filter = {'hospital': hospital}
+            scope = {'hospital_id': hospital.id}
+        else:
+            hospital_filter = {}
+            scope = {}
+            for field in ['city', 'state']:
+                if request.GET.get(field):
+                    hospital_filter[f'hospital__{field}__iexact'] = request.GET.get(field)
+                    scope[field] = request.GET.get(field)
+        
+        granularity, trend = build_stock_trend(hospital_filter, timedelta(days=days), blood_group)
+        
+        return Response({
+            'scope': scope,
+            'days': days,
+            'granularity': granularity,
+            'results': [
+                {'blood_group': group, 'points': points} for group, points in trend.items()
+            ]
+        })
+    except HospitalProfile.DoesNotExist:
+        return Response({'error': 'Hospital profile not found'}, status=status.HTTP_404_NOT_FOUND)
+
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def patient_requests(request):
@@ -171,6 +297,127 @@ def patient_requests(request):
         return Response({'error': 'Hospital profile not found'}, status=status.HTTP_404_NOT_FOUND)
 
 
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def patient_request_queue(request):
+    """
+    Patient blood requests in priority order (most urgent effective
+    deadline first).
+
+    Query parameters: status (default PENDING), limit (1-100, default 20)
+    and cursor (next_cursor from the previous page).
+    """
+    if request.user.role != 'HOSPITAL':
+        return Response({'error': 'Access denied'}, status=status.HTTP_403_FORBIDDEN)
+    
+    try:
+        hospital_profile = request.user.hospital_profile
+        
+        request_status = request.GET.get('status', 'PENDING')
+        if request_status not in dict(HospitalPatientRequest.STATUS_CHOICES):
+            return Response({'error': 'Invalid status'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            limit = int(request.GET.get('limit', 20))
+        except ValueError:
+            return Response({'error': 'limit must be a number'}, status=status.HTTP_400_BAD_REQUEST)
+        if not 1 <= limit <= 100:
+            return Response({'error': 'limit must be between 1 and 100'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        try:
+            requests, next_cursor = queue_page(hospital_profile.id, request_status, limit, request.GET.get('cursor'))
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        now = timezone.now()
+        request_data = []
+        for req in requests:
+            request_data.append({
+                'id': req.id,
+                'patient_name': req.patient.user.get_full_name(),
+                'patient_id': f"P{req.patient.id:06d}",
+                'blood_group': req.blood_group,
+                'units_needed': req.units_needed,
+                'request_type': req.request_type,
+                'emergency_reason': req.emergency_reason,
+                'required_by': req.required_by,
+                'hours_to_required_by': round((req.required_by - now).total_seconds() / 3600, 1),
+                'priority_due': req.priority_due,
+                'doctor_name': req.doctor_name,
+                'doctor_contact': req.doctor_contact,
+                'status': req.status,
+                'created_at': req.created_at
+            })
+        
+        return Response({
+            'results': request_data,
+            'count': len(request_data),
+            'next_cursor': next_cursor
+        })
+    except HospitalProfile.DoesNotExist:
+        return Response({'error': 'Hospital profile not found'}, status=status.HTTP_404_NOT_FOUND)
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def review_patient_request(request):
+    """
+    Review a patient blood request. APPROVED (from PENDING) reserves its
+    units, FULFILLED (from APPROVED, or EXPIRED once the sweeper released
+    the hold) issues them from stock and REJECTED releases any reservation.
+    """
+    if request.user.role != 'HOSPITAL':
+        return Response({'error': 'Access denied'}, status=status.HTTP_403_FORBIDDEN)
+    
+    allowed_from = {
+        'APPROVED': ['PENDING'],
+        'FULFILLED': ['APPROVED', 'EXPIRED'],
+        'REJECTED': ['PENDING', 'APPROVED', 'EXPIRED'],
+    }
+    try:
+        request_id = request.data.get('request_id')
+        decision = request.data.get('decision')  # 'APPROVED', 'FULFILLED' or 'REJECTED'
+        notes = request.data.get('notes', '')
+        
+        if not request_id or decision not in allowed_from:
+            return Response({'error': 'Invalid request ID or decision'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        with transaction.atomic():
+            patient_request = HospitalPatientRequest.objects.select_for_update().get(
+                id=request_id,
+                hospital=request.user.hospital_profile
+            )
+            if patient_request.status not in allowed_from[decision]:
+                return Response({
+                    'error': f'The request is {patient_request.status.lower()} and cannot be {decision.lower()}'
+                }, status=status.HTTP_400_BAD_REQUEST)
+            
+            try:
+                if decision == 'APPROVED':
+                    reserve_units(patient_request, user=request.user)
+                elif decision == 'FULFILLED':
+                    fulfil_request_stock(patient_request, user=request.user)
+                else:
+                    release_reservations(patient_request)
+            except InsufficientStock as e:
+                transaction.set_rollback(True)
+                return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+            
+            patient_request.status = decision
+            patient_request.reviewed_by = request.user
+            patient_request.rejection_reason = notes if decision == 'REJECTED' else ''
+            patient_request.save()
+        
+        return Response({
+            'message': f'Request {decision.lower()} successfully',
+            'request_id': patient_request.id,
+            'status': patient_request.status
+        })
+    except HospitalPatientRequest.DoesNotExist:
+        return Response({'error': 'Request not found'}, status=status.HTTP_404_NOT_FOUND)
+    except HospitalProfile.DoesNotExist:
+        return Response({'error': 'Hospital profile not found'}, status=status.HTTP_404_NOT_FOUND)
+
+
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def create_emergency_alert(request):
@@ -192,12 +439,13 @@ def create_emergency_alert(request):
             created_by=request.user
         )
         
-        # TODO: Trigger notification system based on urgency
+        # Donors are notified by the run_alert_fanout worker, not in this request
         
         return Response({
             'message': 'Emergency alert created successfully',
             'alert_id': alert.id,
-            'urgency': alert.urgency
+            'urgency': alert.urgency,
+            'fanout_status': alert.fanout_status
         }, status=status.HTTP_201_CREATED)
     except HospitalProfile.DoesNotExist:
         return Response({'error': 'Hospital profile not found'}, status=status.HTTP_404_NOT_FOUND)
@@ -350,39 +598,60 @@ def hospital_network(request):
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def available_hospitals(request):
-    """Get list of hospitals available for blood exchange"""
+    """
+    Get list of hospitals available for blood exchange.
+
+    Reads the network stock matrix, whose counts leave out units
+    reserved for each hospital's own patients. Optional query parameters:
+    blood_group and min_units keep only hospitals holding at least that
+    many units of the group; sort is 'units' (default when blood_group is
+    given) or 'name'.
+    """
     if request.user.role != 'HOSPITAL':
         return Response({'error': 'Access denied'}, status=status.HTTP_403_FORBIDDEN)
     
     try:
         current_hospital = request.user.hospital_profile
         
-        # Get hospitals in the same city or nearby cities
-        hospitals = HospitalProfile.objects.filter(
-            verification_status='APPROVED',
-            has_blood_bank=True
-        ).exclude(id=current_hospital.id).select_related('user')
+        blood_group = request.GET.get('blood_group')
+        if blood_group and blood_group not in dict(settings.BLOOD_GROUPS):
+            return Response({'error': 'Invalid blood group'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            min_units = int(request.GET.get('min_units', 0))
+        except ValueError:
+            return Response({'error': 'min_units must be a number'}, status=status.HTTP_400_BAD_REQUEST)
+        sort = request.GET.get('sort', 'units' if blood_group else 'name')
+        
+        rows = [row for hospital_id, row in get_network_matrix().items() if hospital_id != current_hospital.id]
+        if blood_group:
+            rows = [row for row in rows if row['stock'].get(blood_group, 0) >= min_units]
+        elif min_units:
+            rows = [row for row in rows if sum(row['stock'].values()) >= min_units]
+        
+        if sort == 'units':
+            if blood_group:
+                rows.sort(key=lambda row: (-row['stock'].get(blood_group, 0), row['hospital_name']))
+            else:
+                rows.sort(key=lambda row: (-sum(row['stock'].values()), row['hospital_name']))
+        else:
+            rows.sort(key=lambda row: row['hospital_name'])
         
         hospital_data = []
-        for hospital in hospitals:
-            # Get their blood stock
-            stock_data = BloodStock.objects.filter(hospital=hospital)
-            total_stock = stock_data.aggregate(total=Sum('units_available'))['total'] or 0
-            
+        for row in rows:
             hospital_data.append({
-                'id': hospital.id,
-                'hospital_name': hospital.hospital_name,
-                'city': hospital.city,
-                'state': hospital.state,
-                'contact_person': hospital.authorized_person_name,
-                'contact_phone': hospital.authorized_person_mobile,
-                'total_stock': total_stock,
+                'id': row['id'],
+                'hospital_name': row['hospital_name'],
+                'city': row['city'],
+                'state': row['state'],
+                'contact_person': row['contact_person'],
+                'contact_phone': row['contact_phone'],
+                'total_stock': sum(row['stock'].values()),
                 'blood_stock': [
                     {
-                        'blood_group': stock.blood_group,
-                        'units_available': stock.units_available,
-                        'status': stock.status
-                    } for stock in stock_data
+                        'blood_group': group,
+                        'units_available': row['stock'][group],
+                        'status': row['alert_levels'][group]
+                    } for group, _ in settings.BLOOD_GROUPS if group in row['stock']
                 ]
             })
         
@@ -433,6 +702,74 @@ def create_network_request(request):
         return Response({'error': 'Hospital not found'}, status=status.HTTP_404_NOT_FOUND)
 
 
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def route_network_request(request):
+    """
+    Split a blood request across the cheapest providers in the network
+    (distance, substitute groups and expiry) and create one exchange
+    request per provider. Pass dry_run to only preview the plan.
+    """
+    if request.user.role != 'HOSPITAL':
+        return Response({'error': 'Access denied'}, status=status.HTTP_403_FORBIDDEN)
+    
+    try:
+        requesting_hospital = request.user.hospital_profile
+        blood_group = request.data.get('blood_group')
+        required_by = parse_datetime(str(request.data.get('required_by', '')))
+        allow_substitutes = str(request.data.get('allow_substitutes', 'true')).lower() not in ['false', '0']
+        dry_run = str(request.data.get('dry_run', 'false')).lower() in ['true', '1']
+        
+        if blood_group not in dict(settings.BLOOD_GROUPS):
+            return Response({'error': 'Invalid blood group'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            units = int(request.data.get('units'))
+        except (TypeError, ValueError):
+            return Response({'error': 'Units must be a number'}, status=status.HTTP_400_BAD_REQUEST)
+        if units <= 0:
+            return Response({'error': 'Units must be positive'}, status=status.HTTP_400_BAD_REQUEST)
+        if required_by is None:
+            return Response({'error': 'A valid required_by date and time is required'}, status=status.HTTP_400_BAD_REQUEST)
+        if timezone.is_naive(required_by):
+            required_by = timezone.make_aware(required_by)
+        
+        allocations, units_short = plan_route(requesting_hospital, blood_group, units, required_by, allow_substitutes)
+        if not allocations:
+            return Response({'error': 'No compatible stock available in the network'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        request_ids = [None] * len(allocations)
+        if not dry_run:
+            created = create_routed_requests(
+                requesting_hospital, allocations, request.user,
+                urgency=request.data.get('urgency', 'LOW'),
+                reason=request.data.get('reason', ''),
+                required_by=required_by
+            )
+            request_ids = [network_request.id for network_request in created]
+        
+        plan_data = []
+        for allocation, request_id in zip(allocations, request_ids):
+            plan_data.append({
+                'request_id': request_id,
+                'providing_hospital_id': allocation['provider']['id'],
+                'providing_hospital': allocation['provider']['hospital_name'],
+                'city': allocation['provider']['city'],
+                'blood_group': allocation['blood_group'],
+                'units': allocation['units'],
+                'substitute': allocation['blood_group'] != blood_group,
+                'distance_km': round(allocation['distance_km'], 1) if allocation['distance_km'] is not None else None
+            })
+        
+        return Response({
+            'message': 'Routing plan created' if dry_run else 'Blood exchange requests created successfully',
+            'results': plan_data,
+            'units_routed': units - units_short,
+            'units_short': units_short
+        }, status=status.HTTP_200_OK if dry_run else status.HTTP_201_CREATED)
+    except HospitalProfile.DoesNotExist:
+        return Response({'error': 'Hospital profile not found'}, status=status.HTTP_404_NOT_FOUND)
+
+
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def respond_network_request(request):
@@ -449,37 +786,41 @@ def respond_network_request(request):
         if not request_id or decision not in ['APPROVED', 'REJECTED']:
             return Response({'error': 'Invalid request ID or decision'}, status=status.HTTP_400_BAD_REQUEST)
         
-        network_request = HospitalNetwork.objects.get(
-            id=request_id,
-            providing_hospital=request.user.hospital_profile
-        )
-        
-        network_request.status = decision
-        network_request.units_approved = units_approved if decision == 'APPROVED' else 0
-        network_request.response_notes = response_notes
-        network_request.responded_at = timezone.now()
-        network_request.responded_by = request.user
-        network_request.save()
-        
-        # If approved, update blood stock
-        if decision == 'APPROVED' and units_approved > 0:
-            # Reduce stock from providing hospital
-            providing_stock, _ = BloodStock.objects.get_or_create(
-                hospital=network_request.providing_hospital,
-                blood_group=network_request.blood_group,
-                defaults={'units_available': 0}
+        try:
+            units_approved = int(units_approved) if decision == 'APPROVED' else 0
+        except (TypeError, ValueError):
+            return Response({'error': 'Units approved must be a number'}, status=status.HTTP_400_BAD_REQUEST)
+        if units_approved < 0:
+            return Response({'error': 'Units approved must not be negative'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        with transaction.atomic():
+            network_request = HospitalNetwork.objects.select_for_update().get(
+                id=request_id,
+                providing_hospital=request.user.hospital_profile
             )
-            providing_stock.units_available = max(0, providing_stock.units_available - units_approved)
-            providing_stock.save()
+            if network_request.status != 'PENDING':
+                return Response({'error': 'Request has already been responded to'}, status=status.HTTP_400_BAD_REQUEST)
             
-            # Increase stock at requesting hospital
-            requesting_stock, _ = BloodStock.objects.get_or_create(
-                hospital=network_request.requesting_hospital,
-                blood_group=network_request.blood_group,
-                defaults={'units_available': 0}
-            )
-            requesting_stock.units_available += units_approved
-            requesting_stock.save()
+            network_request.status = decision
+            network_request.units_approved = units_approved
+            network_request.response_notes = response_notes
+            network_request.responded_at = timezone.now()
+            network_request.responded_by = request.user
+            network_request.save()
+            
+            # If approved, move the earliest-expiring units still usable at required_by to the
+            # requester in the same transaction (transfer_stock locks both stock rows in primary key order)
+            if decision == 'APPROVED' and units_approved > 0:
+                try:
+                    transfer_stock(
+                        network_request.providing_hospital_id, network_request.requesting_hospital_id,
+                        network_request.blood_group, units_approved, user=request.user,
+                        network_request=network_request,
+                        required_on=timezone.localdate(network_request.required_by)
+                    )
+                except (InsufficientStock, ValueError) as e:
+                    transaction.set_rollback(True)
+                    return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
         
         # TODO: Send notification to requesting hospital
         
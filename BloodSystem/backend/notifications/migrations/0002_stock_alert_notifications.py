@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-18 05:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='notification',
+            name='notification_type',
+            field=models.CharField(choices=[('CAMP_APPROVAL', 'Camp Approval'), ('CAMP_REJECTION', 'Camp Rejection'), ('HOSPITAL_APPROVAL', 'Hospital Approval'), ('HOSPITAL_REJECTION', 'Hospital Rejection'), ('EMERGENCY_ALERT', 'Emergency Alert'), ('DISASTER_ALERT', 'Disaster Alert'), ('ATTENDANCE_MARKED', 'Attendance Marked'), ('BLOOD_REQUEST', 'Blood Request'), ('STOCK_ALERT', 'Stock Alert')], max_length=30),
+        ),
+    ]
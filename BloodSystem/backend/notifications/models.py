@@ -12,6 +12,7 @@ class Notification(models.Model):
         ('DISASTER_ALERT', 'Disaster Alert'),
         ('ATTENDANCE_MARKED', 'Attendance Marked'),
         ('BLOOD_REQUEST', 'Blood Request'),
+        ('STOCK_ALERT', 'Stock Alert'),
     ]
     
     recipient = models.ForeignKey(User, on_delete=models.CASCADE, related_name='notifications')
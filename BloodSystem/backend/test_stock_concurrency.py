@@ -0,0 +1,145 @@
+#!/usr/bin/env python
+"""
+Stress test for concurrent blood stock updates.
+
+Runs --workers threads that each apply --ops random add/subtract
+operations to the same BloodStock row through hospital.stock.change_stock,
+against a throwaway test database. It then checks that no update was
+lost: the final count equals the starting count plus every successful
+change, the ledger and the unit batches agree with the row, and no
+balance went negative.
+
+    python test_stock_concurrency.py --workers 16 --ops 50
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+import threading
+import django
+
+# Setup Django
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'bloodsystem.settings')
+django.setup()
+
+from django.db import connection, connections, OperationalError
+from django.db.models import Sum, Min
+
+INITIAL_UNITS = 20
+
+
+def create_hospital():
+    from accounts.models import User, HospitalProfile
+
+    user = User.objects.create(
+        username='stress-hospital@test.com', email='stress-hospital@test.com',
+        phone='+910000000002', role='HOSPITAL'
+    )
+    return HospitalProfile.objects.create(
+        user=user, hospital_name='Stress Test Hospital', registration_number='STRESS-1',
+        issuing_authority='Test', year_of_registration=2000, address_line='Test', area='Test',
+        city='Pune', district='Pune', state='Maharashtra', pincode='411001',
+        authorized_person_name='Test', authorized_person_designation='Test',
+        authorized_person_mobile='9000000000', authorized_person_email='stress@test.com',
+        verification_status='APPROVED', has_blood_bank=True
+    )
+
+
+def worker(hospital_id, ops, results, lock):
+    from hospital.stock import change_stock, InsufficientStock
+
+    applied = 0
+    rejected = 0
+    retries = 0
+    for _ in range(ops):
+        operation = random.choice(['add', 'subtract'])
+        units = random.randint(1, 5)
+        while True:
+            try:
+                change_stock(hospital_id, 'O+', operation, units)
+                applied += units if operation == 'add' else -units
+                break
+            except InsufficientStock:
+                rejected += 1
+                break
+            except OperationalError:
+                # SQLite reports lock contention instead of queueing; retry the whole operation
+                retries += 1
+                time.sleep(random.uniform(0, 0.01))
+    connections.close_all()
+    with lock:
+        results.append((applied, rejected, retries))
+
+
+def test_stock_concurrency(workers, ops):
+    from hospital.stock import change_stock
+    from hospital.models import BloodStock, BloodStockTransaction, BloodUnitBatch
+
+    print("=== TESTING CONCURRENT STOCK UPDATES ===")
+    print(f"Database engine: {connection.vendor}, {workers} workers x {ops} operations")
+
+    hospital = create_hospital()
+    change_stock(hospital, 'O+', 'set', INITIAL_UNITS)
+
+    results = []
+    lock = threading.Lock()
+    threads = [
+        threading.Thread(target=worker, args=(hospital.id, ops, results, lock))
+        for _ in range(workers)
+    ]
+    started = time.monotonic()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.monotonic() - started
+
+    expected = INITIAL_UNITS + sum(applied for applied, _, _ in results)
+    rejected = sum(r for _, r, _ in results)
+    retries = sum(r for _, _, r in results)
+    stock = BloodStock.objects.get(hospital=hospital, blood_group='O+')
+    ledger = BloodStockTransaction.objects.filter(hospital=hospital, blood_group='O+').aggregate(
+        total=Sum('units_change'), lowest=Min('balance_after')
+    )
+    batched = BloodUnitBatch.objects.filter(
+        hospital=hospital, blood_group='O+', status='AVAILABLE'
+    ).aggregate(total=Sum('units_remaining'))['total'] or 0
+
+    print(f"\nCompleted in {elapsed:.2f}s ({rejected} subtractions rejected, {retries} lock retries)")
+    print(f"Expected units: {expected}")
+    print(f"Stored units:   {stock.units_available}")
+    print(f"Ledger total:   {ledger['total']}")
+    print(f"Batch units:    {batched}")
+    print(f"Lowest balance: {ledger['lowest']}")
+
+    ok = stock.units_available == expected == ledger['total'] == batched and ledger['lowest'] >= 0
+    if ok:
+        print("✅ No lost updates, ledger and batches match stock, stock never negative")
+    else:
+        print("❌ Stock diverged from the applied operations")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--workers', type=int, default=16)
+    parser.add_argument('--ops', type=int, default=50)
+    args = parser.parse_args()
+
+    if connection.vendor == 'sqlite':
+        # Threads need a file-backed database to share one test database
+        connection.settings_dict['TEST']['NAME'] = os.path.join(tempfile.mkdtemp(), 'stress_test.sqlite3')
+    old_name = connection.creation.create_test_db(verbosity=0)
+    try:
+        ok = test_stock_concurrency(args.workers, args.ops)
+    finally:
+        connections.close_all()
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+    print("\n=== END ===")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,166 @@
+#!/usr/bin/env python
+"""
+Concurrency benchmark for inter-hospital stock transfers.
+
+Runs --workers threads that each make --ops random transfers between
+--hospitals hospitals through hospital.stock.transfer_stock. About half
+of the transfers run in the opposite direction of another, against a
+throwaway test database. It then checks that the total number of units
+is conserved and that every hospital's stock agrees with its ledger and
+its unit batches. It also checks that no balance went negative and that
+no transaction deadlocked.
+
+    python test_transfer_concurrency.py --workers 16 --ops 25
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+import threading
+import django
+
+# Setup Django
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'bloodsystem.settings')
+django.setup()
+
+from django.db import connection, connections, OperationalError
+from django.db.models import Sum, Min
+
+INITIAL_UNITS = 50
+
+
+def create_hospitals(count):
+    from accounts.models import User, HospitalProfile
+
+    hospitals = []
+    for i in range(count):
+        user = User.objects.create(
+            username=f'transfer-hospital{i}@test.com', email=f'transfer-hospital{i}@test.com',
+            phone=f'+9100000001{i:02d}', role='HOSPITAL'
+        )
+        hospitals.append(HospitalProfile.objects.create(
+            user=user, hospital_name=f'Transfer Test Hospital {i}', registration_number=f'TRANSFER-{i}',
+            issuing_authority='Test', year_of_registration=2000, address_line='Test', area='Test',
+            city='Pune', district='Pune', state='Maharashtra', pincode='411001',
+            authorized_person_name='Test', authorized_person_designation='Test',
+            authorized_person_mobile='9000000000', authorized_person_email=f'transfer{i}@test.com',
+            verification_status='APPROVED', has_blood_bank=True
+        ))
+    return hospitals
+
+
+def worker(hospital_ids, ops, results, lock):
+    from hospital.stock import transfer_stock, InsufficientStock
+
+    transferred = 0
+    rejected = 0
+    retries = 0
+    deadlocks = 0
+    for _ in range(ops):
+        providing_id, requesting_id = random.sample(hospital_ids, 2)
+        units = random.randint(1, 10)
+        while True:
+            try:
+                transfer_stock(providing_id, requesting_id, 'O+', units)
+                transferred += 1
+                break
+            except InsufficientStock:
+                rejected += 1
+                break
+            except OperationalError as e:
+                # SQLite reports lock contention instead of queueing; retry the whole transfer
+                if 'deadlock' in str(e).lower():
+                    deadlocks += 1
+                retries += 1
+                time.sleep(random.uniform(0, 0.01))
+    connections.close_all()
+    with lock:
+        results.append((transferred, rejected, retries, deadlocks))
+
+
+def test_transfer_concurrency(workers, ops, hospital_count):
+    from hospital.stock import change_stock
+    from hospital.models import BloodStock, BloodStockTransaction, BloodUnitBatch
+
+    print("=== TESTING CONCURRENT CROSS TRANSFERS ===")
+    print(f"Database engine: {connection.vendor}, {workers} workers x {ops} transfers, "
+          f"{hospital_count} hospitals")
+
+    hospitals = create_hospitals(hospital_count)
+    hospital_ids = [hospital.id for hospital in hospitals]
+    for hospital in hospitals:
+        change_stock(hospital, 'O+', 'set', INITIAL_UNITS)
+
+    results = []
+    lock = threading.Lock()
+    threads = [
+        threading.Thread(target=worker, args=(hospital_ids, ops, results, lock))
+        for _ in range(workers)
+    ]
+    started = time.monotonic()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.monotonic() - started
+
+    transferred = sum(r[0] for r in results)
+    rejected = sum(r[1] for r in results)
+    retries = sum(r[2] for r in results)
+    deadlocks = sum(r[3] for r in results)
+    print(f"\nCompleted {transferred} transfers in {elapsed:.2f}s "
+          f"({transferred / elapsed:.0f}/s, {rejected} rejected for stock, {retries} lock retries)")
+
+    ok = deadlocks == 0
+    total = 0
+    for hospital_id in hospital_ids:
+        stock = BloodStock.objects.get(hospital_id=hospital_id, blood_group='O+')
+        ledger = BloodStockTransaction.objects.filter(hospital_id=hospital_id, blood_group='O+').aggregate(
+            total=Sum('units_change'), lowest=Min('balance_after')
+        )
+        batched = BloodUnitBatch.objects.filter(
+            hospital_id=hospital_id, blood_group='O+', status='AVAILABLE'
+        ).aggregate(total=Sum('units_remaining'))['total'] or 0
+        consistent = stock.units_available == ledger['total'] == batched and ledger['lowest'] >= 0
+        ok = ok and consistent
+        total += stock.units_available
+        print(f"{'✅' if consistent else '❌'} Hospital {hospital_id}: stock {stock.units_available}, "
+              f"ledger {ledger['total']}, batches {batched}, lowest {ledger['lowest']}")
+
+    expected = INITIAL_UNITS * hospital_count
+    print(f"\nExpected total units: {expected}")
+    print(f"Stored total units:   {total}")
+    print(f"Deadlocks:            {deadlocks}")
+
+    ok = ok and total == expected
+    if ok:
+        print("✅ Units conserved, every hospital consistent, no deadlocks")
+    else:
+        print("❌ Transfers lost or duplicated units")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--workers', type=int, default=16)
+    parser.add_argument('--ops', type=int, default=25)
+    parser.add_argument('--hospitals', type=int, default=4)
+    args = parser.parse_args()
+
+    if connection.vendor == 'sqlite':
+        # Threads need a file-backed database to share one test database
+        connection.settings_dict['TEST']['NAME'] = os.path.join(tempfile.mkdtemp(), 'transfer_test.sqlite3')
+    old_name = connection.creation.create_test_db(verbosity=0)
+    try:
+        ok = test_transfer_concurrency(args.workers, args.ops, args.hospitals)
+    finally:
+        connections.close_all()
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+    print("\n=== END ===")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == '__main__':
+    main()